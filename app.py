@@ -1,17 +1,34 @@
 from __future__ import annotations
 
 import datetime as dt
+import hashlib
+import hmac
 import json
+import time
 from datetime import timezone
 from decimal import Decimal
 
-from flask import Flask, g, jsonify, request
+from flask import Flask, Response, g, jsonify, request, send_file
 from pydantic import ValidationError
 
+import warmup
+from clients.hotelrunner import metadata
+from clients.hotelrunner import tenancy
+from clients.hotelrunner.common import pool_stats, property_currency
 from compose_offer import OfferInput, compose_offer
 from currency_resolver import decide_currency
-from hotelrunner_availability import AvailabilityRequest, get_availability
+from hotelrunner_availability import (
+    AvailabilityRequest,
+    get_availability,
+    get_availability_batch,
+)
+from services.availability.flexible import search_flexible
+from services.availability.models import AnyAvailabilityResponse, FlexibleSearchRequest
+from services.availability.projection import format_from_accept
+from services.availability import ledger, sync
+from services.availability.service import RESPONSE_CACHE, apply_reservation_events
 from settings import configure_logging, get_settings
+from utils import metrics, profiling
 from utils.request_id import RequestIdFilter, generate_request_id
 from utils.env_inspector import inspect_environment, inspect_settings
 
@@ -20,19 +37,102 @@ settings = get_settings()
 PORT = settings.port
 TOOL_SECRET = settings.require("TOOL_SECRET", settings.tool_secret)
 PROPERTY_BASE_CURRENCY = settings.property_base_currency
+BATCH_MAX_ITEMS = settings.batch_max_items
 
 app = Flask(__name__)
 RequestIdFilter.install()
 
 
+def _cache_samples():
+    lookups = {}
+    for caches in metadata.cache_stats_by_property().values():
+        for name, stats in caches.items():
+            totals = lookups.setdefault(name, {"hit": 0, "stale_hit": 0, "miss": 0})
+            totals["hit"] += stats["hits"]
+            totals["stale_hit"] += stats["stale_hits"]
+            totals["miss"] += stats["misses"]
+    response_stats = RESPONSE_CACHE.stats()
+    for property_id, entries in response_stats["properties"].items():
+        yield (
+            "property_response_cache_entries",
+            "gauge",
+            "Cached availability responses per property.",
+            {"property": property_id},
+            entries,
+        )
+    lookups["availability_response"] = {
+        "hit": response_stats["hits"],
+        "miss": response_stats["misses"],
+    }
+    for cache, results in lookups.items():
+        for result, value in results.items():
+            labels = {"cache": cache, "result": result}
+            yield "cache_lookups_total", "counter", "Cache lookups by cache and result.", labels, value
+
+
+metrics.REGISTRY.register_collector(_cache_samples, merge="sum")
+
+
 @app.before_request
 def attach_request_id() -> None:
     g.request_id = request.headers.get("X-Request-ID") or generate_request_id()
+    g.timings = metrics.start_request()
+    metrics.ensure_flusher()
+    sync.ensure_started()
+    warmup.ensure_started()
+
+
+@app.before_request
+def select_property():
+    """Serve the request for ``X-Property-Id`` / ``?property=`` (default property otherwise).
+
+    Public endpoints also take one of the property's request slots, so a
+    burst for one hotel is turned away with 429 instead of occupying the
+    workers every other hotel needs.
+    """
+    property_id = request.headers.get("X-Property-Id") or request.args.get("property")
+    try:
+        g.property_tokens = tenancy.activate(property_id)
+    except tenancy.UnknownPropertyError:
+        return jsonify({"error": "unknown_property", "request_id": g.get("request_id")}), 404
+    g.property_id = tenancy.current_property().id
+    if request.path.startswith("/retell/public/"):
+        try:
+            g.release_property_slot = tenancy.acquire_slot()
+        except tenancy.PropertyBusyError:
+            response = jsonify({"error": "property_busy", "request_id": g.get("request_id")})
+            return response, 429, {"Retry-After": "1"}
+    return None
+
+
+@app.teardown_request
+def release_property(_exc) -> None:
+    release = g.pop("release_property_slot", None)
+    if release is not None:
+        release()
+    tokens = g.pop("property_tokens", None)
+    if tokens is not None:
+        tenancy.deactivate(tokens)
 
 
 @app.after_request
 def propagate_request_id(response):
     response.headers.setdefault("X-Request-ID", g.get("request_id"))
+    timings = g.get("timings")
+    if timings is not None:
+        response.headers["Server-Timing"] = timings.header()
+        metrics.HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - timings.started,
+            endpoint=request.url_rule.rule if request.url_rule else "unmatched",
+            method=request.method,
+            status=response.status_code,
+        )
+        if g.get("property_id"):
+            metrics.PROPERTY_REQUEST_SECONDS.observe(
+                time.perf_counter() - timings.started,
+                property=g.property_id,
+                status=response.status_code,
+            )
     return response
 
 
@@ -41,6 +141,60 @@ def healthz() -> tuple[str, int]:
     return "ok", 200
 
 
+@app.get("/readyz")
+def readyz():
+    """503 until this worker finished its warmup; reports its progress and each phase's time.
+
+    Outside gunicorn the warmup starts with the first request, this one included.
+    """
+    report = warmup.report()
+    return jsonify({**report, "request_id": g.get("request_id")}), 200 if report["ready"] else 503
+
+
+def _profiling_requested() -> bool:
+    flag = request.headers.get("X-Profile") or request.args.get("profile")
+    return bool(flag) and flag.lower() not in ("0", "false", "no")
+
+
+@app.before_request
+def start_profiling() -> None:
+    if not _profiling_requested() or request.headers.get("X-Tool-Secret") != TOOL_SECRET:
+        return
+    g.profiler = profiling.RequestProfiler.try_start()
+    g.profile_busy = g.profiler is None
+
+
+@app.after_request
+def finish_profiling(response):
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        report = profiler.stop(
+            method=request.method,
+            path=request.path,
+            query=request.query_string.decode(errors="replace"),
+            status=response.status_code,
+            request_id=g.get("request_id"),
+        )
+        profiling.save_report(report, profiler)
+        response.headers["X-Profile-Id"] = report["id"]
+        response.headers["X-Profile-Url"] = f"/retell/tool/profiles/{report['id']}"
+    elif g.get("profile_busy"):
+        response.headers["X-Profile"] = "busy"
+    return response
+
+
+@app.teardown_request
+def abort_profiling(_exc) -> None:
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        profiler.abort()
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    return Response(metrics.exposition(), mimetype="text/plain; version=0.0.4")
+
+
 @app.route("/", methods=["GET", "HEAD"])
 def index() -> tuple[str, int]:
     return "Erendiz Hotel Service", 200
@@ -54,27 +208,123 @@ def routes():
 @app.post("/retell/public/check_availability")
 def public_check_availability():
     try:
-        data = request.get_json(force=True, silent=False)
-        payload = AvailabilityRequest(**data)
+        payload = AvailabilityRequest.model_validate_json(request.get_data())
+        overrides = {
+            key: request.args[key]
+            for key in ("include", "fields", "format")
+            if key in request.args and key not in payload.model_fields_set
+        }
+        accepted_format = format_from_accept(request.headers.get("Accept"))
+        if accepted_format and "format" not in payload.model_fields_set:
+            overrides.setdefault("format", accepted_format)
+        if overrides:
+            payload = AvailabilityRequest.model_validate(
+                {**payload.model_dump(exclude_unset=True), **overrides}
+            )
     except ValidationError as exc:
-        return jsonify({"error": "validation_error", "details": json.loads(exc.json())}), 400
+        return _validation_error(exc)
+    except Exception as exc:
+        return jsonify({"error": "bad_request", "details": str(exc)}), 400
+
+    try:
+        result: AnyAvailabilityResponse = get_availability(payload)
+        response = _json_with_etag(
+            result.model_dump_json(include=payload.response_include()).encode()
+        )
+        response.vary.add("Accept")
+        return response
+    except Exception as exc:
+        return (
+            jsonify(
+                {
+                    "error": "upstream_error",
+                    "message": "Availability service unavailable",
+                    "request_id": g.get("request_id"),
+                }
+            ),
+            502,
+        )
+
+
+def _json_with_etag(body: bytes):
+    """Serialized JSON with a strong content ETag; 304 when ``If-None-Match`` matches."""
+    etag = hashlib.sha256(body).hexdigest()
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = _raw_json(body)
+    response.set_etag(etag)
+    return response
+
+
+def _raw_json(body: bytes, status: int = 200):
+    """Send already-serialized JSON (e.g. from ``model_dump_json``) without re-encoding."""
+    return app.response_class(body, status=status, mimetype="application/json")
+
+
+def _validation_error(exc: ValidationError):
+    errors = exc.errors(include_url=False)
+    if any(error["type"] == "json_invalid" for error in errors):
+        return jsonify({"error": "bad_request", "details": errors[0]["msg"]}), 400
+    return _raw_json(b'{"error":"validation_error","details":' + exc.json().encode() + b"}", 400)
+
+
+@app.post("/retell/public/check_availability_batch")
+def public_check_availability_batch():
+    try:
+        data = request.get_json(force=True, silent=False)
+        items = data.get("requests") if isinstance(data, dict) else None
+        if not isinstance(items, list) or not items:
+            raise ValueError("body must contain a non-empty 'requests' list")
+        if len(items) > BATCH_MAX_ITEMS:
+            raise ValueError(f"at most {BATCH_MAX_ITEMS} requests per batch")
     except Exception as exc:
         return jsonify({"error": "bad_request", "details": str(exc)}), 400
 
+    results: list[str | None] = [None] * len(items)
+    valid: list[tuple[int, AvailabilityRequest]] = []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, AvailabilityRequest.model_validate(item)))
+        except ValidationError as exc:
+            results[index] = f'{{"error":"validation_error","details":{exc.json()}}}'
+        except Exception as exc:
+            results[index] = json.dumps({"error": "bad_request", "details": str(exc)})
+
     try:
-        result = get_availability(payload)
-        return jsonify(
-            {
-                "total": result.get("total"),
-                "currency": result.get("currency"),
-                "nights": result.get("nights"),
-                "price_currency": result.get("price_currency"),
-                "availability": result.get("availability"),
-                "prices": result.get("prices"),
-                "raw": result.get("raw"),
-            }
+        answers = get_availability_batch([payload for _, payload in valid])
+    except Exception:
+        return (
+            jsonify(
+                {
+                    "error": "upstream_error",
+                    "message": "Availability service unavailable",
+                    "request_id": g.get("request_id"),
+                }
+            ),
+            502,
         )
+    for (index, payload), answer in zip(valid, answers):
+        if isinstance(answer, Exception):
+            results[index] = json.dumps({"error": "availability_failed", "message": str(answer)})
+        else:
+            results[index] = answer.model_dump_json(include=payload.response_include())
+    body = f'{{"results":[{",".join(results)}],"request_id":{json.dumps(g.get("request_id"))}}}'
+    return _raw_json(body.encode())
+
+
+@app.post("/retell/public/flexible_search")
+def public_flexible_search():
+    try:
+        payload = FlexibleSearchRequest.model_validate_json(request.get_data())
+    except ValidationError as exc:
+        return _validation_error(exc)
     except Exception as exc:
+        return jsonify({"error": "bad_request", "details": str(exc)}), 400
+
+    try:
+        return _raw_json(search_flexible(payload).model_dump_json().encode())
+    except Exception:
         return (
             jsonify(
                 {
@@ -100,23 +350,26 @@ def tool_compose_offer():
             channel_default=body.get("channel_default"),
             phone_country=body.get("phone_country"),
             ip_country=body.get("ip_country"),
-            property_base_currency=PROPERTY_BASE_CURRENCY,
+            property_base_currency=property_currency(),
         )
-        base_currency = availability_result.get("currency", PROPERTY_BASE_CURRENCY).upper()
-        fx_rate = settings.get_fx_default(base_currency, display_currency)
+        base_currency = availability_result.get("currency", property_currency()).upper()
+        fx_rate, fx_timestamp = settings.get_fx_quote(base_currency, display_currency)
 
         offer = compose_offer(
             OfferInput(
                 availability_result=availability_result,
                 display_currency=display_currency,
                 fx_rate=fx_rate,
-                fx_timestamp=dt.datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+                fx_timestamp=fx_timestamp
+                or dt.datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
             )
         )
         return jsonify(offer)
     except Exception as exc:
         return (
-            jsonify({"error": "compose_failed", "message": str(exc), "request_id": g.get("request_id")}),
+            jsonify(
+                {"error": "compose_failed", "message": str(exc), "request_id": g.get("request_id")}
+            ),
             400,
         )
 
@@ -131,14 +384,97 @@ def whoami():
             "authenticated": authed,
             "timestamp": dt.datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
             "config": {
-                "property_base_currency": PROPERTY_BASE_CURRENCY,
+                "property": tenancy.current_property().id,
+                "property_base_currency": property_currency(),
                 "hotelrunner_base": settings.hotelrunner_base_url,
             },
+            "http_pool": pool_stats(),
+            "metadata_cache": metadata.cache_stats(),
+            "response_cache": RESPONSE_CACHE.stats(),
+            "booking_ledger": ledger.current_ledger().stats() if ledger.enabled() else None,
+            "reservation_sync": sync.status(),
             "request_id": g.get("request_id"),
         }
     )
 
 
+@app.post("/retell/webhooks/hotelrunner/reservations")
+def reservation_webhook():
+    """Apply reservation created/modified/cancelled events to the property's ledger.
+
+    The raw body must carry an HMAC-SHA256 signature made with
+    ``WEBHOOK_SECRET`` in ``X-HotelRunner-Signature`` (hex, ``sha256=``
+    prefix optional). Accepts one event or ``{"events": [...]}``; events are
+    routed to properties by their ``hr_id`` (see
+    :func:`~services.availability.service.apply_reservation_events`).
+    """
+    secret = settings.webhook_secret
+    if not secret:
+        return jsonify({"error": "webhooks_disabled", "request_id": g.get("request_id")}), 503
+
+    body = request.get_data()
+    signature = request.headers.get("X-HotelRunner-Signature", "").strip()
+    signature = signature.removeprefix("sha256=")
+    expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(signature.encode(), expected.encode()):
+        return jsonify({"error": "unauthorized"}), 401
+
+    try:
+        data = json.loads(body)
+        events = data.get("events", [data]) if isinstance(data, dict) else data
+        if not isinstance(events, list):
+            raise ValueError("body must be an event or contain an 'events' list")
+    except Exception as exc:
+        return jsonify({"error": "bad_request", "details": str(exc)}), 400
+
+    property_id = request.headers.get("X-Property-Id") or request.args.get("property")
+    try:
+        counts = apply_reservation_events(events, property_id)
+    except ledger.LedgerRoutingError as exc:
+        return jsonify({"error": "bad_request", "details": str(exc)}), 400
+    except ledger.LedgerBusyError:
+        response = jsonify({"error": "ledger_busy", "request_id": g.get("request_id")})
+        return response, 503, {"Retry-After": "1"}
+    return jsonify({"ok": True, **counts, "request_id": g.get("request_id")})
+
+
+@app.post("/retell/tool/cache/invalidate")
+def invalidate_cache():
+    if request.headers.get("X-Tool-Secret") != TOOL_SECRET:
+        return jsonify({"error": "unauthorized"}), 401
+
+    body = request.get_json(silent=True) or {}
+    try:
+        invalidated = metadata.invalidate(body.get("cache"))
+    except KeyError as exc:
+        return jsonify({"error": "unknown_cache", "message": str(exc.args[0])}), 400
+    return jsonify({"ok": True, "invalidated": invalidated, "request_id": g.get("request_id")})
+
+
+@app.get("/retell/tool/profiles")
+def list_profiles():
+    if request.headers.get("X-Tool-Secret") != TOOL_SECRET:
+        return jsonify({"error": "unauthorized"}), 401
+
+    return jsonify({"profiles": profiling.list_reports(), "request_id": g.get("request_id")})
+
+
+@app.get("/retell/tool/profiles/<profile_id>")
+def get_profile(profile_id: str):
+    if request.headers.get("X-Tool-Secret") != TOOL_SECRET:
+        return jsonify({"error": "unauthorized"}), 401
+
+    if request.args.get("format") == "pstats":
+        path = profiling.stats_path(profile_id)
+        if path is None:
+            return jsonify({"error": "not_found"}), 404
+        return send_file(path, mimetype="application/octet-stream", as_attachment=True)
+    report = profiling.load_report(profile_id)
+    if report is None:
+        return jsonify({"error": "not_found"}), 404
+    return jsonify(report)
+
+
 @app.get("/retell/tool/debug_env")
 def debug_env():
     if request.headers.get("X-Tool-Secret") != TOOL_SECRET:
@@ -155,4 +491,5 @@ def debug_env():
 
 
 if __name__ == "__main__":
+    warmup.ensure_started()
     app.run(host="0.0.0.0", port=PORT)
@@ -0,0 +1,156 @@
+"""ASGI entry point serving the availability endpoint on asyncio.
+
+Run with any ASGI server, e.g. ``uvicorn asgi:app``. Only the latency-bound
+public availability route lives here, answering like the Flask route
+(response cache, booking ledger, ``format``/``Accept`` negotiation, ETag
+and 304); the tool endpoints stay on the Flask app in ``app.py``.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+from typing import Optional
+from urllib.parse import parse_qs
+
+from pydantic import ValidationError
+
+from clients.hotelrunner import tenancy
+from hotelrunner_availability import AvailabilityRequest, get_availability_async
+from services.availability.projection import format_from_accept
+from settings import configure_logging
+from utils.request_id import RequestIdFilter, generate_request_id
+
+configure_logging()
+RequestIdFilter.install()
+
+
+async def app(scope, receive, send) -> None:
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    headers = {
+        key.decode("latin-1").lower(): value.decode("latin-1") for key, value in scope["headers"]
+    }
+    request_id = headers.get("x-request-id") or generate_request_id()
+    path, method = scope["path"], scope["method"]
+
+    if path == "/healthz" and method in ("GET", "HEAD"):
+        await _respond(send, 200, b"ok", request_id, content_type="text/plain")
+    elif path == "/retell/public/check_availability" and method == "POST":
+        query = parse_qs(scope.get("query_string", b"").decode())
+        property_id = headers.get("x-property-id") or query.get("property", [None])[-1]
+        try:
+            tokens = tenancy.activate(property_id)
+        except tenancy.UnknownPropertyError:
+            body = {"error": "unknown_property", "request_id": request_id}
+            await _respond(send, 404, json.dumps(body).encode(), request_id)
+            return
+        try:
+            # The event loop must not block: a property at its limit is rejected at once.
+            with tenancy.admit(timeout=0):
+                status, body = await _check_availability(
+                    scope, headers, await _read_body(receive), request_id
+                )
+        except tenancy.PropertyBusyError:
+            status, body = 429, {"error": "property_busy", "request_id": request_id}
+        finally:
+            tenancy.deactivate(tokens)
+        if isinstance(body, bytes):
+            await _respond_with_etag(send, body, request_id, headers.get("if-none-match"))
+        else:
+            await _respond(send, status, json.dumps(body).encode(), request_id)
+    else:
+        await _respond(send, 404, json.dumps({"error": "not_found"}).encode(), request_id)
+
+
+async def _check_availability(
+    scope, headers: dict, raw: bytes, request_id: str
+) -> tuple[int, dict | bytes]:
+    """Status and either an error body or the serialized availability JSON."""
+    try:
+        data = json.loads(raw or b"null")
+        query = parse_qs(scope.get("query_string", b"").decode())
+        for key in ("include", "fields", "format"):
+            if key in query and key not in data:
+                data[key] = query[key][-1]
+        accepted_format = format_from_accept(headers.get("accept"))
+        if accepted_format and "format" not in data:
+            data["format"] = accepted_format
+        payload = AvailabilityRequest(**data)
+    except ValidationError as exc:
+        return 400, {"error": "validation_error", "details": json.loads(exc.json())}
+    except Exception as exc:
+        return 400, {"error": "bad_request", "details": str(exc)}
+
+    try:
+        result = await get_availability_async(payload)
+        return 200, result.model_dump_json(include=payload.response_include()).encode()
+    except Exception:
+        return 502, {
+            "error": "upstream_error",
+            "message": "Availability service unavailable",
+            "request_id": request_id,
+        }
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+async def _respond_with_etag(
+    send, body: bytes, request_id: str, if_none_match: Optional[str]
+) -> None:
+    """Serialized JSON with a strong content ETag; 304 when ``If-None-Match`` matches."""
+    etag = f'"{hashlib.sha256(body).hexdigest()}"'
+    extra = [(b"etag", etag.encode()), (b"vary", b"Accept")]
+    if _etag_matches(if_none_match, etag):
+        await _respond(send, 304, b"", request_id, extra_headers=extra)
+    else:
+        await _respond(send, 200, body, request_id, extra_headers=extra)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # Weak comparison, as RFC 9110 prescribes for If-None-Match.
+    candidates = {tag.strip().removeprefix("W/") for tag in (if_none_match or "").split(",")}
+    return "*" in candidates or etag in candidates
+
+
+async def _respond(
+    send,
+    status: int,
+    body: bytes,
+    request_id: str,
+    content_type: str = "application/json",
+    extra_headers: Optional[list] = None,
+) -> None:
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", content_type.encode()),
+                (b"content-length", str(len(body)).encode()),
+                (b"x-request-id", request_id.encode()),
+                *(extra_headers or []),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _lifespan(receive, send) -> None:
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
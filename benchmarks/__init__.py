@@ -0,0 +1 @@
+"""Micro-benchmarks for the availability, FX and offer hot paths."""
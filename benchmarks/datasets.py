@@ -0,0 +1,83 @@
+"""Deterministic synthetic hotel datasets for benchmarks and load tests."""
+from __future__ import annotations
+
+import datetime as dt
+import random
+from dataclasses import dataclass
+from typing import List
+
+ROOM_NAMES = ("Standard", "Deluxe", "Superior", "Family", "Suite", "Single", "Twin", "Villa")
+CURRENCIES = ("TRY", "EUR", "USD", "GBP")
+
+
+@dataclass(frozen=True)
+class DatasetSpec:
+    room_types: int
+    reservations: int
+    nights: int
+    seed: int = 42
+    start: dt.date = dt.date(2025, 10, 1)
+
+    @property
+    def name(self) -> str:
+        return f"{self.room_types}rt-{self.reservations}res-{self.nights}n"
+
+
+@dataclass
+class Dataset:
+    spec: DatasetSpec
+    rooms: List[dict]
+    reservations: List[dict]
+    check_in: str
+    check_out: str
+
+
+def generate(spec: DatasetSpec) -> Dataset:
+    """Build rooms and reservations shaped like HotelRunner payloads.
+
+    Inventory per room type is sized so the property is roughly 70 % booked
+    over the stay window; stays are 1-14 nights and start up to 30 days
+    before the window, so the lookback path is exercised too.
+    """
+    rng = random.Random(spec.seed)
+    names = [
+        f"{ROOM_NAMES[i % len(ROOM_NAMES)]} {i // len(ROOM_NAMES) + 1}"
+        for i in range(spec.room_types)
+    ]
+    span = spec.nights + 30
+    avg_stay = 7.5
+    per_type_nights = spec.reservations * avg_stay / max(spec.room_types, 1)
+    inventory = max(int(per_type_nights / span / 0.7), 1)
+
+    rooms = [
+        {
+            "name": name,
+            "total_count": inventory,
+            "price": round(rng.uniform(40, 900), 2),
+            "sales_currency": "TRY",
+            "max_occupancy": rng.choice((1, 2, 2, 3, 4, 6)),
+        }
+        for name in names
+    ]
+    reservations = []
+    for index in range(spec.reservations):
+        check_in = spec.start + dt.timedelta(days=rng.randint(-30, spec.nights))
+        check_out = check_in + dt.timedelta(days=rng.randint(1, 14))
+        reservations.append(
+            {
+                "id": index + 1,
+                "room_type": rng.choice(names),
+                "check_in": check_in.isoformat(),
+                "check_out": check_out.isoformat(),
+                "state": "confirmed",
+                "total": round(rng.uniform(100, 20000), 2),
+                "currency": rng.choice(CURRENCIES),
+            }
+        )
+    return Dataset(
+        spec=spec,
+        rooms=rooms,
+        reservations=reservations,
+        check_in=spec.start.isoformat(),
+        check_out=(spec.start + dt.timedelta(days=spec.nights)).isoformat(),
+    )
@@ -0,0 +1,290 @@
+"""Run the micro-benchmarks and compare them against a stored baseline.
+
+Usage::
+
+    python -m benchmarks.run                     # quick preset, compare to baseline
+    python -m benchmarks.run --preset full       # 5-500 room types, up to 100k reservations
+    python -m benchmarks.run --save              # overwrite the baseline with this run
+
+Exits non-zero when any case is slower than its baseline median by more
+than ``--threshold`` (default ``BENCH_THRESHOLD`` or 0.25, i.e. 25 %).
+"""
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from decimal import Decimal
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from unittest import mock
+
+os.environ.setdefault("HOTELRUNNER_TOKEN", "bench-token")
+os.environ.setdefault("HR_ID", "bench-hr")
+os.environ.setdefault("TOOL_SECRET", "bench-secret")
+os.environ.setdefault("FX_DEFAULT_TRY_EUR", "0.02857")
+
+from benchmarks.datasets import Dataset, DatasetSpec, generate  # noqa: E402
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+MIN_DELTA_SECONDS = 50e-6
+
+PRESETS: Dict[str, List[DatasetSpec]] = {
+    "quick": [
+        DatasetSpec(room_types=5, reservations=1_000, nights=1),
+        DatasetSpec(room_types=50, reservations=10_000, nights=30),
+    ],
+    "full": [
+        DatasetSpec(room_types=5, reservations=1_000, nights=1),
+        DatasetSpec(room_types=50, reservations=10_000, nights=30),
+        DatasetSpec(room_types=200, reservations=50_000, nights=90),
+        DatasetSpec(room_types=500, reservations=100_000, nights=365),
+    ],
+}
+
+Case = Tuple[str, Callable[[], object], int]  # name, callable, operations per call
+
+
+@dataclass
+class Result:
+    name: str
+    median: float  # seconds per operation
+    best: float
+    rounds: int
+
+
+def measure(
+    func: Callable[[], object], ops: int = 1, min_time: float = 0.3
+) -> Tuple[float, float, int]:
+    func()  # warm up caches and imports
+    samples: List[float] = []
+    deadline = time.perf_counter() + min_time
+    while len(samples) < 5 or (time.perf_counter() < deadline and len(samples) < 200):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) / ops)
+    return statistics.median(samples), min(samples), len(samples)
+
+
+def dataset_cases(data: Dataset) -> Iterator[Case]:
+    from clients.hotelrunner.reservations import ReservationPage
+    from services.availability import service
+    from services.availability.models import AvailabilityRequest
+
+    payload = AvailabilityRequest(
+        check_in=data.check_in, check_out=data.check_out, adults=2, children=0
+    )
+    name = data.spec.name
+    yield (
+        f"build_availability_matrix[{name}]",
+        lambda: service._build_availability_matrix(payload, data.rooms, data.reservations),
+        1,
+    )
+    yield f"parse_room_metadata[{name}]", lambda: service.parse_room_metadata(data.rooms), 1
+
+    from services.availability import ledger, store
+    from services.availability.matrix import AvailabilityGrid
+
+    first_night = dt.date.fromisoformat(data.check_in)
+    check_out = dt.date.fromisoformat(data.check_out)
+    books: Dict[str, object] = {}
+
+    def ledger_fill(kind: str) -> None:
+        # The ledger is seeded on the (untimed) warm-up call; only the range read is measured.
+        if kind not in books:
+            if kind == "sqlite":
+                books["tmp"] = tempfile.TemporaryDirectory()
+                path = Path(books["tmp"].name) / "inventory.sqlite3"
+                books[kind] = store.InventoryStore(str(path)).ledger(name)
+            else:
+                books[kind] = ledger.BookingLedger()
+            books[kind].apply_stays([ledger.stay_from(r, False) for r in data.reservations])
+        books[kind].fill(AvailabilityGrid(first_night, check_out))
+
+    for kind in ("memory", "sqlite"):
+        yield f"ledger.fill.{kind}[{name}]", lambda kind=kind: ledger_fill(kind), 1
+
+    from app import app
+
+    client = app.test_client()
+    body = {"check_in": data.check_in, "check_out": data.check_out, "adults": 2, "children": 0}
+
+    def pages(start, end):
+        # Upstream filters on check-in, like the real reservations endpoint.
+        lo, hi = start.isoformat(), end.isoformat()
+        matching = [r for r in data.reservations if lo <= r["check_in"] <= hi]
+        for offset in range(0, len(matching), 100):
+            yield ReservationPage(offset // 100 + 1, matching[offset : offset + 100])
+
+    def check_availability(format: str, **extra: str) -> None:
+        with mock.patch.object(service, "get_rooms", lambda: data.rooms), mock.patch.object(
+            service, "iter_reservation_pages", pages
+        ):
+            service.RESPONSE_CACHE.clear()
+            response = client.post(
+                "/retell/public/check_availability", json={**body, "format": format, **extra}
+            )
+        assert response.status_code == 200, response.status_code
+
+    yield f"endpoint.check_availability[{name}]", lambda: check_availability("nested"), 1
+    for format in ("columnar", "rle"):
+        yield (
+            f"endpoint.check_availability.{format}[{name}]",
+            lambda format=format: check_availability(format),
+            1,
+        )
+    yield (
+        f"endpoint.check_availability.converted[{name}]",
+        lambda: check_availability("nested", display_currency="EUR"),
+        1,
+    )
+
+
+def offer_cases() -> Iterator[Case]:
+    from app import app
+    from compose_offer import OfferInput, compose_offer
+    from currency_resolver import apply_fx, convert_minor_batch
+
+    offer = OfferInput(
+        availability_result={"total": 43400, "currency": "TRY", "nights": 10},
+        display_currency="EUR",
+        fx_rate=Decimal("0.02857"),
+        fx_timestamp="2025-10-01T00:00:00Z",
+    )
+    yield "compose_offer", lambda: [compose_offer(offer) for _ in range(1000)], 1000
+    yield (
+        "apply_fx",
+        lambda: [apply_fx(4340000, "TRY", "EUR", Decimal("0.02857")) for _ in range(1000)],
+        1000,
+    )
+
+    # One 200 room type x 90 night price matrix, converted value by value vs. in one batch.
+    rate = Decimal("0.02857")
+    matrix = [4000 + (i * 7919) % 90000 for i in range(200 * 90)]
+    yield (
+        f"fx.apply_fx_per_value[{len(matrix)}]",
+        lambda: [apply_fx(amount, "TRY", "EUR", rate)[0] for amount in matrix],
+        len(matrix),
+    )
+    yield (
+        f"fx.convert_minor_batch[{len(matrix)}]",
+        lambda: convert_minor_batch(matrix, "TRY", "EUR", rate),
+        len(matrix),
+    )
+
+    client = app.test_client()
+    headers = {"X-Tool-Secret": os.environ["TOOL_SECRET"]}
+    body = {"availability_result": offer.availability_result, "display_currency": "EUR"}
+
+    def endpoint() -> None:
+        response = client.post("/retell/tool/compose_offer", json=body, headers=headers)
+        assert response.status_code == 200, response.status_code
+
+    yield "endpoint.compose_offer", endpoint, 1
+
+
+def run(preset: str, pattern: Optional[str] = None) -> List[Result]:
+    import warmup
+    from services.availability import sync
+
+    # The test client would start warmup and reservation sync threads on the first
+    # request, and their upstream calls would run alongside the timed cases.
+    with mock.patch.object(warmup, "ensure_started", lambda: None), mock.patch.object(
+        sync, "ensure_started", lambda: None
+    ):
+        results = []
+        cases: List[Case] = list(offer_cases())
+        for spec in PRESETS[preset]:
+            cases.extend(dataset_cases(generate(spec)))
+        for name, func, ops in cases:
+            if pattern and pattern not in name:
+                continue
+            median, best, rounds = measure(func, ops)
+            results.append(Result(name, median, best, rounds))
+            print(f"{name:<60} {median * 1e3:>10.3f} ms  (best {best * 1e3:.3f}, n={rounds})")
+        return results
+
+
+def compare(
+    results: List[Result],
+    baseline: Dict[str, dict],
+    threshold: float,
+    min_delta: float = MIN_DELTA_SECONDS,
+) -> List[str]:
+    """Describe every case slower than its baseline by more than ``threshold``.
+
+    Slowdowns smaller than ``min_delta`` seconds are ignored so that
+    microsecond-scale cases do not flap on timer noise.
+    """
+    regressions = []
+    for result in results:
+        reference = baseline.get(result.name)
+        if not reference:
+            continue
+        limit = max(reference["median"] * (1 + threshold), reference["median"] + min_delta)
+        if result.median > limit:
+            regressions.append(
+                f"{result.name}: {result.median * 1e3:.3f} ms vs baseline "
+                f"{reference['median'] * 1e3:.3f} ms (+{result.median / reference['median'] - 1:.0%})"
+            )
+    return regressions
+
+
+def load_baseline(path: Path) -> Dict[str, dict]:
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text()).get("results", {})
+
+
+def save_baseline(path: Path, results: List[Result], preset: str) -> None:
+    existing = load_baseline(path)
+    existing.update({result.name: asdict(result) for result in results})
+    document = {
+        "preset": preset,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": dict(sorted(existing.items())),
+    }
+    path.write_text(json.dumps(document, indent=2) + "\n")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="quick")
+    parser.add_argument("--filter", dest="pattern", help="only run cases containing this text")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save", action="store_true", help="write results to the baseline file")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=float(os.getenv("BENCH_THRESHOLD", "0.25")),
+        help="allowed slowdown relative to baseline (0.25 = 25%%)",
+    )
+    args = parser.parse_args(argv)
+
+    results = run(args.preset, args.pattern)
+    if args.save:
+        save_baseline(args.baseline, results, args.preset)
+        print(f"baseline written to {args.baseline}")
+        return 0
+
+    regressions = compare(results, load_baseline(args.baseline), args.threshold)
+    if regressions:
+        print("\nregressions beyond threshold:", file=sys.stderr)
+        for line in regressions:
+            print(f"  {line}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,279 @@
+"""Asyncio variants of the HotelRunner clients with a pluggable transport."""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import datetime as dt
+import json
+import os
+import weakref
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Mapping, Optional, Protocol
+
+import httpx
+import requests
+from tenacity import AsyncRetrying
+
+from settings import get_settings
+from utils import metrics
+
+from .common import (
+    APPS_BASE_URL,
+    RETRY_POLICY,
+    ConditionalResult,
+    apps_params,
+    attempt_timeout,
+    check_response,
+    conditional_headers,
+    http_get,
+    response_validators,
+)
+from .currencies import CURRENCY_ENDPOINT, currencies_from_payload
+from .reservations import (
+    ReservationPage,
+    choose_page_size,
+    page_count_from,
+    page_params,
+    record_density,
+)
+from .rooms import rooms_from_payload
+
+_settings = get_settings()
+
+
+@dataclass
+class TransportResponse:
+    status_code: int
+    text: str = ""
+    headers: Mapping[str, str] = field(default_factory=dict)
+
+    def json(self) -> Any:
+        return json.loads(self.text) if self.text else None
+
+
+class AsyncTransport(Protocol):
+    async def get(
+        self,
+        url: str,
+        params: Optional[dict] = None,
+        headers: Optional[dict] = None,
+        timeout: float = 15,
+    ) -> TransportResponse: ...
+
+
+class ExecutorTransport:
+    """The pooled sync session, run off the event loop.
+
+    Selected with ``HOTELRUNNER_ASYNC_TRANSPORT=executor``.
+    """
+
+    async def get(
+        self,
+        url: str,
+        params: Optional[dict] = None,
+        headers: Optional[dict] = None,
+        timeout: float = 15,
+    ) -> TransportResponse:
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        response = await loop.run_in_executor(
+            None,
+            lambda: context.run(http_get, url, params=params, timeout=timeout, headers=headers),
+        )
+        return TransportResponse(response.status_code, response.text, response.headers)
+
+
+class HttpxTransport:
+    """Default transport: non-blocking ``httpx`` with the retries of :func:`http_get`.
+
+    Connection errors and timeouts are raised as their ``requests``
+    counterparts, so ``RETRY_POLICY`` and callers see what the sync path
+    sees. An ``httpx.AsyncClient`` is bound to the loop it first ran on,
+    so each event loop gets its own.
+    """
+
+    def __init__(self) -> None:
+        # event loop -> its client
+        self._clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+    async def get(
+        self,
+        url: str,
+        params: Optional[dict] = None,
+        headers: Optional[dict] = None,
+        timeout: float = 15,
+    ) -> TransportResponse:
+        return await AsyncRetrying(**RETRY_POLICY)(self._attempt, url, params, headers, timeout)
+
+    async def _attempt(
+        self, url: str, params: Optional[dict], headers: Optional[dict], timeout: float
+    ) -> TransportResponse:
+        timeout = attempt_timeout(timeout)
+        try:
+            response = await self._client().get(
+                url, params=params, headers=headers, timeout=timeout
+            )
+        except httpx.TimeoutException as exc:
+            raise requests.Timeout(str(exc)) from exc
+        except httpx.TransportError as exc:
+            raise requests.ConnectionError(str(exc)) from exc
+        metrics.record_response(response.status_code)
+        return TransportResponse(response.status_code, response.text, response.headers)
+
+    def _client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            limits = httpx.Limits(
+                max_connections=_settings.http_pool_maxsize,
+                max_keepalive_connections=_settings.http_pool_maxsize,
+            )
+            client = self._clients[loop] = httpx.AsyncClient(
+                limits=limits, headers={"User-Agent": "retell-booking-service/1.0"}
+            )
+        return client
+
+    async def aclose(self) -> None:
+        """Close the client of the running loop."""
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+
+_TRANSPORT: Optional[AsyncTransport] = None
+
+
+def get_transport() -> AsyncTransport:
+    global _TRANSPORT
+
+    if _TRANSPORT is None:
+        if os.getenv("HOTELRUNNER_ASYNC_TRANSPORT", "httpx").lower() == "executor":
+            _TRANSPORT = ExecutorTransport()
+        else:
+            _TRANSPORT = HttpxTransport()
+    return _TRANSPORT
+
+
+def set_transport(transport: Optional[AsyncTransport]) -> None:
+    """Install a transport (e.g. a local fake in tests); ``None`` restores the default."""
+    global _TRANSPORT
+
+    _TRANSPORT = transport
+
+
+async def fetch_rooms_conditional(
+    validators: dict[str, str] | None = None,
+    transport: AsyncTransport | None = None,
+) -> ConditionalResult:
+    transport = transport or get_transport()
+    with metrics.upstream_call("rooms"):
+        response = await transport.get(
+            f"{APPS_BASE_URL}/rooms",
+            params=apps_params(),
+            headers=conditional_headers(validators),
+            timeout=15,
+        )
+        if response.status_code == 304:
+            return ConditionalResult(None, validators or {}, True)
+        check_response(response, "rooms")
+        return ConditionalResult(
+            rooms_from_payload(response.json()), response_validators(response), False
+        )
+
+
+async def fetch_rooms(transport: AsyncTransport | None = None) -> list[dict]:
+    return (await fetch_rooms_conditional(transport=transport)).value
+
+
+async def fetch_currencies_conditional(
+    validators: dict[str, str] | None = None,
+    transport: AsyncTransport | None = None,
+) -> ConditionalResult:
+    transport = transport or get_transport()
+    with metrics.upstream_call("currencies"):
+        response = await transport.get(
+            CURRENCY_ENDPOINT,
+            params=apps_params(),
+            headers=conditional_headers(validators),
+            timeout=15,
+        )
+        if response.status_code == 304:
+            return ConditionalResult(None, validators or {}, True)
+        check_response(response, "currencies")
+        return ConditionalResult(
+            currencies_from_payload(response.json()), response_validators(response), False
+        )
+
+
+async def fetch_currencies(transport: AsyncTransport | None = None) -> list[dict]:
+    return (await fetch_currencies_conditional(transport=transport)).value
+
+
+async def iter_reservation_pages(
+    start_date: dt.date,
+    end_date: dt.date,
+    per_page: int | None = None,
+    concurrency: int | None = None,
+    transport: AsyncTransport | None = None,
+) -> AsyncIterator[ReservationPage]:
+    """Async counterpart of :func:`clients.hotelrunner.reservations.iter_reservation_pages`."""
+    transport = transport or get_transport()
+    per_page = per_page or choose_page_size(start_date, end_date)
+    semaphore = asyncio.Semaphore(max(concurrency or _settings.reservation_page_concurrency, 1))
+
+    async def fetch(page: int) -> tuple[int, list[dict], dict]:
+        async with semaphore:
+            with metrics.upstream_call("reservations"):
+                response = await transport.get(
+                    f"{APPS_BASE_URL}/reservations",
+                    params=page_params(start_date, end_date, page, per_page),
+                    timeout=20,
+                )
+                check_response(response, "reservations")
+                payload = response.json() or {}
+        return page, payload.get("reservations", []), payload
+
+    _, first, payload = await fetch(1)
+    total_seen = len(first)
+    page_count = page_count_from(payload, per_page)
+
+    if page_count is None:
+        yield ReservationPage(1, first)
+        page, batch = 1, first
+        while len(batch) >= per_page:
+            page += 1
+            _, batch, _ = await fetch(page)
+            total_seen += len(batch)
+            yield ReservationPage(page, batch)
+        metrics.RESERVATION_PAGES.observe(page)
+    else:
+        tasks = [asyncio.ensure_future(fetch(page)) for page in range(2, page_count + 1)]
+        try:
+            yield ReservationPage(1, first)
+            for next_done in asyncio.as_completed(tasks):
+                page, batch, _ = await next_done
+                total_seen += len(batch)
+                yield ReservationPage(page, batch)
+        finally:
+            for task in tasks:
+                task.cancel()
+        metrics.RESERVATION_PAGES.observe(page_count)
+    record_density(start_date, end_date, total_seen)
+
+
+async def fetch_reservations(
+    start_date: dt.date,
+    end_date: dt.date,
+    per_page: int | None = None,
+    transport: AsyncTransport | None = None,
+) -> list[dict]:
+    pages = [
+        page
+        async for page in iter_reservation_pages(
+            start_date, end_date, per_page=per_page, transport=transport
+        )
+    ]
+    reservations: list[dict] = []
+    for page in sorted(pages, key=lambda item: item.number):
+        reservations.extend(page.reservations)
+    return reservations
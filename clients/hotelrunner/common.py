@@ -1,14 +1,53 @@
 from __future__ import annotations
 
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator, NamedTuple, Optional
 from urllib.parse import urljoin
 
+import requests
+from requests.adapters import HTTPAdapter
+from tenacity import (
+    retry,
+    retry_if_exception_type,
+    retry_if_result,
+    stop_after_attempt,
+    stop_any,
+    wait_exponential,
+)
+
 from settings import get_settings
+from utils import metrics
+
+from .tenancy import TenantMap, current_property
 
 _settings = get_settings()
 APPS_BASE_URL = _settings.hotelrunner_apps_base_url.rstrip("/")
 BASE_URL = _settings.hotelrunner_base_url.rstrip("/")
 PROPERTY_CURRENCY = _settings.property_base_currency
 
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+TRANSIENT_ERRORS = (requests.ConnectionError, requests.Timeout)
+
+
+class ConditionalResult(NamedTuple):
+    """Outcome of a conditional GET; ``value`` is ``None`` when not modified."""
+
+    value: Any
+    validators: dict[str, str]
+    not_modified: bool
+
+
+_CALL_DEADLINE: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar(
+    "hotelrunner_call_deadline", default=None
+)
+_SESSIONS: Optional[TenantMap[requests.Session]] = None
+_SESSION_PID: Optional[int] = None
+_SESSION_LOCK = threading.Lock()
+
 
 def clean_token(token: str) -> str:
     token = token.strip()
@@ -39,8 +78,181 @@ def build_url(path: str) -> str:
 
 
 def get_token() -> str:
-    return _settings.require("HOTELRUNNER_TOKEN", _settings.hotelrunner_token)
+    return _settings.require("HOTELRUNNER_TOKEN", current_property().token)
 
 
 def get_hr_id() -> str:
-    return _settings.require("HR_ID", _settings.hotelrunner_hr_id)
+    return _settings.require("HR_ID", current_property().hr_id)
+
+
+def property_currency() -> str:
+    """Base currency of the property the current request is for."""
+    return current_property().base_currency
+
+
+def get_session() -> requests.Session:
+    """Return the current property's pooled session, recreating them all after a fork.
+
+    Every property gets its own connection pools, so one busy hotel cannot
+    hold the connections another one needs. Once ``TENANT_STATE_MAX`` others
+    have been used more recently an idle property's session is only dropped:
+    requests still holding it finish on it, and its pools are closed when it
+    is garbage collected.
+    """
+    return _sessions().get()
+
+
+def _sessions() -> TenantMap[requests.Session]:
+    global _SESSIONS, _SESSION_PID
+
+    pid = os.getpid()
+    sessions = _SESSIONS
+    if sessions is not None and _SESSION_PID == pid:
+        return sessions
+    with _SESSION_LOCK:
+        if _SESSIONS is None or _SESSION_PID != pid:
+            _SESSIONS = TenantMap(lambda _prop: _build_session())
+            _SESSION_PID = pid
+        return _SESSIONS
+
+
+def reset_session() -> None:
+    global _SESSIONS, _SESSION_PID
+
+    with _SESSION_LOCK:
+        if _SESSIONS is not None and _SESSION_PID == os.getpid():
+            for session in _SESSIONS.clear():
+                session.close()
+        _SESSIONS = None
+        _SESSION_PID = None
+
+
+def _build_session() -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=_settings.http_pool_connections,
+        pool_maxsize=_settings.http_pool_maxsize,
+        pool_block=False,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"User-Agent": "retell-booking-service/1.0", "Connection": "keep-alive"})
+    return session
+
+
+@contextmanager
+def call_deadline(deadline: float) -> Iterator[None]:
+    """Bound every :func:`http_get` in this context by ``deadline`` (``time.monotonic()``).
+
+    Each call then makes a single attempt whose timeout is cut to the time
+    left, so the whole block cannot overrun the deadline by retrying. Nested
+    blocks keep the earlier of the two deadlines.
+    """
+    outer = _CALL_DEADLINE.get()
+    token = _CALL_DEADLINE.set(deadline if outer is None else min(outer, deadline))
+    try:
+        yield
+    finally:
+        _CALL_DEADLINE.reset(token)
+
+
+def _under_call_deadline(_retry_state: Any) -> bool:
+    return _CALL_DEADLINE.get() is not None
+
+
+# Tenacity arguments of every HotelRunner GET, sync (``http_get``) or async (``aio``).
+RETRY_POLICY: dict[str, Any] = dict(
+    retry=retry_if_exception_type(TRANSIENT_ERRORS)
+    | retry_if_result(lambda response: response.status_code in RETRY_STATUSES),
+    stop=stop_any(stop_after_attempt(_settings.http_retry_attempts), _under_call_deadline),
+    wait=wait_exponential(multiplier=_settings.http_retry_backoff, max=4),
+    retry_error_callback=lambda state: state.outcome.result(),
+    reraise=True,
+)
+
+
+def attempt_timeout(timeout: float) -> float:
+    """``timeout`` cut to what is left of the :func:`call_deadline`, if one is set."""
+    deadline = _CALL_DEADLINE.get()
+    if deadline is None:
+        return timeout
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise requests.Timeout("call deadline exceeded")
+    return min(timeout, remaining)
+
+
+@retry(**RETRY_POLICY)
+def http_get(
+    url: str,
+    params: dict | None = None,
+    timeout: float = 15,
+    headers: dict[str, str] | None = None,
+) -> requests.Response:
+    """GET through the pooled session, retrying connection errors and 429/5xx."""
+    timeout = attempt_timeout(timeout)
+    response = get_session().get(url, params=params, timeout=timeout, headers=headers)
+    metrics.record_response(response.status_code)
+    return response
+
+
+def check_response(response: Any, label: str) -> None:
+    """Raise the client-style ``RuntimeError`` for HTTP error responses."""
+    if response.status_code >= 400:
+        snippet = (response.text or "")[:180]
+        raise RuntimeError(f"HotelRunner {label} error {response.status_code}: {snippet}")
+
+
+def conditional_headers(validators: dict[str, str] | None) -> dict[str, str] | None:
+    if not validators:
+        return None
+    result = {}
+    if validators.get("etag"):
+        result["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        result["If-Modified-Since"] = validators["last_modified"]
+    return result or None
+
+
+def response_validators(response: requests.Response) -> dict[str, str]:
+    validators = {}
+    if response.headers.get("ETag"):
+        validators["etag"] = response.headers["ETag"]
+    if response.headers.get("Last-Modified"):
+        validators["last_modified"] = response.headers["Last-Modified"]
+    return validators
+
+
+def pool_stats() -> dict[str, object]:
+    """Connection reuse counters aggregated over every property's host pools."""
+    sessions = _SESSIONS.items() if _SESSIONS is not None and _SESSION_PID == os.getpid() else []
+    hosts: dict[str, dict[str, int]] = {}
+    properties: dict[str, dict[str, int]] = {}
+    for property_id, session in sessions:
+        totals = properties.setdefault(property_id, {"requests": 0, "connections": 0})
+        for adapter in {id(a): a for a in session.adapters.values()}.values():
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                stats = hosts.setdefault(
+                    f"{pool.scheme}://{pool.host}:{pool.port}",
+                    {"requests": 0, "connections": 0},
+                )
+                for target in (stats, totals):
+                    target["requests"] += pool.num_requests
+                    target["connections"] += pool.num_connections
+
+    requests_total = sum(item["requests"] for item in hosts.values())
+    connections_total = sum(item["connections"] for item in hosts.values())
+    for item in list(hosts.values()) + list(properties.values()):
+        item["reused"] = max(item["requests"] - item["connections"], 0)
+    return {
+        "requests": requests_total,
+        "connections": connections_total,
+        "reused": max(requests_total - connections_total, 0),
+        "pool_maxsize": _settings.http_pool_maxsize,
+        "hosts": hosts,
+        "properties": properties,
+    }
@@ -1,19 +1,40 @@
 from __future__ import annotations
 
-import requests
+from settings import get_settings
+from utils import metrics
 
-from .common import apps_params
+from .common import (
+    ConditionalResult,
+    apps_params,
+    check_response,
+    conditional_headers,
+    http_get,
+    response_validators,
+)
 
-CURRENCY_ENDPOINT = "https://app.hotelrunner.com/api/currency/currencies.json"
+CURRENCY_ENDPOINT = get_settings().hotelrunner_currency_url
 
 
 def fetch_currencies() -> list[dict]:
-    response = requests.get(CURRENCY_ENDPOINT, params=apps_params(), timeout=15)
-    if response.status_code >= 400:
-        snippet = (response.text or "")[:180]
-        raise RuntimeError(f"HotelRunner currencies error {response.status_code}: {snippet}")
-    payload = response.json() or {}
-    currencies = payload.get("currencies")
-    if isinstance(currencies, list):
-        return currencies
-    return payload if isinstance(payload, list) else []
+    return fetch_currencies_conditional().value
+
+
+def fetch_currencies_conditional(validators: dict[str, str] | None = None) -> ConditionalResult:
+    with metrics.upstream_call("currencies"):
+        response = http_get(
+            CURRENCY_ENDPOINT,
+            params=apps_params(),
+            timeout=15,
+            headers=conditional_headers(validators),
+        )
+        if response.status_code == 304:
+            return ConditionalResult(None, validators or {}, True)
+        check_response(response, "currencies")
+        return ConditionalResult(
+            currencies_from_payload(response.json()), response_validators(response), False
+        )
+
+
+def currencies_from_payload(payload: object) -> list[dict]:
+    currencies = (payload or {}).get("currencies") if isinstance(payload, dict) else payload
+    return currencies if isinstance(currencies, list) else []
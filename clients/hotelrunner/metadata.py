@@ -0,0 +1,222 @@
+"""TTL + stale-while-revalidate cache for slow-changing HotelRunner metadata."""
+from __future__ import annotations
+
+import contextvars
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from settings import get_settings
+
+from .common import ConditionalResult
+from .currencies import fetch_currencies_conditional
+from .rooms import fetch_rooms_conditional
+from .tenancy import Property, TenantMap
+
+LOGGER = logging.getLogger(__name__)
+
+Loader = Callable[[Optional[Dict[str, str]]], ConditionalResult]
+
+
+class MetadataCache:
+    """Single-value cache with background revalidation.
+
+    Within ``ttl`` the cached value is served as-is. Between ``ttl`` and
+    ``ttl + stale_ttl`` the previous value is still served while one
+    background thread revalidates it (sending ``If-None-Match`` /
+    ``If-Modified-Since`` when upstream gave validators). Past that, or
+    after :meth:`invalidate`, the next caller loads synchronously and
+    concurrent callers wait for that single load.
+    """
+
+    def __init__(self, name: str, loader: Loader, ttl: float, stale_ttl: float) -> None:
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._value: Any = None
+        self._validators: Dict[str, str] = {}
+        self._fetched_at: Optional[float] = None
+        self._refreshing = False
+        self._generation = 0
+        self._stats = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "refreshes": 0,
+            "not_modified": 0,
+            "errors": 0,
+        }
+
+    def get(self) -> Any:
+        found, value, generation = self._lookup()
+        if found:
+            return value
+
+        with self._load_lock:
+            with self._lock:
+                if self._generation != generation and self._fetched_at is not None:
+                    return self._value
+            self._load()
+            with self._lock:
+                return self._value
+
+    def peek(self) -> Any:
+        """Like :meth:`get` but never loads synchronously; ``None`` on a miss."""
+        found, value, _ = self._lookup()
+        return value if found else None
+
+    def store(self, result: ConditionalResult) -> None:
+        """Record a value fetched elsewhere (e.g. by the asyncio clients)."""
+        with self._lock:
+            if result.not_modified and self._fetched_at is None:
+                return
+            if not result.not_modified:
+                self._value = result.value
+                self._validators = dict(result.validators)
+            self._fetched_at = time.monotonic()
+            self._generation += 1
+
+    def _lookup(self) -> tuple[bool, Any, int]:
+        now = time.monotonic()
+        with self._lock:
+            age = None if self._fetched_at is None else now - self._fetched_at
+            if age is not None and age < self.ttl:
+                self._stats["hits"] += 1
+                return True, self._value, self._generation
+            if age is not None and age < self.ttl + self.stale_ttl:
+                self._stats["stale_hits"] += 1
+                if not self._refreshing:
+                    self._refreshing = True
+                    # The copied context carries the property the value belongs to.
+                    threading.Thread(
+                        target=contextvars.copy_context().run,
+                        args=(self._refresh_in_background,),
+                        name=f"metadata-refresh-{self.name}",
+                        daemon=True,
+                    ).start()
+                return True, self._value, self._generation
+            self._stats["misses"] += 1
+            return False, None, self._generation
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._value = None
+            self._validators = {}
+            self._fetched_at = None
+            self._generation += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._stats)
+            lookups = stats["hits"] + stats["stale_hits"] + stats["misses"]
+            stats["hit_ratio"] = (
+                round((stats["hits"] + stats["stale_hits"]) / lookups, 4) if lookups else None
+            )
+            stats["age_seconds"] = (
+                None if self._fetched_at is None else round(time.monotonic() - self._fetched_at, 3)
+            )
+            stats["ttl_seconds"] = self.ttl
+            stats["stale_seconds"] = self.stale_ttl
+            stats["refreshing"] = self._refreshing
+            return stats
+
+    def _load(self) -> None:
+        with self._lock:
+            validators = dict(self._validators) if self._fetched_at is not None else None
+        result = self._loader(validators)
+        if result.not_modified:
+            with self._lock:
+                if self._fetched_at is not None:
+                    self._stats["not_modified"] += 1
+                    self._fetched_at = time.monotonic()
+                    self._generation += 1
+                    return
+            # Invalidated while revalidating: there is no body to keep, fetch one.
+            result = self._loader(None)
+        with self._lock:
+            self._value = result.value
+            self._validators = dict(result.validators)
+            self._fetched_at = time.monotonic()
+            self._generation += 1
+
+    def _refresh_in_background(self) -> None:
+        try:
+            with self._load_lock:
+                self._load()
+            with self._lock:
+                self._stats["refreshes"] += 1
+        except Exception as exc:  # keep serving the previous value
+            LOGGER.warning("Background refresh of %s metadata failed: %s", self.name, exc)
+            with self._lock:
+                self._stats["errors"] += 1
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+
+_settings = get_settings()
+CACHE_NAMES = ("rooms", "currencies")
+
+
+def _build_caches(_prop: Property) -> Dict[str, MetadataCache]:
+    return {
+        "rooms": MetadataCache(
+            "rooms",
+            fetch_rooms_conditional,
+            ttl=_settings.metadata_ttl_seconds,
+            stale_ttl=_settings.metadata_stale_seconds,
+        ),
+        "currencies": MetadataCache(
+            "currencies",
+            fetch_currencies_conditional,
+            ttl=_settings.metadata_ttl_seconds,
+            stale_ttl=_settings.metadata_stale_seconds,
+        ),
+    }
+
+
+# One set of caches per property; the least recently used property's are dropped.
+_TENANT_CACHES: TenantMap[Dict[str, MetadataCache]] = TenantMap(_build_caches)
+
+
+def rooms_cache() -> MetadataCache:
+    return _TENANT_CACHES.get()["rooms"]
+
+
+def currencies_cache() -> MetadataCache:
+    return _TENANT_CACHES.get()["currencies"]
+
+
+def get_rooms() -> list[dict]:
+    return rooms_cache().get()
+
+
+def get_currencies() -> list[dict]:
+    return currencies_cache().get()
+
+
+def invalidate(name: str | None = None) -> list[str]:
+    """Drop one cached metadata value (or all of them) of the current property."""
+    if name is not None and name not in CACHE_NAMES:
+        raise KeyError(f"Unknown metadata cache: {name}")
+    names = [name] if name else list(CACHE_NAMES)
+    caches = _TENANT_CACHES.get()
+    for item in names:
+        caches[item].invalidate()
+    return names
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Stats of the current property's caches."""
+    return {name: cache.stats() for name, cache in _TENANT_CACHES.get().items()}
+
+
+def cache_stats_by_property() -> Dict[str, Dict[str, Dict[str, Any]]]:
+    return {
+        property_id: {name: cache.stats() for name, cache in caches.items()}
+        for property_id, caches in _TENANT_CACHES.items()
+    }
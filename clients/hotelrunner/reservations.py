@@ -1,40 +1,284 @@
 from __future__ import annotations
 
+import contextvars
 import datetime as dt
-from typing import Iterable
+import math
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, Iterator, NamedTuple, Optional
 
-import requests
+from settings import get_settings
+from utils import metrics
 
-from .common import APPS_BASE_URL, apps_params
+from .common import APPS_BASE_URL, apps_params, check_response, http_get
+from .tenancy import Property, TenantMap, current_property
+
+_settings = get_settings()
+_PAGE_EXECUTORS: Optional[TenantMap[ThreadPoolExecutor]] = None
+_PAGE_EXECUTORS_PID: Optional[int] = None
+_PAGE_EXECUTORS_LOCK = threading.Lock()
+
+MIN_PAGE_SIZE = 20
+# Lower bound on the last-update time for ``modified=true`` fetches.
+MODIFIED_SINCE_PARAM = "from_last_update_date"
+_DENSITY_LOCK = threading.Lock()
+# Per property id: reservations per day of window (smoothed) and longest stay seen, in nights.
+_observed_density: Dict[str, float] = {}
+_observed_max_stay: Dict[str, int] = {}
+
+
+def _page_executor() -> ThreadPoolExecutor:
+    """Page fan-out pool of the current property.
+
+    Each property gets ``reservation_page_concurrency`` threads of its own,
+    so one hotel's large windows cannot queue every other hotel's pages. An
+    evicted pool is only dropped, not shut down: iterators still holding it
+    keep submitting, and its idle threads exit once it is garbage collected.
+    """
+    global _PAGE_EXECUTORS, _PAGE_EXECUTORS_PID
+
+    pid = os.getpid()
+    executors = _PAGE_EXECUTORS
+    if executors is None or _PAGE_EXECUTORS_PID != pid:
+        with _PAGE_EXECUTORS_LOCK:
+            if _PAGE_EXECUTORS is None or _PAGE_EXECUTORS_PID != pid:
+                _PAGE_EXECUTORS = TenantMap(_new_page_executor)
+                _PAGE_EXECUTORS_PID = pid
+            executors = _PAGE_EXECUTORS
+    return executors.get()
+
+
+def _new_page_executor(prop: Property) -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(
+        max_workers=_settings.reservation_page_concurrency,
+        thread_name_prefix=f"hotelrunner-pages-{prop.id}",
+    )
+
+
+class ReservationPage(NamedTuple):
+    number: int
+    reservations: list[dict]
 
 
 def fetch_reservations(
     start_date: dt.date,
     end_date: dt.date,
-    per_page: int = 100,
+    per_page: int | None = None,
 ) -> list[dict]:
+    pages = sorted(
+        iter_reservation_pages(start_date, end_date, per_page=per_page),
+        key=lambda page: page.number,
+    )
     reservations: list[dict] = []
-    page = 1
-    while True:
-        params = apps_params(
-            {
-                "from_date": start_date.strftime("%Y-%m-%d"),
-                "to_date": end_date.strftime("%Y-%m-%d"),
-                "page": page,
-                "per_page": per_page,
-                "undelivered": "false",
-                "modified": "false",
-                "booked": "false",
-            }
-        )
-        url = f"{APPS_BASE_URL}/reservations"
-        response = requests.get(url, params=params, timeout=20)
-        if response.status_code >= 400:
-            snippet = (response.text or "")[:180]
-            raise RuntimeError(f"HotelRunner reservations error {response.status_code}: {snippet}")
-        batch = (response.json() or {}).get("reservations", [])
-        reservations.extend(batch)
-        if len(batch) < per_page:
-            break
-        page += 1
+    for page in pages:
+        reservations.extend(page.reservations)
     return reservations
+
+
+def fetch_modified_reservations(
+    start_date: dt.date, end_date: dt.date, since: str, per_page: int | None = None
+) -> list[dict]:
+    """Reservations checking in within the window and created, changed or cancelled since ``since``.
+
+    ``since`` is an ISO timestamp sent as ``MODIFIED_SINCE_PARAM`` along
+    with ``modified=true``. ``undelivered`` stays ``false`` so the result
+    does not depend on (or change) what other channel apps acknowledged.
+    """
+    filters = {"modified": "true", MODIFIED_SINCE_PARAM: since}
+    pages = sorted(
+        iter_reservation_pages(start_date, end_date, per_page=per_page, filters=filters),
+        key=lambda page: page.number,
+    )
+    return [reservation for page in pages for reservation in page.reservations]
+
+
+def iter_reservation_pages(
+    start_date: dt.date,
+    end_date: dt.date,
+    per_page: int | None = None,
+    concurrency: int | None = None,
+    filters: Optional[Dict[str, str]] = None,
+) -> Iterator[ReservationPage]:
+    """Yield reservation pages as soon as each one arrives.
+
+    The first page is fetched alone to learn the page count; the remaining
+    pages are then requested in parallel (at most ``concurrency`` at a time)
+    and yielded in completion order. If upstream does not report a page
+    count, pages are walked serially until a short page is returned.
+    ``filters`` override the default query flags; such fetches are not
+    counted towards the observed reservation density.
+    """
+    per_page = per_page or choose_page_size(start_date, end_date)
+    concurrency = max(concurrency or _settings.reservation_page_concurrency, 1)
+
+    first, payload = _fetch_page(start_date, end_date, 1, per_page, filters)
+    total_seen = len(first)
+
+    page_count = page_count_from(payload, per_page)
+    if page_count is None:
+        yield ReservationPage(1, first)
+        page = 1
+        batch = first
+        while len(batch) >= per_page:
+            page += 1
+            batch, _ = _fetch_page(start_date, end_date, page, per_page, filters)
+            total_seen += len(batch)
+            yield ReservationPage(page, batch)
+        if filters is None:
+            record_density(start_date, end_date, total_seen)
+        metrics.RESERVATION_PAGES.observe(page)
+        return
+
+    remaining = iter(range(2, page_count + 1))
+    in_flight: dict[Future, int] = {}
+    executor = _page_executor()
+
+    def submit_next() -> None:
+        page = next(remaining, None)
+        if page is not None:
+            future = executor.submit(
+                contextvars.copy_context().run,
+                _fetch_page,
+                start_date,
+                end_date,
+                page,
+                per_page,
+                filters,
+            )
+            in_flight[future] = page
+
+    try:
+        for _ in range(concurrency):
+            submit_next()
+        yield ReservationPage(1, first)
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                page = in_flight.pop(future)
+                batch, _ = future.result()
+                total_seen += len(batch)
+                submit_next()
+                yield ReservationPage(page, batch)
+    finally:
+        for future in in_flight:
+            future.cancel()
+    if filters is None:
+        record_density(start_date, end_date, total_seen)
+    metrics.RESERVATION_PAGES.observe(page_count)
+
+
+def choose_page_size(start_date: dt.date, end_date: dt.date) -> int:
+    """Size pages to the expected window volume, capped at the upstream maximum.
+
+    Small windows get one right-sized page; large ones get full pages so the
+    parallel fan-out has as few round trips as possible.
+    """
+    maximum = _settings.reservation_max_page_size
+    with _DENSITY_LOCK:
+        density = _observed_density.get(current_property().id)
+    if density is None:
+        return maximum
+    days = max((end_date - start_date).days, 1)
+    expected = math.ceil(density * days * 1.25)
+    return min(max(expected, MIN_PAGE_SIZE), maximum)
+
+
+def overlap_window(first_night: dt.date, check_out: dt.date) -> tuple[dt.date, dt.date]:
+    """Check-in range covering every reservation that can occupy ``[first_night, check_out)``.
+
+    Upstream filters on check-in, so a stay overlaps only if it checks in
+    before ``check_out`` and at most ``longest stay - 1`` days before
+    ``first_night``. ``to_date`` is ``check_out`` itself so the range is
+    complete whether upstream treats it as inclusive or exclusive.
+    """
+    return first_night - dt.timedelta(days=stay_lookback_days()), check_out
+
+
+def stay_lookback_days() -> int:
+    """Days to look back for stays still running on the first requested night.
+
+    ``RESERVATION_LOOKBACK_DAYS`` is the floor: stays are only observed
+    inside windows this lookback produced, so the longest one seen (kept
+    per process, lost on restart) can only widen it, up to
+    ``RESERVATION_MAX_LOOKBACK_DAYS``.
+    """
+    with _DENSITY_LOCK:
+        longest = _observed_max_stay.get(current_property().id)
+    minimum = _settings.reservation_lookback_days
+    if longest is None:
+        return minimum
+    return max(minimum, min(longest - 1, _settings.reservation_max_lookback_days))
+
+
+def record_max_stay(nights: int) -> None:
+    if nights <= 0:
+        return
+    property_id = current_property().id
+    with _DENSITY_LOCK:
+        if nights > _observed_max_stay.get(property_id, 0):
+            _observed_max_stay[property_id] = nights
+
+
+def record_density(start_date: dt.date, end_date: dt.date, total: int) -> None:
+    days = max((end_date - start_date).days, 1)
+    sample = total / days
+    property_id = current_property().id
+    with _DENSITY_LOCK:
+        previous = _observed_density.get(property_id)
+        _observed_density[property_id] = (
+            sample if previous is None else 0.7 * previous + 0.3 * sample
+        )
+
+
+def _fetch_page(
+    start_date: dt.date,
+    end_date: dt.date,
+    page: int,
+    per_page: int,
+    filters: Optional[Dict[str, str]] = None,
+) -> tuple[list[dict], dict]:
+    url = f"{APPS_BASE_URL}/reservations"
+    with metrics.upstream_call("reservations"):
+        response = http_get(
+            url, params=page_params(start_date, end_date, page, per_page, filters), timeout=20
+        )
+        check_response(response, "reservations")
+        payload = response.json() or {}
+    return payload.get("reservations", []), payload
+
+
+def page_params(
+    start_date: dt.date,
+    end_date: dt.date,
+    page: int,
+    per_page: int,
+    filters: Optional[Dict[str, str]] = None,
+) -> dict:
+    return apps_params(
+        {
+            "from_date": start_date.strftime("%Y-%m-%d"),
+            "to_date": end_date.strftime("%Y-%m-%d"),
+            "page": page,
+            "per_page": per_page,
+            "undelivered": "false",
+            "modified": "false",
+            "booked": "false",
+            **(filters or {}),
+        }
+    )
+
+
+def page_count_from(payload: dict, per_page: int) -> int | None:
+    reported_size = payload.get("per_page")
+    if isinstance(reported_size, int) and reported_size > 0:
+        per_page = reported_size
+    for key in ("pages", "total_pages", "page_count"):
+        value = payload.get(key)
+        if isinstance(value, int) and value >= 1:
+            return value
+    for key in ("count", "total", "total_count"):
+        value = payload.get(key)
+        if isinstance(value, int) and value >= 0:
+            return max(math.ceil(value / per_page), 1)
+    return None
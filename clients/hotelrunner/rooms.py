@@ -1,15 +1,36 @@
 from __future__ import annotations
 
-import requests
+from utils import metrics
 
-from .common import APPS_BASE_URL, apps_params
+from .common import (
+    APPS_BASE_URL,
+    ConditionalResult,
+    apps_params,
+    check_response,
+    conditional_headers,
+    http_get,
+    response_validators,
+)
 
 
 def fetch_rooms() -> list[dict]:
+    return fetch_rooms_conditional().value
+
+
+def fetch_rooms_conditional(validators: dict[str, str] | None = None) -> ConditionalResult:
     url = f"{APPS_BASE_URL}/rooms"
-    response = requests.get(url, params=apps_params(), timeout=15)
-    if response.status_code >= 400:
-        snippet = (response.text or "")[:180]
-        raise RuntimeError(f"HotelRunner rooms error {response.status_code}: {snippet}")
-    payload = response.json() or {}
-    return payload.get("rooms", [])
+    with metrics.upstream_call("rooms"):
+        response = http_get(
+            url, params=apps_params(), timeout=15, headers=conditional_headers(validators)
+        )
+        if response.status_code == 304:
+            return ConditionalResult(None, validators or {}, True)
+        check_response(response, "rooms")
+        return ConditionalResult(
+            rooms_from_payload(response.json()), response_validators(response), False
+        )
+
+
+def rooms_from_payload(payload: object) -> list[dict]:
+    rooms = payload.get("rooms") if isinstance(payload, dict) else None
+    return rooms if isinstance(rooms, list) else []
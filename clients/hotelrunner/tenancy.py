@@ -0,0 +1,291 @@
+"""Which HotelRunner property (hotel) the current request is working for.
+
+The selected :class:`Property` lives in a context variable, so upstream
+calls made from executor threads (submitted through
+``contextvars.copy_context``) and asyncio tasks use the credentials of the
+request that started them. Without a selection the registry's default
+property is used, which keeps single-hotel deployments unchanged.
+"""
+from __future__ import annotations
+
+import contextvars
+import json
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Generic, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+from settings import Settings, get_settings
+from utils import metrics
+
+T = TypeVar("T")
+
+DEFAULT_PROPERTY_ID = "default"
+
+
+@dataclass(frozen=True)
+class Property:
+    id: str
+    hr_id: Optional[str]
+    token: Optional[str] = field(repr=False)
+    base_currency: str = "TRY"
+
+
+class UnknownPropertyError(KeyError):
+    pass
+
+
+class PropertyBusyError(RuntimeError):
+    pass
+
+
+class PropertyRegistry:
+    """Credentials of every property this process may serve."""
+
+    def __init__(self, properties: Iterable[Property], default_id: Optional[str] = None) -> None:
+        self._properties: Dict[str, Property] = {item.id: item for item in properties}
+        self._by_hr_id: Dict[str, Property] = {
+            item.hr_id: item for item in self._properties.values() if item.hr_id
+        }
+        if not self._properties:
+            raise ValueError("property registry is empty")
+        self.default_id = default_id or next(iter(self._properties))
+        if self.default_id not in self._properties:
+            raise ValueError(f"default property '{self.default_id}' is not registered")
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "PropertyRegistry":
+        """Load ``PROPERTIES_FILE`` / ``PROPERTIES_JSON``, else the single ``HR_ID`` property.
+
+        Both sources hold ``{"default": id, "properties": [{"id", "hr_id",
+        "token" | "token_env", "base_currency"}]}`` (a bare list works too);
+        ``token_env`` names an environment variable so tokens need not be
+        stored in the file.
+        """
+        raw = None
+        if settings.properties_file:
+            raw = Path(settings.properties_file).read_text()
+        elif settings.properties_json:
+            raw = settings.properties_json
+        if raw is None:
+            single = Property(
+                DEFAULT_PROPERTY_ID,
+                settings.hotelrunner_hr_id,
+                settings.hotelrunner_token,
+                settings.property_base_currency,
+            )
+            return cls([single])
+
+        data = json.loads(raw)
+        entries = data.get("properties", []) if isinstance(data, dict) else data
+        default_id = (data.get("default") if isinstance(data, dict) else None) or (
+            settings.default_property_id
+        )
+        properties = [
+            Property(
+                id=str(entry["id"]),
+                hr_id=str(entry["hr_id"]),
+                token=entry.get("token") or os.getenv(entry.get("token_env") or ""),
+                base_currency=(
+                    entry.get("base_currency") or settings.property_base_currency
+                ).upper(),
+            )
+            for entry in entries
+        ]
+        return cls(properties, default_id)
+
+    @property
+    def default(self) -> Property:
+        return self._properties[self.default_id]
+
+    def get(self, property_id: str) -> Property:
+        try:
+            return self._properties[property_id]
+        except KeyError:
+            raise UnknownPropertyError(property_id) from None
+
+    def by_hr_id(self, hr_id: str) -> Property:
+        try:
+            return self._by_hr_id[hr_id]
+        except KeyError:
+            raise UnknownPropertyError(hr_id) from None
+
+    def ids(self) -> List[str]:
+        return list(self._properties)
+
+    def __len__(self) -> int:
+        return len(self._properties)
+
+
+_REGISTRY: Optional[PropertyRegistry] = None
+_REGISTRY_LOCK = threading.Lock()
+_CURRENT: contextvars.ContextVar[Optional[Property]] = contextvars.ContextVar(
+    "hotelrunner_property", default=None
+)
+
+
+def registry() -> PropertyRegistry:
+    global _REGISTRY
+
+    if _REGISTRY is None:
+        with _REGISTRY_LOCK:
+            if _REGISTRY is None:
+                _REGISTRY = PropertyRegistry.from_settings(get_settings())
+    return _REGISTRY
+
+
+def set_registry(value: Optional[PropertyRegistry]) -> None:
+    """Replace the registry (``None`` reloads it from settings on next use)."""
+    global _REGISTRY
+
+    with _REGISTRY_LOCK:
+        _REGISTRY = value
+
+
+def current_property() -> Property:
+    return _CURRENT.get() or registry().default
+
+
+def activate(property_id: Optional[str]) -> Tuple[contextvars.Token, contextvars.Token]:
+    """Select ``property_id`` (or the default) for the current context."""
+    prop = registry().get(property_id) if property_id else registry().default
+    return _CURRENT.set(prop), metrics.bind_property(prop.id)
+
+
+def deactivate(tokens: Tuple[contextvars.Token, contextvars.Token]) -> None:
+    _CURRENT.reset(tokens[0])
+    metrics.unbind_property(tokens[1])
+
+
+@contextmanager
+def use_property(property_id: Optional[str]) -> Iterator[Property]:
+    tokens = activate(property_id)
+    try:
+        yield current_property()
+    finally:
+        deactivate(tokens)
+
+
+class TenantMap(Generic[T]):
+    """Per-property values created on first use, bounded across properties.
+
+    Holds at most ``max_size`` values; using a property marks it most
+    recently used and the least recently used one is evicted (and handed
+    to ``on_evict``) to make room, so idle hotels give their memory back.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[Property], T],
+        max_size: Optional[int] = None,
+        on_evict: Optional[Callable[[T], None]] = None,
+    ) -> None:
+        self._factory = factory
+        self.max_size = max(max_size or get_settings().tenant_state_max, 1)
+        self._on_evict = on_evict
+        self._values: "OrderedDict[str, T]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, prop: Optional[Property] = None) -> T:
+        prop = prop or current_property()
+        evicted: List[T] = []
+        with self._lock:
+            value = self._values.get(prop.id)
+            if value is not None:
+                self._values.move_to_end(prop.id)
+                return value
+            value = self._values[prop.id] = self._factory(prop)
+            while len(self._values) > self.max_size:
+                evicted.append(self._values.popitem(last=False)[1])
+        for item in evicted:
+            if self._on_evict is not None:
+                self._on_evict(item)
+        return value
+
+    def peek(self, property_id: str) -> Optional[T]:
+        with self._lock:
+            return self._values.get(property_id)
+
+    def items(self) -> List[Tuple[str, T]]:
+        with self._lock:
+            return list(self._values.items())
+
+    def clear(self) -> List[T]:
+        with self._lock:
+            values = list(self._values.values())
+            self._values.clear()
+        return values
+
+
+class _Admission:
+    """Per-property cap on concurrently served requests."""
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.semaphore = threading.BoundedSemaphore(limit)
+        self.in_flight = 0
+
+
+_ADMISSIONS: Dict[str, _Admission] = {}
+_ADMISSIONS_LOCK = threading.Lock()
+
+
+def acquire_slot(
+    prop: Optional[Property] = None, timeout: Optional[float] = None
+) -> Callable[[], None]:
+    """Take one of the property's ``TENANT_MAX_INFLIGHT`` request slots; returns its release.
+
+    Raises :class:`PropertyBusyError` right away when none is free (or after
+    ``timeout`` seconds, if given), so a flood of requests for one hotel is
+    turned away instead of holding the worker threads every hotel shares.
+    """
+    prop = prop or current_property()
+    with _ADMISSIONS_LOCK:
+        admission = _ADMISSIONS.get(prop.id)
+        if admission is None:
+            limit = max(get_settings().tenant_max_inflight, 1)
+            admission = _ADMISSIONS[prop.id] = _Admission(limit)
+    if timeout:
+        acquired = admission.semaphore.acquire(timeout=timeout)
+    else:
+        acquired = admission.semaphore.acquire(blocking=False)
+    if not acquired:
+        metrics.PROPERTY_REJECTIONS.inc(property=prop.id)
+        raise PropertyBusyError(f"property {prop.id} is at its concurrency limit")
+    with _ADMISSIONS_LOCK:
+        admission.in_flight += 1
+
+    def release() -> None:
+        with _ADMISSIONS_LOCK:
+            admission.in_flight -= 1
+        admission.semaphore.release()
+
+    return release
+
+
+@contextmanager
+def admit(prop: Optional[Property] = None, timeout: Optional[float] = None) -> Iterator[None]:
+    release = acquire_slot(prop, timeout)
+    try:
+        yield
+    finally:
+        release()
+
+
+def _inflight_samples():
+    with _ADMISSIONS_LOCK:
+        counts = {property_id: item.in_flight for property_id, item in _ADMISSIONS.items()}
+    for property_id, value in counts.items():
+        yield (
+            "property_inflight_requests",
+            "gauge",
+            "Requests currently admitted per property.",
+            {"property": property_id},
+            value,
+        )
+
+
+metrics.REGISTRY.register_collector(_inflight_samples, merge="sum")
@@ -2,7 +2,7 @@
 from __future__ import annotations
 
 from decimal import Decimal, ROUND_HALF_UP
-from typing import Optional, Tuple
+from typing import Iterable, List, Optional, Tuple
 
 COUNTRY_TO_CURRENCY = {
     "DE": "EUR",
@@ -64,3 +64,42 @@ def apply_fx(
     display_amount = round_money(base_amount * rate, display_currency)
     display_minor = int(display_amount * (Decimal(10) ** display_digits))
     return display_minor, rate.quantize(Decimal("0.00001"))
+
+
+def to_minor(amount: float, currency: str) -> int:
+    """``amount`` in minor units of ``currency``, rounded half-up."""
+    digits = CURRENCY_MINOR_UNITS.get(currency.upper(), 2)
+    return int(round_money(Decimal(str(amount)), currency).scaleb(digits))
+
+
+def from_minor(amount_minor: int, currency: str) -> float:
+    return amount_minor / 10 ** CURRENCY_MINOR_UNITS.get(currency.upper(), 2)
+
+
+def convert_minor_batch(
+    amounts_minor: Iterable[int],
+    base_currency: str,
+    display_currency: str,
+    rate: Decimal,
+) -> List[int]:
+    """Batch form of :func:`apply_fx` for many amounts at one rate.
+
+    The rate and both minor-unit scales are folded into one integer
+    fraction up front, so each amount costs a multiply and a floor division
+    instead of a round trip through ``Decimal``. Rounding is ROUND_HALF_UP
+    (away from zero on ties), as in :func:`round_money`.
+    """
+    base_digits = CURRENCY_MINOR_UNITS.get(base_currency.upper(), 2)
+    display_digits = CURRENCY_MINOR_UNITS.get(display_currency.upper(), 2)
+    numerator, denominator = rate.as_integer_ratio()
+    numerator *= 2 * 10**display_digits
+    denominator *= 10**base_digits
+    twice = 2 * denominator
+    return [
+        (
+            (amount * numerator + denominator) // twice
+            if amount >= 0
+            else -((-amount * numerator + denominator) // twice)
+        )
+        for amount in amounts_minor
+    ]
@@ -0,0 +1,23 @@
+"""gunicorn hooks: start warming every worker up right after the fork (see ``warmup.py``).
+
+gunicorn reads this file from the working directory, so the plain
+``gunicorn app:app`` start command picks it up. The warmup runs in a
+background thread, so a slow upstream cannot hold a booting worker past
+gunicorn's timeout; ``/readyz`` answers 503 until it is done. Started with
+``--preload``, the master also imports the app and runs
+``warmup.MASTER_PHASES`` once; the workers inherit their effect and only
+open connections and prime caches themselves.
+"""
+
+
+def when_ready(server):
+    if server.cfg.preload_app:
+        import warmup
+
+        warmup.run(warmup.MASTER_PHASES)
+
+
+def post_worker_init(worker):
+    import warmup
+
+    warmup.ensure_started()
@@ -1,5 +1,21 @@
 """Backward-compatible export for availability service."""
-from services.availability.models import AvailabilityRequest, AvailabilityResponse
-from services.availability.service import get_availability
+from services.availability.aio import get_availability_async
+from services.availability.models import (
+    AvailabilityRequest,
+    AvailabilityResponse,
+    ColumnarAvailabilityResponse,
+    PriceConversion,
+    RunLengthAvailabilityResponse,
+)
+from services.availability.service import get_availability, get_availability_batch
 
-__all__ = ["AvailabilityRequest", "AvailabilityResponse", "get_availability"]
+__all__ = [
+    "AvailabilityRequest",
+    "AvailabilityResponse",
+    "ColumnarAvailabilityResponse",
+    "PriceConversion",
+    "RunLengthAvailabilityResponse",
+    "get_availability",
+    "get_availability_batch",
+    "get_availability_async",
+]
@@ -0,0 +1 @@
+"""Local HotelRunner stand-in and end-to-end load driver."""
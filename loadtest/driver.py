@@ -0,0 +1,287 @@
+"""End-to-end load driver: ``app:app`` under gunicorn against the fake HotelRunner.
+
+::
+
+    python -m loadtest.driver --concurrency 1,8,32 --duration 10
+    python -m loadtest.driver --endpoints check_availability --latency-ms 80 --error-rate 0.02
+
+Starts :mod:`loadtest.fake_hotelrunner` in-process (or uses ``--upstream``),
+launches gunicorn with the app pointed at it, drives every endpoint at each
+concurrency level for ``--duration`` seconds and prints throughput plus
+p50/p95/p99 latency. ``--json`` also writes the report to a file.
+"""
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import requests
+
+from loadtest.fake_hotelrunner import FakeHotelRunner, add_arguments, config_from_args
+
+ROOT = Path(__file__).resolve().parent.parent
+TOOL_SECRET = "loadtest-secret"
+
+RequestSpec = Tuple[str, str, dict, Dict[str, str]]  # method, path, json body, headers
+
+
+@dataclass
+class LevelReport:
+    endpoint: str
+    concurrency: int
+    requests: int
+    errors: int
+    throughput: float  # requests per second
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+
+
+def percentile(samples: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile of ``samples`` (``q`` in 0-100)."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(math.ceil(q / 100 * len(ordered)), 1)
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def endpoint_builders(
+    start: dt.date, horizon: int
+) -> Dict[str, Callable[[random.Random], RequestSpec]]:
+    def stay(rng: random.Random) -> Tuple[str, str]:
+        check_in = start + dt.timedelta(days=rng.randint(1, max(horizon - 15, 1)))
+        return check_in.isoformat(), (check_in + dt.timedelta(days=rng.randint(1, 14))).isoformat()
+
+    def check_availability(rng: random.Random) -> RequestSpec:
+        check_in, check_out = stay(rng)
+        body = {"check_in": check_in, "check_out": check_out, "adults": 2, "children": 0}
+        return "POST", "/retell/public/check_availability", body, {}
+
+    def batch(rng: random.Random) -> RequestSpec:
+        items = []
+        for _ in range(5):
+            check_in, check_out = stay(rng)
+            items.append({"check_in": check_in, "check_out": check_out, "adults": 2, "children": 1})
+        return "POST", "/retell/public/check_availability_batch", {"requests": items}, {}
+
+    def flexible_search(rng: random.Random) -> RequestSpec:
+        window_start, _ = stay(rng)
+        window_end = (dt.date.fromisoformat(window_start) + dt.timedelta(days=30)).isoformat()
+        body = {
+            "window_start": window_start,
+            "window_end": window_end,
+            "nights": rng.randint(2, 7),
+            "adults": 2,
+            "children": 0,
+        }
+        return "POST", "/retell/public/flexible_search", body, {}
+
+    def compose_offer(rng: random.Random) -> RequestSpec:
+        body = {
+            "availability_result": {
+                "total": rng.randint(2000, 90000),
+                "currency": "TRY",
+                "nights": 3,
+            },
+            "display_currency": rng.choice(("EUR", "USD", "GBP")),
+        }
+        return "POST", "/retell/tool/compose_offer", body, {"X-Tool-Secret": TOOL_SECRET}
+
+    return {
+        "check_availability": check_availability,
+        "batch": batch,
+        "flexible_search": flexible_search,
+        "compose_offer": compose_offer,
+    }
+
+
+def drive(
+    base_url: str,
+    build: Callable[[random.Random], RequestSpec],
+    concurrency: int,
+    duration: float,
+    endpoint: str,
+) -> LevelReport:
+    latencies: List[float] = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def worker(seed: int) -> None:
+        rng = random.Random(seed)
+        session = requests.Session()
+        local: List[float] = []
+        failed = 0
+        while time.perf_counter() < stop_at:
+            method, path, body, headers = build(rng)
+            started = time.perf_counter()
+            try:
+                response = session.request(
+                    method, base_url + path, json=body, headers=headers, timeout=60
+                )
+                ok = response.status_code < 400
+            except requests.RequestException:
+                ok = False
+            local.append(time.perf_counter() - started)
+            failed += not ok
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return LevelReport(
+        endpoint=endpoint,
+        concurrency=concurrency,
+        requests=len(latencies),
+        errors=errors[0],
+        throughput=round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        p50_ms=round(percentile(latencies, 50) * 1e3, 2),
+        p95_ms=round(percentile(latencies, 95) * 1e3, 2),
+        p99_ms=round(percentile(latencies, 99) * 1e3, 2),
+    )
+
+
+def start_gunicorn(
+    port: int, upstream_env: Dict[str, str], workers: int, threads: int
+) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update(upstream_env)
+    env.setdefault("HOTELRUNNER_TOKEN", "loadtest-token")
+    env.setdefault("HR_ID", "loadtest-hr")
+    env["TOOL_SECRET"] = TOOL_SECRET
+    env["GUNICORN_THREADS"] = str(threads)
+    command = [
+        sys.executable,
+        "-m",
+        "gunicorn",
+        "app:app",
+        "--bind",
+        f"127.0.0.1:{port}",
+        "--workers",
+        str(workers),
+        "--threads",
+        str(threads),
+        "--log-level",
+        "warning",
+    ]
+    return subprocess.Popen(command, cwd=ROOT, env=env)
+
+
+def wait_ready(base_url: str, process: subprocess.Popen, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with {process.returncode}")
+        try:
+            if requests.get(f"{base_url}/readyz", timeout=1).ok:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("gunicorn did not become ready in time")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def format_report(reports: List[LevelReport]) -> str:
+    header = f"{'endpoint':<20} {'conc':>5} {'reqs':>7} {'err':>5} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+    lines = [header, "-" * len(header)]
+    for r in reports:
+        lines.append(
+            f"{r.endpoint:<20} {r.concurrency:>5} {r.requests:>7} {r.errors:>5} "
+            f"{r.throughput:>9.1f} {r.p50_ms:>9.1f} {r.p95_ms:>9.1f} {r.p99_ms:>9.1f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated levels")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per level")
+    parser.add_argument(
+        "--endpoints", default="check_availability,batch,flexible_search,compose_offer"
+    )
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers")
+    parser.add_argument("--threads", type=int, default=8, help="gunicorn threads per worker")
+    parser.add_argument("--upstream", help="base URL of an already running fake upstream")
+    parser.add_argument("--json", type=Path, help="write the report to this file")
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+    config = config_from_args(args)
+    builders = endpoint_builders(config.start, config.nights)
+    selected = [name.strip() for name in args.endpoints.split(",") if name.strip()]
+    unknown = sorted(set(selected) - set(builders))
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(unknown)}")
+
+    fake: Optional[FakeHotelRunner] = None
+    if args.upstream:
+        base = args.upstream.rstrip("/")
+        upstream_env = {
+            "HOTELRUNNER_APPS_BASE_URL": f"{base}/api/v2/apps",
+            "HOTELRUNNER_CURRENCY_URL": f"{base}/api/currency/currencies.json",
+            "FX_API_URL": f"{base}/fx/latest",
+        }
+    else:
+        fake = FakeHotelRunner(config).start()
+        upstream_env = fake.env()
+
+    port = free_port()
+    app_url = f"http://127.0.0.1:{port}"
+    process = start_gunicorn(port, upstream_env, args.workers, args.threads)
+    reports: List[LevelReport] = []
+    try:
+        wait_ready(app_url, process)
+        for name in selected:
+            for level in levels:
+                report = drive(app_url, builders[name], level, args.duration, name)
+                reports.append(report)
+                print(format_report([report]).splitlines()[-1], flush=True)
+    finally:
+        process.terminate()
+        process.wait(timeout=15)
+        if fake is not None:
+            fake.stop()
+
+    print()
+    print(format_report(reports))
+    if fake is not None:
+        print(f"\nupstream requests: {json.dumps(fake.requests, sort_keys=True)}")
+    if args.json:
+        document = {
+            "config": {**vars(args), "json": str(args.json)},
+            "results": [asdict(r) for r in reports],
+        }
+        args.json.write_text(json.dumps(document, indent=2, default=str) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
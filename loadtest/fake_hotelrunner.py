@@ -0,0 +1,239 @@
+"""Local stand-in for the HotelRunner, currency and FX endpoints.
+
+Serves synthetic data from :mod:`benchmarks.datasets` with HotelRunner's
+pagination semantics, plus configurable latency, error rate and data size::
+
+    python -m loadtest.fake_hotelrunner --port 8900 --latency-ms 40 --error-rate 0.01
+
+Point the app at it with the variables printed on start-up
+(``HOTELRUNNER_APPS_BASE_URL``, ``HOTELRUNNER_CURRENCY_URL``, ``FX_API_URL``).
+"""
+from __future__ import annotations
+
+import argparse
+import bisect
+import datetime as dt
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks.datasets import Dataset, DatasetSpec, generate
+
+APPS_PREFIX = "/api/v2/apps"
+CURRENCY_PATH = "/api/currency/currencies.json"
+FX_PATH = "/fx/latest"
+MAX_PER_PAGE = 100
+EUR_RATES = {"EUR": 1.0, "TRY": 35.12, "USD": 1.08, "GBP": 0.85, "CHF": 0.94}
+
+
+@dataclass
+class FakeConfig:
+    room_types: int = 20
+    reservations: int = 5_000
+    nights: int = 120
+    seed: int = 42
+    start: dt.date = field(default_factory=dt.date.today)
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    error_status: int = 503
+
+
+class FakeHotelRunner:
+    """Threaded HTTP server holding one synthetic property."""
+
+    def __init__(self, config: Optional[FakeConfig] = None) -> None:
+        self.config = config or FakeConfig()
+        self.dataset: Dataset = generate(
+            DatasetSpec(
+                room_types=self.config.room_types,
+                reservations=self.config.reservations,
+                nights=self.config.nights,
+                seed=self.config.seed,
+                start=self.config.start,
+            )
+        )
+        ordered = sorted(self.dataset.reservations, key=lambda r: (r["check_in"], r["id"]))
+        self._reservations = ordered
+        self._check_ins = [r["check_in"] for r in ordered]
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self.requests: Dict[str, int] = {}
+
+    @property
+    def base_url(self) -> str:
+        if self._server is None:
+            raise RuntimeError("fake HotelRunner is not running")
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self) -> Dict[str, str]:
+        """Environment variables that point the app at this server."""
+        return {
+            "HOTELRUNNER_BASE_URL": self.base_url,
+            "HOTELRUNNER_APPS_BASE_URL": f"{self.base_url}{APPS_PREFIX}",
+            "HOTELRUNNER_CURRENCY_URL": f"{self.base_url}{CURRENCY_PATH}",
+            "FX_API_URL": f"{self.base_url}{FX_PATH}",
+        }
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> "FakeHotelRunner":
+        self._server = ThreadingHTTPServer((host, port), _handler_for(self))
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="fake-hotelrunner", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "FakeHotelRunner":
+        return self.start() if self._server is None else self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.stop()
+
+    # -- responses -----------------------------------------------------------------
+
+    def handle(self, path: str, params: Dict[str, str]) -> Tuple[int, Optional[dict]]:
+        if path == f"{APPS_PREFIX}/rooms":
+            return 200, {"rooms": self.dataset.rooms}
+        if path == f"{APPS_PREFIX}/reservations":
+            return 200, self.reservation_page(params)
+        if path == CURRENCY_PATH:
+            return 200, {"currencies": [{"code": code} for code in sorted(EUR_RATES)]}
+        if path == FX_PATH:
+            return self.rate_table(params.get("base", "EUR"))
+        return 404, {"error": "not_found", "path": path}
+
+    def reservation_page(self, params: Dict[str, str]) -> dict:
+        """Reservations checking in within ``[from_date, to_date]``, one page of them."""
+        lo = bisect.bisect_left(self._check_ins, params.get("from_date", ""))
+        hi = bisect.bisect_right(self._check_ins, params.get("to_date", "9999-12-31"))
+        per_page = min(max(_int(params.get("per_page"), 25), 1), MAX_PER_PAGE)
+        page = max(_int(params.get("page"), 1), 1)
+        count = hi - lo
+        offset = lo + (page - 1) * per_page
+        batch = self._reservations[offset : min(offset + per_page, hi)] if offset < hi else []
+        return {
+            "reservations": batch,
+            "count": count,
+            "pages": max(math.ceil(count / per_page), 1),
+            "per_page": per_page,
+            "current_page": page,
+        }
+
+    def rate_table(self, base: str) -> Tuple[int, dict]:
+        base = base.upper()
+        if base not in EUR_RATES:
+            return 422, {"success": False, "error": f"unsupported base {base}"}
+        rates = {code: round(value / EUR_RATES[base], 6) for code, value in EUR_RATES.items()}
+        return 200, {"base": base, "rates": rates, "timestamp": int(time.time())}
+
+    def simulate(self, path: str) -> bool:
+        """Count the request, sleep the configured latency and roll for an injected error."""
+        config = self.config
+        with self._lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+            jitter = self._rng.uniform(-config.jitter_ms, config.jitter_ms)
+            fail = self._rng.random() < config.error_rate
+        time.sleep(max(config.latency_ms + jitter, 0.0) / 1000)
+        return fail
+
+
+def _handler_for(fake: FakeHotelRunner) -> type:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self) -> None:  # noqa: N802 - http.server naming
+            parsed = urlparse(self.path)
+            params = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+            if fake.simulate(parsed.path):
+                self._send(fake.config.error_status, {"error": "injected failure"})
+                return
+            status, body = fake.handle(parsed.path, params)
+            self._send(status, body)
+
+        def _send(self, status: int, body: Optional[dict]) -> None:
+            data = json.dumps(body).encode()
+            etag = f'"{hashlib.sha1(data).hexdigest()}"'
+            if status == 200 and self.headers.get("If-None-Match") == etag:
+                status, data = 304, b""
+            self.send_response(status)
+            if status in (200, 304):
+                self.send_header("ETag", etag)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format: str, *args: object) -> None:
+            pass
+
+    return Handler
+
+
+def _int(value: Optional[str], default: int) -> int:
+    try:
+        return int(value) if value is not None else default
+    except ValueError:
+        return default
+
+
+def config_from_args(args: argparse.Namespace) -> FakeConfig:
+    return FakeConfig(
+        room_types=args.room_types,
+        reservations=args.reservations,
+        nights=args.nights,
+        seed=args.seed,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+    )
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--room-types", type=int, default=20)
+    parser.add_argument("--reservations", type=int, default=5_000)
+    parser.add_argument("--nights", type=int, default=120, help="days of bookable horizon")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="0.0-1.0")
+    parser.add_argument("--error-status", type=int, default=503)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    fake = FakeHotelRunner(config_from_args(args)).start(args.host, args.port)
+    for key, value in fake.env().items():
+        print(f"export {key}={value}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
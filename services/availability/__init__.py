@@ -1,4 +1,18 @@
-from .models import AvailabilityRequest, AvailabilityResponse
-from .service import get_availability
+from .models import (
+    AvailabilityRequest,
+    AvailabilityResponse,
+    ColumnarAvailabilityResponse,
+    PriceConversion,
+    RunLengthAvailabilityResponse,
+)
+from .service import get_availability, get_availability_batch
 
-__all__ = ["AvailabilityRequest", "AvailabilityResponse", "get_availability"]
+__all__ = [
+    "AvailabilityRequest",
+    "AvailabilityResponse",
+    "ColumnarAvailabilityResponse",
+    "PriceConversion",
+    "RunLengthAvailabilityResponse",
+    "get_availability",
+    "get_availability_batch",
+]
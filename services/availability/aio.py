@@ -0,0 +1,171 @@
+"""Asyncio path for availability lookups, sharing the sync matrix/response code."""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import datetime as dt
+import logging
+import time
+from functools import partial
+from typing import Awaitable, Callable, Dict, Optional
+
+from clients.hotelrunner import aio as hotelrunner
+from clients.hotelrunner.common import call_deadline, property_currency
+from clients.hotelrunner.metadata import MetadataCache, currencies_cache, rooms_cache
+from clients.hotelrunner.reservations import record_max_stay
+from services.availability import ledger
+from services.availability.cache import ReservationTracker, cache_key
+from services.availability.matrix import AvailabilityGrid
+from services.availability.models import AnyAvailabilityResponse, AvailabilityRequest
+from services.availability.service import (
+    RESPONSE_CACHE,
+    build_response,
+    fx_quote_for,
+    ledger_grid,
+    reservation_window,
+)
+from settings import get_settings
+
+LOGGER = logging.getLogger(__name__)
+
+_settings = get_settings()
+
+
+async def get_availability_async(
+    payload: AvailabilityRequest,
+    transport: Optional[hotelrunner.AsyncTransport] = None,
+    deadline: Optional[float] = None,
+) -> AnyAvailabilityResponse:
+    """Async twin of :func:`services.availability.service.get_availability`.
+
+    Same response cache, booking ledger and error messages as the sync
+    path; upstream fetches run concurrently on the event loop through
+    ``transport`` (the module default when omitted), each bounded by one
+    overall deadline, and the first failure to complete is raised. Blocking
+    work (ledger reads, FX lookups) runs in the default executor.
+    """
+    key = cache_key(payload, property_currency())
+    cached = RESPONSE_CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    loop = asyncio.get_running_loop()
+    generation = RESPONSE_CACHE.generation(key[0])
+    sections = payload.raw_sections()
+    grid = None
+    if "reservations" not in sections and ledger.enabled():
+        grid = await loop.run_in_executor(
+            None, contextvars.copy_context().run, ledger_grid, payload
+        )
+    tasks: Dict[str, Awaitable[object]] = {
+        "rooms": _cached(rooms_cache(), hotelrunner.fetch_rooms_conditional, transport),
+    }
+    tracker = None
+    if grid is None:
+        start, end = reservation_window(payload)
+        grid = AvailabilityGrid(
+            dt.date.fromisoformat(payload.check_in), dt.date.fromisoformat(payload.check_out)
+        )
+        tracker = RESPONSE_CACHE.track_reservations(start, end)
+        tasks["reservations"] = _safe(
+            "reservations",
+            partial(
+                _stream_reservations,
+                start,
+                end,
+                grid,
+                tracker,
+                "reservations" in sections,
+                transport,
+            ),
+        )
+    if "currencies" in sections:
+        tasks["currencies"] = _cached(
+            currencies_cache(), hotelrunner.fetch_currencies_conditional, transport
+        )
+
+    results = await _gather_until(tasks, deadline)
+    fx_quote = await loop.run_in_executor(
+        None, contextvars.copy_context().run, fx_quote_for, payload, results["rooms"]
+    )
+    response = build_response(payload, results, grid, fx_quote)
+    if tracker is not None:
+        # Changes this fetch found itself are already in the response.
+        generation += tracker.invalidations
+    RESPONSE_CACHE.put(key, payload, response, generation)
+    return response
+
+
+async def _gather_until(
+    tasks: Dict[str, Awaitable[object]], deadline: Optional[float]
+) -> Dict[str, object]:
+    """Await ``tasks`` like :func:`services.availability.service.fetch_concurrently`.
+
+    Every task runs under :func:`call_deadline`; the first failure to
+    complete is re-raised and exceeding the deadline raises ``RuntimeError``
+    naming what was still pending.
+    """
+    deadline = _settings.availability_deadline_seconds if deadline is None else deadline
+    until = time.monotonic() + deadline
+    with call_deadline(until):  # tasks copy the context they are created in
+        futures = {name: asyncio.ensure_future(task) for name, task in tasks.items()}
+    pending = set(futures.values())
+    try:
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, timeout=until - time.monotonic(), return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                break
+            for future in done:
+                if future.exception() is not None:
+                    raise future.exception()
+    finally:
+        for future in futures.values():
+            if not future.done():
+                future.cancel()
+    if pending:
+        names = sorted(name for name, future in futures.items() if future in pending)
+        LOGGER.warning("Upstream deadline of %ss exceeded waiting for %s", deadline, names)
+        raise RuntimeError(f"HotelRunner upstream timed out: {', '.join(names)}")
+    return {name: future.result() for name, future in futures.items()}
+
+
+async def _stream_reservations(
+    start: dt.date,
+    end: dt.date,
+    grid: AvailabilityGrid,
+    tracker: ReservationTracker,
+    keep: bool,
+    transport: Optional[hotelrunner.AsyncTransport],
+) -> Optional[list[dict]]:
+    kept: Optional[list[dict]] = [] if keep else None
+    async for page in hotelrunner.iter_reservation_pages(start, end, transport=transport):
+        grid.add_reservations(page.reservations)
+        tracker.add(page.reservations)
+        if kept is not None:
+            kept.extend(page.reservations)
+    tracker.finish()
+    record_max_stay(grid.max_stay)
+    return kept
+
+
+async def _safe(label: str, call: Callable[[], Awaitable[object]]) -> object:
+    try:
+        return await call()
+    except Exception as exc:
+        LOGGER.warning("%s request failed: %s", label.capitalize(), exc)
+        raise RuntimeError(f"HotelRunner {label} unavailable") from exc
+
+
+async def _cached(
+    cache: MetadataCache,
+    fetch: Callable[..., Awaitable[hotelrunner.ConditionalResult]],
+    transport: Optional[hotelrunner.AsyncTransport],
+) -> object:
+    value = cache.peek()
+    if value is not None:
+        return value
+    result = await _safe(cache.name, lambda: fetch(transport=transport))
+    cache.store(result)
+    return result.value
@@ -0,0 +1,243 @@
+"""Short-lived LRU cache of availability responses with reservation-aware invalidation."""
+from __future__ import annotations
+
+import datetime as dt
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from clients.hotelrunner.tenancy import current_property
+from services.availability.models import AnyAvailabilityResponse, AvailabilityRequest
+
+CacheKey = Tuple[Any, ...]
+MAX_KNOWN_RESERVATIONS = 50_000  # departed stays are pruned past this size
+
+
+@dataclass(frozen=True)
+class _Entry:
+    response: AnyAvailabilityResponse
+    stored_at: float
+    check_in: str
+    check_out: str
+    property_id: str
+
+
+class ResponseCache:
+    """Bounded LRU of responses keyed on the normalised request.
+
+    One instance serves every property: keys start with the property id
+    (see :func:`cache_key`) and ``max_entries`` bounds all of them together,
+    so the least recently used entry is evicted whichever hotel it belongs
+    to. Entries expire after ``ttl`` seconds. Reservation data seen by the
+    service is passed to :meth:`observe_reservations`; any reservation that
+    is new, changed or gone since it was last seen evicts the entries whose
+    nights overlap it. :meth:`invalidate_dates` does the same for pushed
+    updates. Every invalidation bumps the property's :meth:`generation`, so
+    a response computed from data fetched before it is not stored.
+    """
+
+    def __init__(self, max_entries: int, ttl: float) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[CacheKey, _Entry]" = OrderedDict()
+        self._known: Dict[Any, Tuple[Any, ...]] = {}
+        self._generations: Dict[Optional[str], int] = {}
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0, "stale_puts": 0}
+
+    def get(self, key: CacheKey) -> Optional[AnyAvailabilityResponse]:
+        if self.max_entries <= 0 or self.ttl <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry.stored_at >= self.ttl:
+                if entry is not None:
+                    del self._entries[key]
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry.response
+
+    def generation(self, property_id: str) -> int:
+        """Counter of invalidations that touched ``property_id``; pass it to :meth:`put`."""
+        with self._lock:
+            return self._generation(property_id)
+
+    def put(
+        self,
+        key: CacheKey,
+        payload: AvailabilityRequest,
+        response: AnyAvailabilityResponse,
+        generation: Optional[int] = None,
+    ) -> None:
+        """Store ``response`` unless its property was invalidated since ``generation``."""
+        if self.max_entries <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            if generation is not None and self._generation(key[0]) != generation:
+                self._stats["stale_puts"] += 1
+                return
+            self._entries[key] = _Entry(
+                response, time.monotonic(), payload.check_in, payload.check_out, key[0]
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def invalidate_dates(self, start: str, end: str, property_id: Optional[str] = None) -> int:
+        """Drop entries whose nights overlap ``[start, end)`` (ISO dates).
+
+        Only ``property_id``'s entries are dropped when given, else every property's.
+        """
+        return self._invalidate_ranges([(start, end)], property_id)
+
+    def observe_reservations(
+        self, start: dt.date, end: dt.date, reservations: Iterable[dict]
+    ) -> int:
+        """Record a reservation fetch for ``[start, end)`` and evict what it changed.
+
+        A reservation is expected in a fetch when its check-in falls inside
+        the fetched range, so known ones in that range that are missing now
+        count as cancelled.
+        """
+        tracker = self.track_reservations(start, end)
+        tracker.add(reservations)
+        return tracker.finish()
+
+    def track_reservations(self, start: dt.date, end: dt.date) -> "ReservationTracker":
+        """Incremental :meth:`observe_reservations` for a fetch consumed page by page."""
+        return ReservationTracker(self, start, end)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._known.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._stats)
+            lookups = stats["hits"] + stats["misses"]
+            stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else None
+            stats["entries"] = len(self._entries)
+            per_property: Dict[str, int] = {}
+            for entry in self._entries.values():
+                per_property[entry.property_id] = per_property.get(entry.property_id, 0) + 1
+            stats["properties"] = per_property
+            stats["max_entries"] = self.max_entries
+            stats["ttl_seconds"] = self.ttl
+            return stats
+
+    def _invalidate_ranges(
+        self, ranges: List[Tuple[str, str]], property_id: Optional[str] = None
+    ) -> int:
+        with self._lock:
+            stale = [
+                key
+                for key, entry in self._entries.items()
+                if (property_id is None or entry.property_id == property_id)
+                and any(lo < entry.check_out and hi > entry.check_in for lo, hi in ranges)
+            ]
+            for key in stale:
+                del self._entries[key]
+            self._stats["invalidations"] += len(stale)
+            if ranges:
+                self._generations[property_id] = self._generations.get(property_id, 0) + 1
+            return len(stale)
+
+    def _generation(self, property_id: str) -> int:
+        # Invalidations without a property id count for every property.
+        return self._generations.get(property_id, 0) + self._generations.get(None, 0)
+
+
+class ReservationTracker:
+    """Feeds one streamed reservation fetch into :class:`ResponseCache` change detection.
+
+    Only reservation keys are retained between pages; :meth:`finish` treats
+    known reservations in the range that never showed up as cancelled.
+    Reservations are tracked per property, for the property current when
+    the tracker is created. ``invalidations`` counts the generation bumps
+    caused by :meth:`finish`, which do not make the tracked fetch stale.
+    """
+
+    def __init__(self, cache: ResponseCache, start: dt.date, end: dt.date) -> None:
+        self._cache = cache
+        self._property_id = current_property().id
+        self._start_key = start.isoformat()
+        self._end_key = end.isoformat()
+        self._seen: set = set()
+        self._changed: List[Tuple[str, str]] = []
+        self.invalidations = 0
+
+    def add(self, reservations: Iterable[dict]) -> None:
+        identities = [_identity(reservation) for reservation in reservations]
+        known = self._cache._known
+        with self._cache._lock:
+            for key, signature in identities:
+                if key is None:
+                    continue
+                key = (self._property_id, key)
+                self._seen.add(key)
+                previous = known.get(key)
+                if previous != signature:
+                    known[key] = signature
+                    self._changed.append((signature[1], signature[2]))
+                    if previous is not None:
+                        self._changed.append((previous[1], previous[2]))
+
+    def finish(self) -> int:
+        known = self._cache._known
+        changed = self._changed
+        with self._cache._lock:
+            for key, signature in list(known.items()):
+                if (
+                    key[0] == self._property_id
+                    and key not in self._seen
+                    and self._start_key <= signature[1] < self._end_key
+                ):
+                    del known[key]
+                    changed.append((signature[1], signature[2]))
+            if len(known) > MAX_KNOWN_RESERVATIONS:
+                today = dt.date.today().isoformat()
+                for key in [k for k, sig in known.items() if sig[2] < today]:
+                    del known[key]
+        if not changed:
+            return 0
+        self.invalidations += 1
+        return self._cache._invalidate_ranges(changed, self._property_id)
+
+
+def cache_key(payload: AvailabilityRequest, default_currency: str) -> CacheKey:
+    return (
+        current_property().id,
+        payload.check_in,
+        payload.check_out,
+        payload.adults,
+        payload.children,
+        (payload.currency or default_currency).upper(),
+        tuple(sorted(payload.raw_sections())),
+        payload.format,
+        payload.resolve_display_currency(default_currency),
+    )
+
+
+def _identity(reservation: dict) -> Tuple[Any, Tuple[Any, ...]]:
+    room_type = reservation.get("room_type") or reservation.get("room_type_name")
+    check_in = reservation.get("check_in")
+    check_out = reservation.get("check_out")
+    if not (isinstance(check_in, str) and isinstance(check_out, str)):
+        return None, ()
+    key = reservation.get("id") or reservation.get("reservation_id") or reservation.get("code")
+    if key is None:
+        key = (room_type, check_in, check_out)
+    signature = (
+        room_type,
+        check_in[:10],
+        check_out[:10],
+        reservation.get("state") or reservation.get("status"),
+        reservation.get("updated_at"),
+    )
+    return key, signature
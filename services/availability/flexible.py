@@ -0,0 +1,123 @@
+"""Flexible-date search: cheapest feasible stays of a fixed length in a window."""
+from __future__ import annotations
+
+import datetime as dt
+import heapq
+from collections import deque
+from itertools import accumulate
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from clients.hotelrunner.common import property_currency
+from clients.hotelrunner.reservations import overlap_window, record_max_stay
+from services.availability.matrix import AvailabilityGrid
+from services.availability.models import (
+    FlexibleSearchRequest,
+    FlexibleSearchResponse,
+    StayOption,
+)
+from services.availability.service import (
+    fetch_concurrently,
+    fetch_reservations_safe,
+    fetch_rooms_safe,
+    parse_room_metadata,
+)
+
+CAPACITY_KEYS = ("max_occupancy", "capacity", "max_guests", "max_adults")
+
+
+def search_flexible(payload: FlexibleSearchRequest) -> FlexibleSearchResponse:
+    start, end = overlap_window(
+        dt.date.fromisoformat(payload.window_start), dt.date.fromisoformat(payload.window_end)
+    )
+    upstream = fetch_concurrently(
+        {
+            "rooms": fetch_rooms_safe,
+            "reservations": lambda: fetch_reservations_safe(start, end),
+        }
+    )
+    return rank_stays(payload, upstream["rooms"], upstream["reservations"])
+
+
+def rank_stays(
+    payload: FlexibleSearchRequest,
+    rooms: list[dict],
+    reservations: list[dict],
+) -> FlexibleSearchResponse:
+    """Top-k (start date, room type) pairs by total price for ``payload.nights``.
+
+    Availability over every candidate stay comes from a sliding-window
+    minimum and the stay price from prefix-summed nightly prices, so the
+    whole window costs O(days × room types) plus the top-k heap.
+    """
+    totals, price_map, price_currency = parse_room_metadata(rooms)
+    capacities = _parse_room_capacity(rooms)
+    window_start = dt.date.fromisoformat(payload.window_start)
+    window_end = dt.date.fromisoformat(payload.window_end)
+    guests = payload.adults + payload.children
+
+    grid = AvailabilityGrid(window_start, window_end)
+    grid.add_reservations(reservations)
+    record_max_stay(grid.max_stay)
+    free = grid.available(totals)
+
+    candidates: List[Tuple[float, int, str, int]] = []
+    for room_type in totals:
+        capacity = capacities.get(room_type)
+        if capacity is not None and capacity < guests:
+            continue
+        nightly = [price_map.get(room_type, 0.0)] * grid.days
+        prefix = [0.0, *accumulate(nightly)]
+        for start, minimum in _window_minimums(free[room_type], payload.nights):
+            if minimum < payload.rooms:
+                continue
+            total = (prefix[start + payload.nights] - prefix[start]) * payload.rooms
+            candidates.append((total, start, room_type, minimum))
+
+    best = heapq.nsmallest(payload.top_k, candidates, key=lambda item: (item[0], item[1], item[2]))
+    options = [
+        StayOption(
+            check_in=(window_start + dt.timedelta(days=start)).isoformat(),
+            check_out=(window_start + dt.timedelta(days=start + payload.nights)).isoformat(),
+            room_type=room_type,
+            total_price=round(total, 2),
+            min_available=minimum,
+        )
+        for total, start, room_type, minimum in best
+    ]
+    return FlexibleSearchResponse(
+        nights=payload.nights,
+        currency=(payload.currency or property_currency()).upper(),
+        price_currency=price_currency,
+        options=options,
+    )
+
+
+def _window_minimums(values: Sequence[int], width: int) -> Iterator[Tuple[int, int]]:
+    """Yield ``(start, min(values[start:start + width]))`` with a monotonic deque."""
+    window: deque[int] = deque()
+    for index, value in enumerate(values):
+        while window and values[window[-1]] >= value:
+            window.pop()
+        window.append(index)
+        if window[0] <= index - width:
+            window.popleft()
+        start = index - width + 1
+        if start >= 0:
+            yield start, values[window[0]]
+
+
+def _parse_room_capacity(rooms: list[dict]) -> Dict[str, Optional[int]]:
+    capacities: Dict[str, Optional[int]] = {}
+    for room in rooms:
+        room_type = room.get("name") or room.get("room_type_name") or room.get("room_type")
+        if not room_type:
+            continue
+        capacity = None
+        for key in CAPACITY_KEYS:
+            try:
+                capacity = int(room[key])
+                break
+            except (KeyError, TypeError, ValueError):
+                continue
+        capacities[room_type] = capacity
+    return capacities
@@ -0,0 +1,349 @@
+"""Push-fed booked counts per room type and night, reconciled against full fetches.
+
+Reservation webhooks are applied as they arrive; a periodic reconciliation
+against a full reservation fetch corrects drift from missed or reordered
+events. While a property's ledger is in sync it answers availability for
+the nights it covers without an upstream reservation call. With
+``INVENTORY_DB`` set, ledgers live in the node-wide SQLite store
+(:mod:`services.availability.store`) instead of each worker's memory.
+"""
+from __future__ import annotations
+
+import datetime as dt
+import threading
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from clients.hotelrunner.tenancy import Property, TenantMap
+from services.availability.matrix import AvailabilityGrid
+from settings import get_settings
+
+if TYPE_CHECKING:
+    from services.availability.store import StoredLedger
+
+CANCELLED_STATES = frozenset({"cancelled", "canceled", "deleted", "removed"})
+# Last segment of the event name (``reservation.modified``) -> whether it cancels the stay.
+EVENT_ACTIONS = {
+    "created": False,
+    "modified": False,
+    "updated": False,
+    "cancelled": True,
+    "canceled": True,
+}
+
+DateRange = Tuple[str, str]
+Ledger = Union["BookingLedger", "StoredLedger"]
+
+
+class LedgerEventError(ValueError):
+    pass
+
+
+class LedgerBusyError(RuntimeError):
+    """The shared ledger store could not be written in time; worth retrying shortly."""
+
+
+class LedgerRoutingError(ValueError):
+    """A webhook delivery holds events whose property cannot be determined."""
+
+
+@dataclass(frozen=True)
+class Stay:
+    """One version of a reservation as far as availability is concerned."""
+
+    room_type: str
+    check_in: int  # date ordinals, check-out exclusive
+    check_out: int
+    modified: str  # normalised UTC timestamp, "" when upstream sent none
+    active: bool
+
+    def dates(self) -> DateRange:
+        return (
+            dt.date.fromordinal(self.check_in).isoformat(),
+            dt.date.fromordinal(self.check_out).isoformat(),
+        )
+
+
+class BookingLedger:
+    """Booked rooms per room type and night for one property.
+
+    Each reservation id keeps its last applied version, so replayed or
+    out-of-order events (same or older modification time) are ignored.
+    ``covered`` is the night range the last reconciliation vouched for;
+    the sync cursor is the modification time up to which upstream changes
+    have been pulled in.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._stays: Dict[Any, Stay] = {}
+        self._booked: Dict[str, Dict[int, int]] = {}
+        self.covered: Optional[Tuple[int, int]] = None
+        self.reconciled_at: Optional[float] = None  # time.monotonic()
+        self.reconciling = False
+        self.reconcile_started: Optional[float] = None  # time.monotonic() of the last attempt
+        self._stats = {"applied": 0, "duplicates": 0, "reconciles": 0, "drift": 0}
+        self._sync: Dict[str, Any] = {"cursor": None, "synced_at": None, "error": None}
+
+    def apply(self, reservation: dict, cancelled: bool = False) -> Optional[List[DateRange]]:
+        """Apply one reservation version; returns the date ranges it changed or ``None``."""
+        return self.apply_stays([stay_from(reservation, cancelled)])[0]
+
+    def apply_stays(self, stays: Sequence[Tuple[Any, Stay]]) -> List[Optional[List[DateRange]]]:
+        """:meth:`apply` for a batch of ``(key, stay)`` pairs from :func:`stay_from`."""
+        results = []
+        with self._lock:
+            for key, stay in stays:
+                changed = self._apply(key, stay, keep_newer=True)
+                self._stats["applied" if changed is not None else "duplicates"] += 1
+                results.append(changed)
+        return results
+
+    def reconcile(
+        self,
+        start: dt.date,
+        end: dt.date,
+        reservations: Iterable[dict],
+        covered: Tuple[dt.date, dt.date],
+        since: str,
+    ) -> List[DateRange]:
+        """Make the ledger match a full fetch of reservations checking in within ``[start, end]``.
+
+        Versions applied from events at or after ``since`` (when the fetch
+        started) win over the fetched ones, as the fetch may predate them.
+        Returns the date ranges that had drifted (none on the first run,
+        which merely seeds the ledger).
+        """
+        fetched: Dict[Any, Stay] = {}
+        for reservation in reservations:
+            try:
+                key, stay = stay_from(reservation, False)
+            except LedgerEventError:
+                continue
+            fetched[key] = stay
+        lo, hi = start.toordinal(), end.toordinal()
+        with self._lock:
+            drift: List[DateRange] = []
+            for key, stay in fetched.items():
+                drift.extend(self._apply(key, stay, keep_newer=True) or ())
+            for key, stay in list(self._stays.items()):
+                if key in fetched or not stay.active or not lo <= stay.check_in <= hi:
+                    continue
+                if pushed_since(stay, since):
+                    continue
+                drift.extend(self._apply(key, replace_active(stay, False), keep_newer=False))
+            if self.reconciled_at is None:
+                drift = []
+            self.covered = (covered[0].toordinal(), covered[1].toordinal())
+            # Stays that ended before the covered range are never read again.
+            for key in [
+                key for key, stay in self._stays.items() if stay.check_out <= self.covered[0]
+            ]:
+                stay = self._stays.pop(key)
+                if stay.active:
+                    self._shift(stay, -1)
+            self.reconciled_at = time.monotonic()
+            self._stats["reconciles"] += 1
+            self._stats["drift"] += len(drift)
+            return drift
+
+    def age(self) -> Optional[float]:
+        return None if self.reconciled_at is None else time.monotonic() - self.reconciled_at
+
+    def covers(self, first_night: dt.date, check_out: dt.date, max_age: float) -> bool:
+        age = self.age()
+        return (
+            self.covered is not None
+            and age is not None
+            and age < max_age
+            and self.covered[0] <= first_night.toordinal()
+            and check_out.toordinal() <= self.covered[1]
+        )
+
+    def fill(self, grid: AvailabilityGrid) -> None:
+        """Add the booked counts for every night of ``grid`` to it."""
+        first = grid.start.toordinal()
+        with self._lock:
+            for room_type, nights in self._booked.items():
+                counts = [nights.get(first + day, 0) for day in range(grid.days)]
+                if any(counts):
+                    grid.add_booked(room_type, counts)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._stats)
+            stats["reservations"] = sum(1 for stay in self._stays.values() if stay.active)
+        age = self.age()
+        stats["age_seconds"] = None if age is None else round(age, 3)
+        stats["covered"] = (
+            None
+            if self.covered is None
+            else [dt.date.fromordinal(value).isoformat() for value in self.covered]
+        )
+        stats["sync"] = self.sync_status()
+        return stats
+
+    def cursor(self) -> Optional[str]:
+        with self._lock:
+            return self._sync["cursor"]
+
+    def record_sync(self, cursor: Optional[str], error: Optional[str] = None) -> None:
+        """Advance the sync cursor to ``cursor`` (never backwards), or record a failed sync."""
+        with self._lock:
+            self._sync = sync_state(self._sync, cursor, error, time.time())
+
+    def sync_status(self) -> Dict[str, Any]:
+        with self._lock:
+            return sync_report(self._sync, time.time())
+
+    def _apply(self, key: Any, stay: Stay, keep_newer: bool) -> Optional[List[DateRange]]:
+        previous = self._stays.get(key)
+        if keep_newer and not supersedes(stay, previous):
+            return None
+        if previous is not None and previous.active:
+            self._shift(previous, -1)
+        if stay.active:
+            self._shift(stay, 1)
+        self._stays[key] = stay
+        return [item.dates() for item in (previous, stay) if item is not None and item.active]
+
+    def _shift(self, stay: Stay, delta: int) -> None:
+        nights = self._booked.setdefault(stay.room_type, {})
+        for night in range(stay.check_in, stay.check_out):
+            count = nights.get(night, 0) + delta
+            if count:
+                nights[night] = count
+            else:
+                nights.pop(night, None)
+
+
+def parse_event(event: dict) -> Tuple[dict, bool]:
+    """``(reservation, cancelled)`` from a webhook event.
+
+    Accepts ``{"event": "reservation.cancelled", "reservation": {...}}`` as
+    well as a bare reservation whose ``state`` says whether it is cancelled.
+    """
+    if not isinstance(event, dict):
+        raise LedgerEventError("event must be an object")
+    reservation = event.get("reservation") or event.get("data") or event
+    if not isinstance(reservation, dict):
+        raise LedgerEventError("event has no reservation")
+    action = str(event.get("event") or event.get("type") or "").rsplit(".", 1)[-1].lower()
+    if action and action not in EVENT_ACTIONS:
+        raise LedgerEventError(f"unsupported event '{action}'")
+    return reservation, EVENT_ACTIONS.get(action, False)
+
+
+def event_hr_id(event: dict, reservation: dict) -> Optional[str]:
+    """HotelRunner ``hr_id`` of the hotel an event belongs to, if the payload names it."""
+    hr_id = event.get("hr_id") or reservation.get("hr_id")
+    return None if hr_id in (None, "") else str(hr_id)
+
+
+def stay_from(reservation: dict, cancelled: bool) -> Tuple[Any, Stay]:
+    key = reservation.get("id") or reservation.get("reservation_id") or reservation.get("code")
+    room_type = reservation.get("room_type") or reservation.get("room_type_name")
+    if key is None or not room_type:
+        raise LedgerEventError("reservation needs an id and a room type")
+    try:
+        check_in = dt.date.fromisoformat(str(reservation["check_in"])[:10]).toordinal()
+        check_out = dt.date.fromisoformat(str(reservation["check_out"])[:10]).toordinal()
+    except (KeyError, ValueError):
+        raise LedgerEventError("reservation needs ISO check_in/check_out dates") from None
+    state = str(reservation.get("state") or reservation.get("status") or "").lower()
+    modified = reservation.get("updated_at") or reservation.get("modified_at") or ""
+    return key, Stay(
+        room_type=str(room_type),
+        check_in=check_in,
+        check_out=max(check_out, check_in),
+        modified=_normalise_timestamp(modified),
+        active=not cancelled and state not in CANCELLED_STATES,
+    )
+
+
+def supersedes(stay: Stay, previous: Optional[Stay]) -> bool:
+    """Versions are ordered by modification time; untimed ones apply unless identical."""
+    if previous is None:
+        return True
+    return stay != previous and not (stay.modified and stay.modified <= previous.modified)
+
+
+def pushed_since(stay: Stay, since: str) -> bool:
+    """Whether ``stay`` was modified at or after ``since``, so a fetch started then may lack it."""
+    return bool(stay.modified) and stay.modified >= since
+
+
+def sync_state(
+    previous: Dict[str, Any], cursor: Optional[str], error: Optional[str], now: float
+) -> Dict[str, Any]:
+    if error is not None:
+        return {**previous, "error": error}
+    if previous["cursor"] is not None and (cursor is None or cursor < previous["cursor"]):
+        cursor = previous["cursor"]
+    return {"cursor": cursor, "synced_at": now, "error": None}
+
+
+def sync_report(state: Dict[str, Any], now: float) -> Dict[str, Any]:
+    synced_at = state["synced_at"]
+    return {
+        "cursor": state["cursor"],
+        "lag_seconds": None if synced_at is None else round(max(now - synced_at, 0.0), 3),
+        "last_error": state["error"],
+    }
+
+
+def _normalise_timestamp(value: Any) -> str:
+    if not value:
+        return ""
+    try:
+        parsed = dt.datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return str(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=dt.timezone.utc)
+    return parsed.astimezone(dt.timezone.utc).isoformat()
+
+
+def replace_active(stay: Stay, active: bool) -> Stay:
+    return Stay(stay.room_type, stay.check_in, stay.check_out, stay.modified, active)
+
+
+def utc_now() -> str:
+    return dt.datetime.now(dt.timezone.utc).isoformat()
+
+
+def enabled() -> bool:
+    """Ledgers only exist where webhooks or the background sync keep them current."""
+    settings = get_settings()
+    return bool(settings.webhook_secret) or settings.reservation_sync_seconds > 0
+
+
+# Set in processes running the reservation sync job, which then reconciles
+# ledgers itself instead of requests starting it.
+BACKGROUND_SYNC = threading.Event()
+
+
+def _new_ledger(prop: Property) -> "Ledger":
+    path = get_settings().inventory_db
+    if not path:
+        return BookingLedger()
+    from services.availability.store import inventory_store  # local import to avoid cycle
+
+    return inventory_store(path).ledger(prop.id)
+
+
+# In-memory per worker, or views of the node-wide store when INVENTORY_DB is set.
+_LEDGERS: "TenantMap[Ledger]" = TenantMap(_new_ledger)
+
+
+def current_ledger() -> "Ledger":
+    return _LEDGERS.get()
+
+
+def ledger_stats() -> Dict[str, Dict[str, Any]]:
+    return {property_id: ledger.stats() for property_id, ledger in _LEDGERS.items()}
+
+
+def reset() -> None:
+    _LEDGERS.clear()
@@ -0,0 +1,153 @@
+"""Sweep-line booked-count grid backing the availability matrix."""
+from __future__ import annotations
+
+import datetime as dt
+from array import array
+from itertools import accumulate
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class AvailabilityGrid:
+    """Booked rooms per room type and night over ``[start, end)``.
+
+    Room types map to row indices and dates to day offsets. Each reservation
+    is applied as a +1/-1 difference at its clipped check-in/check-out
+    offsets, so ingesting is O(1) per reservation regardless of stay length;
+    a prefix sum over a row yields the booked count for every night.
+    """
+
+    def __init__(self, start: dt.date, end: dt.date) -> None:
+        self.start = start
+        self.end = end
+        self.days = max((end - start).days, 0)
+        self._start_ordinal = start.toordinal()
+        self._index: Dict[str, int] = {}
+        self._rows: List[array] = []
+        self._date_cache: Dict[str, Optional[int]] = {}
+        self.max_stay = 0  # longest stay ingested, in nights, before clipping
+
+    @property
+    def room_types(self) -> List[str]:
+        return list(self._index)
+
+    def row(self, room_type: str) -> int:
+        index = self._index.get(room_type)
+        if index is None:
+            index = len(self._rows)
+            self._index[room_type] = index
+            self._rows.append(array("i", bytes(4 * (self.days + 1))))
+        return index
+
+    def add_stay(self, room_type: str, check_in: int, check_out: int, count: int = 1) -> bool:
+        """Apply a stay given as day offsets relative to ``start``."""
+        lo = max(check_in, 0)
+        hi = min(check_out, self.days)
+        if lo >= hi:
+            return False
+        row = self._rows[self.row(room_type)]
+        row[lo] += count
+        row[hi] -= count
+        return True
+
+    def add_booked(self, room_type: str, counts: Sequence[int]) -> None:
+        """Add already-counted booked rooms, one value per night from ``start``."""
+        row = self._rows[self.row(room_type)]
+        previous = 0
+        for day, count in enumerate(counts[: self.days]):
+            row[day] += count - previous
+            previous = count
+        row[min(len(counts), self.days)] -= previous
+
+    def add_reservations(self, reservations: Iterable[dict]) -> int:
+        """Ingest reservation dicts; may be called once per page as they stream in."""
+        applied = 0
+        max_stay = self.max_stay
+        for reservation in reservations:
+            room_type = reservation.get("room_type") or reservation.get("room_type_name")
+            check_in = reservation.get("check_in")
+            check_out = reservation.get("check_out")
+            if not (room_type and check_in and check_out):
+                continue
+            lo = self._offset(check_in)
+            hi = self._offset(check_out)
+            if lo is None or hi is None:
+                continue
+            if hi - lo > max_stay:
+                max_stay = hi - lo
+            applied += self.add_stay(room_type, lo, hi)
+        self.max_stay = max_stay
+        return applied
+
+    def booked(self, room_type: str) -> List[int]:
+        index = self._index.get(room_type)
+        if index is None:
+            return [0] * self.days
+        return list(accumulate(self._rows[index][: self.days]))
+
+    def dates(self) -> List[str]:
+        return [dt.date.fromordinal(self._start_ordinal + i).isoformat() for i in range(self.days)]
+
+    def available(self, totals: Dict[str, int]) -> Dict[str, List[int]]:
+        """Free rooms per room type (in ``totals`` order) for every night."""
+        return {
+            room_type: [total - count if count < total else 0 for count in self.booked(room_type)]
+            for room_type, total in totals.items()
+        }
+
+    def to_matrices(
+        self,
+        totals: Dict[str, int],
+        price_map: Dict[str, float],
+    ) -> tuple[Dict[str, Dict[str, int]], Dict[str, Dict[str, float]]]:
+        """Materialise the nested ``{date: {room_type: value}}`` response shape."""
+        free = self.available(totals)
+        room_types = list(totals)
+        columns = [free[room_type] for room_type in room_types]
+        price_row = {room_type: price_map.get(room_type, 0.0) for room_type in room_types}
+
+        availability: Dict[str, Dict[str, int]] = {}
+        prices: Dict[str, Dict[str, float]] = {}
+        for day, key in enumerate(self.dates()):
+            availability[key] = {
+                room_type: column[day] for room_type, column in zip(room_types, columns)
+            }
+            prices[key] = dict(price_row)
+        return availability, prices
+
+    def to_columns(
+        self,
+        totals: Dict[str, int],
+        price_map: Dict[str, float],
+    ) -> tuple[List[str], List[List[int]], List[List[float]]]:
+        """Dense ``[room_type][day]`` availability and price rows, in ``totals`` order."""
+        free = self.available(totals)
+        room_types = list(totals)
+        availability = [free[room_type] for room_type in room_types]
+        prices = [[price_map.get(room_type, 0.0)] * self.days for room_type in room_types]
+        return room_types, availability, prices
+
+    def _offset(self, value: object) -> Optional[int]:
+        if not isinstance(value, str):
+            return None
+        cache = self._date_cache
+        if value in cache:
+            return cache[value]
+        try:
+            offset: Optional[int] = dt.date.fromisoformat(value).toordinal() - self._start_ordinal
+        except ValueError:
+            offset = None
+        cache[value] = offset
+        return offset
+
+
+def run_lengths(values: Sequence[T]) -> List[Tuple[int, int, T]]:
+    """Collapse a row into ``(start, length, value)`` spans of equal consecutive values."""
+    spans: List[Tuple[int, int, T]] = []
+    start = 0
+    for index in range(1, len(values) + 1):
+        if index == len(values) or values[index] != values[start]:
+            spans.append((start, index - start, values[start]))
+            start = index
+    return spans
@@ -1,8 +1,11 @@
 from __future__ import annotations
 
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Literal, Optional, Tuple, Union
 
-from pydantic import BaseModel, Field, field_validator, ConfigDict
+from pydantic import BaseModel, Field, field_validator, model_validator, ConfigDict
+
+from currency_resolver import decide_currency
+from services.availability import projection
 
 
 class AvailabilityRequest(BaseModel):
@@ -11,6 +14,14 @@ class AvailabilityRequest(BaseModel):
     adults: int = Field(ge=1, le=8)
     children: int = Field(ge=0, le=8)
     currency: Optional[str] = Field(default=None, min_length=3, max_length=3)
+    include: List[str] = Field(default_factory=list)
+    fields: Optional[List[str]] = None
+    format: Literal["nested", "columnar", "rle"] = "nested"
+    # Converting ``prices``: an explicit display currency, or hints for ``decide_currency``.
+    display_currency: Optional[str] = Field(default=None, min_length=3, max_length=3)
+    channel_default: Optional[str] = Field(default=None, min_length=3, max_length=3)
+    phone_country: Optional[str] = Field(default=None, min_length=2, max_length=2)
+    ip_country: Optional[str] = Field(default=None, min_length=2, max_length=2)
 
     @field_validator("check_in", "check_out")
     @classmethod
@@ -20,11 +31,61 @@ class AvailabilityRequest(BaseModel):
         date.fromisoformat(value)
         return value
 
-    @field_validator("currency")
+    @field_validator("currency", "display_currency", "channel_default")
     @classmethod
     def validate_currency(cls, value: Optional[str]) -> Optional[str]:
         return value.upper() if value else value
 
+    @field_validator("phone_country", "ip_country")
+    @classmethod
+    def validate_country(cls, value: Optional[str]) -> Optional[str]:
+        return value.upper() if value else value
+
+    @field_validator("include", mode="before")
+    @classmethod
+    def validate_include(cls, value: Any) -> List[str]:
+        return projection.validate_include(projection.split_paths(value))
+
+    @field_validator("fields", mode="before")
+    @classmethod
+    def validate_fields(cls, value: Any) -> Optional[List[str]]:
+        if value is None:
+            return None
+        return projection.validate_fields(projection.split_paths(value)) or None
+
+    def raw_sections(self) -> set[str]:
+        return projection.raw_sections(self.include, self.fields)
+
+    def wants_conversion(self) -> bool:
+        return any(
+            (self.display_currency, self.channel_default, self.phone_country, self.ip_country)
+        )
+
+    def resolve_display_currency(self, property_currency: str) -> Optional[str]:
+        """Currency ``prices`` should be shown in, or ``None`` to leave them unconverted."""
+        if not self.wants_conversion():
+            return None
+        return decide_currency(
+            user_choice=self.display_currency,
+            channel_default=self.channel_default,
+            phone_country=self.phone_country,
+            ip_country=self.ip_country,
+            property_base_currency=property_currency,
+        )
+
+    def response_include(self) -> Dict[str, Any]:
+        return projection.build_include(
+            self.include, self.fields, self.format, self.wants_conversion()
+        )
+
+
+class PriceConversion(BaseModel):
+    """How ``prices`` were converted from the property's price currency."""
+
+    base_currency: str
+    rate: float
+    timestamp: Optional[str]  # rate table timestamp, ``None`` for configured defaults
+
 
 class AvailabilityResponse(BaseModel):
     model_config = ConfigDict(arbitrary_types_allowed=True)
@@ -35,5 +96,95 @@ class AvailabilityResponse(BaseModel):
     price_currency: str
     availability: Dict[str, Dict[str, int]]
     prices: Dict[str, Dict[str, float]]
-    raw: Dict[str, Any]
+    raw: Optional[Dict[str, Any]] = None
+    summary_unavailable: bool
+    fx: Optional[PriceConversion] = None
+
+
+class ColumnarAvailabilityResponse(BaseModel):
+    """Dense matrices indexed ``[room_type][date]`` along the ``room_types``/``dates`` axes."""
+
+    format: Literal["columnar"] = "columnar"
+    total: Optional[float]
+    currency: str
+    nights: int
+    price_currency: str
+    dates: List[str]
+    room_types: List[str]
+    availability: List[List[int]]
+    prices: List[List[float]]
+    raw: Optional[Dict[str, Any]] = None
+    summary_unavailable: bool
+    fx: Optional[PriceConversion] = None
+
+
+class RunLengthAvailabilityResponse(BaseModel):
+    """Per room type, ``[start_index, length, value]`` spans over ``dates``."""
+
+    format: Literal["rle"] = "rle"
+    total: Optional[float]
+    currency: str
+    nights: int
+    price_currency: str
+    dates: List[str]
+    room_types: List[str]
+    availability: List[List[Tuple[int, int, int]]]
+    prices: List[List[Tuple[int, int, float]]]
+    raw: Optional[Dict[str, Any]] = None
     summary_unavailable: bool
+    fx: Optional[PriceConversion] = None
+
+
+AnyAvailabilityResponse = Union[
+    AvailabilityResponse, ColumnarAvailabilityResponse, RunLengthAvailabilityResponse
+]
+
+
+class FlexibleSearchRequest(BaseModel):
+    window_start: str
+    window_end: str
+    nights: int = Field(ge=1, le=60)
+    adults: int = Field(ge=1, le=8)
+    children: int = Field(ge=0, le=8)
+    rooms: int = Field(default=1, ge=1, le=10)
+    top_k: int = Field(default=5, ge=1, le=50)
+    currency: Optional[str] = Field(default=None, min_length=3, max_length=3)
+
+    @field_validator("window_start", "window_end")
+    @classmethod
+    def validate_date(cls, value: str) -> str:
+        from datetime import date
+
+        date.fromisoformat(value)
+        return value
+
+    @field_validator("currency")
+    @classmethod
+    def validate_currency(cls, value: Optional[str]) -> Optional[str]:
+        return value.upper() if value else value
+
+    @model_validator(mode="after")
+    def validate_window(self) -> "FlexibleSearchRequest":
+        from datetime import date
+
+        days = (date.fromisoformat(self.window_end) - date.fromisoformat(self.window_start)).days
+        if days < self.nights:
+            raise ValueError("window must be at least as long as the stay")
+        if days > 366:
+            raise ValueError("window must not exceed 366 days")
+        return self
+
+
+class StayOption(BaseModel):
+    check_in: str
+    check_out: str
+    room_type: str
+    total_price: float
+    min_available: int
+
+
+class FlexibleSearchResponse(BaseModel):
+    nights: int
+    currency: str
+    price_currency: str
+    options: List[StayOption]
@@ -0,0 +1,99 @@
+"""Opt-in ``raw`` sections, field projection and matrix formats for availability responses."""
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+PUBLIC_FIELDS = ("total", "currency", "nights", "price_currency", "availability", "prices")
+RAW_SECTIONS = ("rooms", "reservations", "currencies")
+AXIS_FIELDS = ("format", "dates", "room_types")
+RESPONSE_FIELDS = PUBLIC_FIELDS + AXIS_FIELDS + ("fx", "raw", "summary_unavailable")
+
+FORMATS = ("nested", "columnar", "rle")
+FORMAT_MEDIA_TYPES = {
+    "application/vnd.hotelrunner.availability.columnar+json": "columnar",
+    "application/vnd.hotelrunner.availability.rle+json": "rle",
+}
+
+
+def split_paths(value: Any) -> List[str]:
+    """Accept ``"a,b.c"`` or ``["a", "b.c"]`` and return stripped, non-empty paths."""
+    if value is None:
+        return []
+    items = value.split(",") if isinstance(value, str) else list(value)
+    return [str(item).strip() for item in items if str(item).strip()]
+
+
+def validate_include(paths: Iterable[str]) -> List[str]:
+    result = []
+    for path in paths:
+        head, _, section = path.partition(".")
+        if head != "raw" or (section and section not in RAW_SECTIONS):
+            raise ValueError(
+                f"unsupported include '{path}', expected raw or raw.<{'|'.join(RAW_SECTIONS)}>"
+            )
+        result.append(path)
+    return result
+
+
+def validate_fields(paths: Iterable[str]) -> List[str]:
+    result = []
+    for path in paths:
+        if path.split(".", 1)[0] not in RESPONSE_FIELDS:
+            raise ValueError(f"unknown response field '{path}'")
+        result.append(path)
+    return result
+
+
+def raw_sections(include: Iterable[str], fields: Optional[Iterable[str]] = None) -> Set[str]:
+    """Upstream ``raw`` sections the caller asked for via ``include`` or ``fields``."""
+    sections: Set[str] = set()
+    for path in list(include) + [p for p in (fields or []) if p.split(".", 1)[0] == "raw"]:
+        parts = path.split(".")
+        if len(parts) == 1:
+            return set(RAW_SECTIONS)
+        if parts[1] in RAW_SECTIONS:
+            sections.add(parts[1])
+    return sections
+
+
+def format_from_accept(accept: Optional[str]) -> Optional[str]:
+    """Matrix format requested through a vendor media type in ``Accept``, if any."""
+    for part in (accept or "").split(","):
+        media_type = part.split(";", 1)[0].strip().lower()
+        if media_type in FORMAT_MEDIA_TYPES:
+            return FORMAT_MEDIA_TYPES[media_type]
+    return None
+
+
+def build_include(
+    include: Iterable[str],
+    fields: Optional[Iterable[str]] = None,
+    format: str = "nested",
+    converted: bool = False,
+) -> Dict[str, Any]:
+    """Translate dotted paths into a pydantic ``include`` spec.
+
+    Without ``fields`` the public fields are returned (plus the ``dates`` /
+    ``room_types`` axes for the compact formats and ``fx`` when a price
+    conversion was requested); ``include`` adds the requested ``raw``
+    sections on top either way.
+    """
+    if fields:
+        paths = list(fields)
+    else:
+        paths = list(PUBLIC_FIELDS) + (list(AXIS_FIELDS) if format != "nested" else [])
+        if converted:
+            paths.append("fx")
+    paths.extend(f"raw.{section}" for section in sorted(raw_sections(include)))
+    spec: Dict[str, Any] = {}
+    for path in paths:
+        node = spec
+        parts = path.split(".")
+        for index, part in enumerate(parts):
+            if node.get(part) is True:
+                break
+            if index == len(parts) - 1:
+                node[part] = True
+            else:
+                node = node.setdefault(part, {})
+    return spec
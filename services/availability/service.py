@@ -1,97 +1,453 @@
 from __future__ import annotations
 
+import contextvars
 import datetime as dt
 import logging
-from typing import Dict
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
-from clients.hotelrunner.currencies import fetch_currencies
-from clients.hotelrunner.reservations import fetch_reservations
-from clients.hotelrunner.rooms import fetch_rooms
-from clients.hotelrunner.common import PROPERTY_CURRENCY
-from services.availability.models import AvailabilityRequest, AvailabilityResponse
+from clients.hotelrunner.common import call_deadline, property_currency
+from clients.hotelrunner.metadata import get_currencies, get_rooms
+from clients.hotelrunner.tenancy import (
+    UnknownPropertyError,
+    current_property,
+    registry,
+    use_property,
+)
+from clients.hotelrunner.reservations import (
+    fetch_modified_reservations,
+    fetch_reservations,
+    iter_reservation_pages,
+    overlap_window,
+    record_max_stay,
+)
+from currency_resolver import convert_minor_batch, from_minor, to_minor
+from services.availability import ledger
+from services.availability.cache import ReservationTracker, ResponseCache, cache_key
+from services.availability.matrix import AvailabilityGrid, run_lengths
+from services.availability.models import (
+    AnyAvailabilityResponse,
+    AvailabilityRequest,
+    AvailabilityResponse,
+    ColumnarAvailabilityResponse,
+    PriceConversion,
+    RunLengthAvailabilityResponse,
+)
+from services.availability.projection import RAW_SECTIONS
+from settings import get_settings
+from utils import metrics
 
 LOGGER = logging.getLogger(__name__)
 
+_settings = get_settings()
+RESPONSE_CACHE = ResponseCache(
+    max_entries=_settings.response_cache_max_entries,
+    ttl=_settings.response_cache_ttl_seconds,
+)
+_UPSTREAM_EXECUTOR = ThreadPoolExecutor(
+    max_workers=_settings.upstream_max_workers,
+    thread_name_prefix="hotelrunner-upstream",
+)
 
-def get_availability(payload: AvailabilityRequest) -> AvailabilityResponse:
-    rooms = _fetch_rooms_safe()
-    reservations = _fetch_reservations_safe(
-        dt.date.fromisoformat(payload.check_in) - dt.timedelta(days=30),
-        dt.date.fromisoformat(payload.check_out) + dt.timedelta(days=1),
-    )
-    matrix = _build_availability_matrix(payload, rooms, reservations)
-    raw = {
-        "rooms": rooms,
-        "reservations": reservations,
-        "currencies": fetch_currencies(),
+
+def get_availability(payload: AvailabilityRequest) -> AnyAvailabilityResponse:
+    key = cache_key(payload, property_currency())
+    cached = RESPONSE_CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    generation = RESPONSE_CACHE.generation(key[0])
+    sections = payload.raw_sections()
+    grid = None if "reservations" in sections else ledger_grid(payload)
+    tasks: Dict[str, Callable[[], object]] = {"rooms": fetch_rooms_safe}
+    tracker = None
+    if grid is None:
+        start, end = reservation_window(payload)
+        grid = AvailabilityGrid(
+            dt.date.fromisoformat(payload.check_in), dt.date.fromisoformat(payload.check_out)
+        )
+        tracker = RESPONSE_CACHE.track_reservations(start, end)
+        tasks["reservations"] = lambda: _stream_reservations_safe(
+            start, end, grid, tracker, keep="reservations" in sections
+        )
+    if "currencies" in sections:
+        tasks["currencies"] = _fetch_currencies_safe
+    upstream = fetch_concurrently(tasks)
+    response = build_response(payload, upstream, grid, fx_quote_for(payload, upstream["rooms"]))
+    if tracker is not None:
+        # Changes this fetch found itself are already in the response.
+        generation += tracker.invalidations
+    RESPONSE_CACHE.put(key, payload, response, generation)
+    return response
+
+
+def get_availability_batch(
+    payloads: List[AvailabilityRequest],
+) -> List[Union[AnyAvailabilityResponse, Exception]]:
+    """Answer several requests from one upstream fetch over their union window.
+
+    Upstream failures raise for the whole batch; errors while composing a
+    single answer are returned in that item's slot.
+    """
+    if not payloads:
+        return []
+    windows = [reservation_window(payload) for payload in payloads]
+    start = min(window[0] for window in windows)
+    end = max(window[1] for window in windows)
+    sections = set().union(*(payload.raw_sections() for payload in payloads))
+    tasks: Dict[str, Callable[[], object]] = {
+        "rooms": fetch_rooms_safe,
+        "reservations": lambda: fetch_reservations_safe(start, end),
     }
+    if "currencies" in sections:
+        tasks["currencies"] = _fetch_currencies_safe
+    upstream = fetch_concurrently(tasks)
+
+    results: List[Union[AnyAvailabilityResponse, Exception]] = []
+    for payload, window in zip(payloads, windows):
+        try:
+            item_upstream = dict(upstream)
+            if "reservations" in payload.raw_sections():
+                item_upstream["reservations"] = _reservations_in_window(
+                    upstream["reservations"], *window
+                )
+            quote = fx_quote_for(payload, upstream["rooms"])
+            results.append(build_response(payload, item_upstream, fx_quote=quote))
+        except Exception as exc:
+            LOGGER.warning("Batch item %s..%s failed: %s", payload.check_in, payload.check_out, exc)
+            results.append(exc)
+    return results
+
+
+# Changes are re-read from this long before the sync cursor, absorbing clock skew.
+SYNC_OVERLAP = dt.timedelta(minutes=5)
+
+
+def apply_reservation_events(
+    events: List[dict], property_id: Optional[str] = None
+) -> Dict[str, int]:
+    """Apply webhook events to their properties' ledgers and evict what they changed.
+
+    Each event goes to the property registered with the ``hr_id`` it names;
+    events without one go to ``property_id``, or to the only registered
+    property. Otherwise nothing is applied and
+    :class:`~services.availability.ledger.LedgerRoutingError` is raised.
+    Events for an unknown ``hr_id`` count as invalid.
+    """
+    hotels = registry()
+    counts = {"applied": 0, "duplicates": 0, "invalid": 0}
+    routed: Dict[str, List[Tuple[Any, ledger.Stay]]] = {}
+    for event in events:
+        try:
+            reservation, cancelled = ledger.parse_event(event)
+            hr_id = ledger.event_hr_id(event, reservation)
+            if hr_id is not None:
+                target = hotels.by_hr_id(hr_id).id
+            elif property_id or len(hotels) == 1:
+                target = property_id or hotels.default_id
+            else:
+                raise ledger.LedgerRoutingError(
+                    "event names no hr_id; select the property with X-Property-Id"
+                )
+            routed.setdefault(target, []).append(ledger.stay_from(reservation, cancelled))
+        except (ledger.LedgerEventError, UnknownPropertyError) as exc:
+            LOGGER.warning("Ignoring reservation event: %s", exc)
+            counts["invalid"] += 1
+            metrics.LEDGER_EVENTS.inc(source="webhook", result="invalid")
+    for target, stays in routed.items():
+        with use_property(target):
+            for name, value in _apply_stays(stays, "webhook").items():
+                counts[name] += value
+    return counts
+
+
+def reconcile_ledger(today: Optional[dt.date] = None) -> int:
+    """Reconcile the current property's ledger against one full reservation fetch.
+
+    The ledger then covers ``LEDGER_HORIZON_DAYS`` nights from ``today``;
+    reservations checking in up to ``RESERVATION_MAX_LOOKBACK_DAYS`` before
+    that are fetched too. Returns the number of drifted date ranges.
+    """
+    book = ledger.current_ledger()
+    start, covered = _ledger_window(today)
+    since = ledger.utc_now()
+    try:
+        reservations = fetch_reservations_safe(start, covered[1])
+        drift = book.reconcile(start, covered[1], reservations, covered, since)
+    finally:
+        book.reconciling = False
+    # Everything modified before the fetch started is in the ledger now.
+    book.record_sync(since)
+    property_id = current_property().id
+    for lo, hi in drift:
+        RESPONSE_CACHE.invalidate_dates(lo, hi, property_id)
+    if drift:
+        LOGGER.info("Booking ledger of %s corrected %d drifted stays", property_id, len(drift))
+        metrics.LEDGER_DRIFT.inc(len(drift))
+    return len(drift)
+
+
+def sync_ledger(today: Optional[dt.date] = None) -> Dict[str, int]:
+    """Bring the current property's ledger up to date, for the background sync job.
+
+    Reconciles when the ledger has no sync cursor yet or is older than
+    ``LEDGER_RECONCILE_SECONDS``; otherwise fetches only the reservations
+    modified since the cursor, applies them and advances the cursor to the
+    newest modification time seen.
+    """
+    book = ledger.current_ledger()
+    age = book.age()
+    cursor = book.cursor()
+    if cursor is None or age is None or age >= _settings.ledger_reconcile_seconds:
+        book.reconciling = True
+        return {"drift": reconcile_ledger(today)}
+
+    start, covered = _ledger_window(today)
+    try:
+        since = (dt.datetime.fromisoformat(cursor) - SYNC_OVERLAP).isoformat()
+    except ValueError:
+        since = cursor
+    try:
+        reservations = fetch_modified_reservations(start, covered[1], since)
+    except Exception as exc:
+        LOGGER.warning("Modified reservations request failed: %s", exc)
+        raise RuntimeError("HotelRunner reservations unavailable") from exc
+    stays: List[Tuple[Any, ledger.Stay]] = []
+    for reservation in reservations:
+        try:
+            stays.append(ledger.stay_from(reservation, False))
+        except ledger.LedgerEventError:
+            metrics.LEDGER_EVENTS.inc(source="sync", result="invalid")
+    counts = _apply_stays(stays, "sync")
+    book.record_sync(max((stay.modified for _, stay in stays), default=cursor) or cursor)
+    return counts
+
+
+def _apply_stays(stays: List[Tuple[Any, ledger.Stay]], source: str) -> Dict[str, int]:
+    counts = {"applied": 0, "duplicates": 0}
+    if not stays:
+        return counts
+    property_id = current_property().id
+    for changed in ledger.current_ledger().apply_stays(stays):
+        if changed is None:
+            counts["duplicates"] += 1
+            metrics.LEDGER_EVENTS.inc(source=source, result="duplicate")
+            continue
+        counts["applied"] += 1
+        metrics.LEDGER_EVENTS.inc(source=source, result="applied")
+        for lo, hi in changed:
+            RESPONSE_CACHE.invalidate_dates(lo, hi, property_id)
+    return counts
+
+
+def _ledger_window(today: Optional[dt.date]) -> tuple[dt.date, tuple[dt.date, dt.date]]:
+    """Check-in date to fetch from, and the nights a reconciled ledger covers."""
+    today = today or dt.date.today()
+    covered = (today, today + dt.timedelta(days=_settings.ledger_horizon_days))
+    return today - dt.timedelta(days=_settings.reservation_max_lookback_days), covered
+
+
+_RECONCILE_LOCK = threading.Lock()
+
+
+def ledger_grid(payload: AvailabilityRequest) -> Optional[AvailabilityGrid]:
+    """Booked counts from the booking ledger when it covers the stay, else ``None``.
+
+    A ledger older than ``LEDGER_RECONCILE_SECONDS`` is reconciled in the
+    background (by the sync job where one runs) while it keeps answering;
+    past twice that it is not trusted. Attempts are at least a tenth of
+    ``LEDGER_RECONCILE_SECONDS`` apart, so a failing upstream is not asked
+    for the whole horizon on every request.
+    """
+    if not ledger.enabled():
+        return None
+    book = ledger.current_ledger()
+    age = book.age()
+    if (
+        age is None or age >= _settings.ledger_reconcile_seconds
+    ) and not ledger.BACKGROUND_SYNC.is_set():
+        now = time.monotonic()
+        with _RECONCILE_LOCK:
+            start_reconcile = not book.reconciling and (
+                book.reconcile_started is None
+                or now - book.reconcile_started >= _settings.ledger_reconcile_seconds / 10
+            )
+            if start_reconcile:
+                book.reconciling = True
+                book.reconcile_started = now
+        if start_reconcile:
+            threading.Thread(
+                target=contextvars.copy_context().run,
+                args=(_reconcile_in_background,),
+                name="booking-ledger-reconcile",
+                daemon=True,
+            ).start()
+    first_night = dt.date.fromisoformat(payload.check_in)
+    check_out = dt.date.fromisoformat(payload.check_out)
+    if not book.covers(first_night, check_out, 2 * _settings.ledger_reconcile_seconds):
+        metrics.LEDGER_LOOKUPS.inc(result="miss")
+        return None
+    grid = AvailabilityGrid(first_night, check_out)
+    book.fill(grid)
+    metrics.LEDGER_LOOKUPS.inc(result="hit")
+    return grid
+
+
+def _reconcile_in_background() -> None:
+    try:
+        reconcile_ledger()
+    except Exception as exc:  # keep answering from upstream until the next attempt
+        LOGGER.warning("Booking ledger reconciliation failed: %s", exc)
+
 
-    return AvailabilityResponse(
-        total=None,
-        currency=(payload.currency or PROPERTY_CURRENCY).upper(),
-        nights=matrix["nights"],
-        price_currency=matrix["price_currency"],
-        availability=matrix["availability"],
-        prices=matrix["prices"],
-        raw=raw,
-        summary_unavailable=True,
+def reservation_window(payload: AvailabilityRequest) -> tuple[dt.date, dt.date]:
+    """Check-in range of the reservations that can overlap the requested nights."""
+    return overlap_window(
+        dt.date.fromisoformat(payload.check_in), dt.date.fromisoformat(payload.check_out)
     )
 
 
+def fx_quote_for(
+    payload: AvailabilityRequest, rooms: list[dict]
+) -> Optional[Tuple[Decimal, Optional[str]]]:
+    """Rate and timestamp for showing ``rooms``' prices in the requested currency.
+
+    ``None`` when no conversion is needed. May call the FX API, so the async
+    path runs it in an executor before handing the result to
+    :func:`build_response`.
+    """
+    _, _, currency = parse_room_metadata(rooms)
+    display_currency = payload.resolve_display_currency(property_currency())
+    if display_currency and display_currency != currency:
+        return _settings.get_fx_quote(currency, display_currency)
+    return None
+
+
+def build_response(
+    payload: AvailabilityRequest,
+    upstream: Dict[str, object],
+    grid: Optional[AvailabilityGrid] = None,
+    fx_quote: Optional[Tuple[Decimal, Optional[str]]] = None,
+) -> AnyAvailabilityResponse:
+    """Assemble the response from fetched ``rooms``/``reservations`` (+ optional currencies).
+
+    ``grid`` is a grid already fed from streamed reservation pages; without
+    it one is built from ``upstream["reservations"]``. ``fx_quote`` comes
+    from :func:`fx_quote_for`; prices are only converted when it is given.
+    The matrices take the shape selected by ``payload.format``.
+    """
+    sections = payload.raw_sections()
+    matrix = _build_availability_matrix(
+        payload, upstream["rooms"], upstream.get("reservations") or [], grid, fx_quote
+    )
+    raw = {section: upstream[section] for section in RAW_SECTIONS if section in sections}
+    common = {
+        "total": None,
+        "currency": (payload.currency or property_currency()).upper(),
+        "nights": matrix["nights"],
+        "price_currency": matrix["price_currency"],
+        "availability": matrix["availability"],
+        "prices": matrix["prices"],
+        "raw": raw or None,
+        "summary_unavailable": True,
+        "fx": matrix.get("fx"),
+    }
+    if payload.format == "nested":
+        return AvailabilityResponse(**common)
+    axes = {"dates": matrix["dates"], "room_types": matrix["room_types"]}
+    if payload.format == "rle":
+        return RunLengthAvailabilityResponse(**common, **axes)
+    return ColumnarAvailabilityResponse(**common, **axes)
+
+
 def _build_availability_matrix(
     payload: AvailabilityRequest,
     rooms: list[dict],
     reservations: list[dict],
+    grid: Optional[AvailabilityGrid] = None,
+    fx_quote: Optional[Tuple[Decimal, Optional[str]]] = None,
 ) -> Dict[str, object]:
-    totals, price_map, currency = _parse_room_metadata(rooms)
+    totals, price_map, currency = parse_room_metadata(rooms)
     start = dt.date.fromisoformat(payload.check_in)
     end = dt.date.fromisoformat(payload.check_out)
+    conversion = None
+    display_currency = payload.resolve_display_currency(property_currency())
+    if fx_quote is not None and display_currency and display_currency != currency:
+        price_map, conversion = _convert_prices(price_map, currency, display_currency, fx_quote)
+        currency = display_currency
+
+    if grid is None:
+        grid = AvailabilityGrid(start, end)
+        grid.add_reservations(reservations)
+        record_max_stay(grid.max_stay)
+    matrix: Dict[str, object] = {
+        "price_currency": currency,
+        "nights": (end - start).days,
+        "fx": conversion,
+    }
+    if payload.format == "nested":
+        matrix["availability"], matrix["prices"] = grid.to_matrices(totals, price_map)
+        return matrix
+
+    room_types, availability, prices = grid.to_columns(totals, price_map)
+    if payload.format == "rle":
+        availability = [run_lengths(row) for row in availability]
+        prices = [run_lengths(row) for row in prices]
+    matrix.update(
+        dates=grid.dates(), room_types=room_types, availability=availability, prices=prices
+    )
+    return matrix
 
-    booked: Dict[str, Dict[str, int]] = {}
+
+def _convert_prices(
+    price_map: Dict[str, float],
+    base_currency: str,
+    display_currency: str,
+    fx_quote: Tuple[Decimal, Optional[str]],
+) -> tuple[Dict[str, float], PriceConversion]:
+    """Convert every room type's nightly price in one integer minor-unit batch.
+
+    Prices are per room type, so converting the map before the grid is
+    materialised covers every night and every response format at once.
+    """
+    rate, timestamp = fx_quote
+    converted = convert_minor_batch(
+        [to_minor(price, base_currency) for price in price_map.values()],
+        base_currency,
+        display_currency,
+        rate,
+    )
+    prices = {
+        room_type: from_minor(amount, display_currency)
+        for room_type, amount in zip(price_map, converted)
+    }
+    return prices, PriceConversion(
+        base_currency=base_currency, rate=float(rate), timestamp=timestamp
+    )
+
+
+def _reservations_in_window(reservations: list[dict], start: dt.date, end: dt.date) -> list[dict]:
+    """Reservations whose stay overlaps ``[start, end)`` (unparseable ones are kept)."""
+    start_key, end_key = start.isoformat(), end.isoformat()
+    selected = []
     for reservation in reservations:
-        room_type = reservation.get("room_type") or reservation.get("room_type_name")
         check_in = reservation.get("check_in")
         check_out = reservation.get("check_out")
-        if not (room_type and check_in and check_out):
-            continue
-        try:
-            res_start = dt.date.fromisoformat(check_in)
-            res_end = dt.date.fromisoformat(check_out)
-        except ValueError:
-            continue
-        current = max(res_start, start)
-        while current < min(res_end, end):
-            key = current.isoformat()
-            booked.setdefault(key, {}).setdefault(room_type, 0)
-            booked[key][room_type] += 1
-            current += dt.timedelta(days=1)
-
-    availability: Dict[str, Dict[str, int]] = {}
-    prices: Dict[str, Dict[str, float]] = {}
-    current = start
-    while current < end:
-        key = current.isoformat()
-        availability[key] = {}
-        prices[key] = {}
-        for room_type, total in totals.items():
-            count = booked.get(key, {}).get(room_type, 0)
-            availability[key][room_type] = max(total - count, 0)
-            prices[key][room_type] = price_map.get(room_type, 0.0)
-        current += dt.timedelta(days=1)
-
-    nights = (end - start).days
-    return {
-        "price_currency": currency,
-        "availability": availability,
-        "prices": prices,
-        "nights": nights,
-    }
+        if isinstance(check_in, str) and isinstance(check_out, str):
+            if check_out[:10] <= start_key or check_in[:10] >= end_key:
+                continue
+        selected.append(reservation)
+    return selected
 
 
-def _parse_room_metadata(rooms: list[dict]) -> tuple[Dict[str, int], Dict[str, float], str]:
+def parse_room_metadata(rooms: list[dict]) -> tuple[Dict[str, int], Dict[str, float], str]:
     totals: Dict[str, int] = {}
     price_map: Dict[str, float] = {}
-    currency = PROPERTY_CURRENCY
+    currency = property_currency()
 
     for room in rooms:
         room_type = room.get("name") or room.get("room_type_name") or room.get("room_type")
@@ -124,17 +480,100 @@ def _safe_float(value) -> float | None:
         return None
 
 
-def _fetch_rooms_safe() -> list[dict]:
+def fetch_concurrently(
+    tasks: Dict[str, Callable[[], object]],
+    deadline: float | None = None,
+) -> Dict[str, object]:
+    """Run independent upstream fetches in parallel under one overall deadline.
+
+    The first failure to complete is re-raised as-is (the ``_safe`` wrappers
+    already map errors to ``RuntimeError``); exceeding the deadline raises
+    ``RuntimeError``. Every task runs under :func:`call_deadline`, so a fetch
+    we stopped waiting for gives up its executor thread once its own timeout
+    runs out instead of retrying at full length.
+    """
+    deadline = _settings.availability_deadline_seconds if deadline is None else deadline
+    until = time.monotonic() + deadline
+    failed: Optional[Future] = None
+    with metrics.upstream_span():
+        futures: Dict[str, Future] = {
+            name: _UPSTREAM_EXECUTOR.submit(contextvars.copy_context().run, _run_until, until, task)
+            for name, task in tasks.items()
+        }
+        try:
+            for future in as_completed(futures.values(), timeout=deadline):
+                if future.exception() is not None:
+                    failed = future
+                    break
+        except FuturesTimeoutError:
+            pass
+    if failed is not None:
+        for other in futures.values():
+            other.cancel()
+        raise failed.exception()
+    pending = sorted(name for name, future in futures.items() if not future.done())
+    if pending:
+        for name in pending:
+            futures[name].cancel()
+        LOGGER.warning("Upstream deadline of %ss exceeded waiting for %s", deadline, pending)
+        raise RuntimeError(f"HotelRunner upstream timed out: {', '.join(pending)}")
+    return {name: future.result() for name, future in futures.items()}
+
+
+def _run_until(until: float, task: Callable[[], object]) -> object:
+    with call_deadline(until):
+        return task()
+
+
+def fetch_rooms_safe() -> list[dict]:
     try:
-        return fetch_rooms()
+        return get_rooms()
     except Exception as exc:
         LOGGER.warning("Rooms request failed: %s", exc)
         raise RuntimeError("HotelRunner rooms unavailable") from exc
 
 
-def _fetch_reservations_safe(start: dt.date, end: dt.date) -> list[dict]:
+def fetch_reservations_safe(start: dt.date, end: dt.date) -> list[dict]:
     try:
-        return fetch_reservations(start, end)
+        reservations = fetch_reservations(start, end)
     except Exception as exc:
         LOGGER.warning("Reservations request failed: %s", exc)
         raise RuntimeError("HotelRunner reservations unavailable") from exc
+    RESPONSE_CACHE.observe_reservations(start, end, reservations)
+    return reservations
+
+
+def _stream_reservations_safe(
+    start: dt.date,
+    end: dt.date,
+    grid: AvailabilityGrid,
+    tracker: ReservationTracker,
+    keep: bool = False,
+) -> Optional[list[dict]]:
+    """Feed reservation pages into ``grid`` as they arrive.
+
+    Pages are dropped once applied, so memory tracks the grid rather than
+    the number of reservations; they are only kept (and returned) when the
+    caller asked for ``raw.reservations``.
+    """
+    kept: Optional[list[dict]] = [] if keep else None
+    try:
+        for page in iter_reservation_pages(start, end):
+            grid.add_reservations(page.reservations)
+            tracker.add(page.reservations)
+            if kept is not None:
+                kept.extend(page.reservations)
+    except Exception as exc:
+        LOGGER.warning("Reservations request failed: %s", exc)
+        raise RuntimeError("HotelRunner reservations unavailable") from exc
+    tracker.finish()
+    record_max_stay(grid.max_stay)
+    return kept
+
+
+def _fetch_currencies_safe() -> list[dict]:
+    try:
+        return get_currencies()
+    except Exception as exc:
+        LOGGER.warning("Currencies request failed: %s", exc)
+        raise RuntimeError("HotelRunner currencies unavailable") from exc
@@ -0,0 +1,370 @@
+"""Node-wide booking ledger on SQLite, shared by all workers and kept across restarts.
+
+``INVENTORY_DB`` names the database file. It runs in WAL mode, so readers
+never wait for writers or each other; every thread of every process uses
+its own connection. Writes are batched into one transaction per webhook
+delivery; reconciliations commit every ``RECONCILE_CHUNK`` reservations
+so webhook deliveries are not stuck behind them. ``booked`` is keyed on
+(property, night, room type), so the booked counts of a stay are one
+primary-key range scan.
+"""
+from __future__ import annotations
+
+import datetime as dt
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+from services.availability.ledger import (
+    DateRange,
+    LedgerBusyError,
+    LedgerEventError,
+    Stay,
+    pushed_since,
+    replace_active,
+    stay_from,
+    supersedes,
+    sync_report,
+    sync_state,
+)
+from services.availability.matrix import AvailabilityGrid
+
+T = TypeVar("T")
+
+# Reservations per reconciliation write transaction; webhook writes wait for at most one.
+RECONCILE_CHUNK = 500
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS reservations (
+        property_id TEXT NOT NULL,
+        reservation_id TEXT NOT NULL,
+        room_type TEXT NOT NULL,
+        check_in INTEGER NOT NULL,
+        check_out INTEGER NOT NULL,
+        modified TEXT NOT NULL,
+        active INTEGER NOT NULL,
+        PRIMARY KEY (property_id, reservation_id)
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS reservations_check_in ON reservations (property_id, check_in)",
+    """
+    CREATE TABLE IF NOT EXISTS booked (
+        property_id TEXT NOT NULL,
+        night INTEGER NOT NULL,
+        room_type TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (property_id, night, room_type)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS coverage (
+        property_id TEXT PRIMARY KEY,
+        first_night INTEGER NOT NULL,
+        last_night INTEGER NOT NULL,
+        reconciled_at REAL NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS sync_state (
+        property_id TEXT PRIMARY KEY,
+        cursor TEXT,
+        synced_at REAL,
+        error TEXT
+    )
+    """,
+)
+
+
+class InventoryStore:
+    """One SQLite database file; hands out per-property :class:`StoredLedger` views."""
+
+    def __init__(self, path: str, timeout: float = 5.0) -> None:
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with self.write() as conn:
+            for statement in SCHEMA:
+                conn.execute(statement)
+
+    def connection(self) -> sqlite3.Connection:
+        """This thread's connection (reopened after a fork)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(
+                self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    @contextmanager
+    def write(self) -> Iterator[sqlite3.Connection]:
+        """One write transaction; ``BEGIN IMMEDIATE`` makes writers queue instead of deadlocking.
+
+        Raises :class:`~services.availability.ledger.LedgerBusyError` when
+        the write lock is not free within ``timeout`` seconds.
+        """
+        conn = self.connection()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.OperationalError as exc:
+            raise LedgerBusyError(f"inventory store is busy: {exc}") from exc
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def ledger(self, property_id: str) -> "StoredLedger":
+        return StoredLedger(self, property_id)
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            conn.close()
+        self._local = threading.local()
+
+
+class StoredLedger:
+    """:class:`~services.availability.ledger.BookingLedger` backed by an :class:`InventoryStore`.
+
+    Rows are shared by every worker using the same file, so an event
+    applied by one worker is visible to all and a restarted worker serves
+    from the last reconciliation right away. ``reconciling``,
+    ``reconcile_started`` and the event counters in :meth:`stats` are per
+    process.
+    """
+
+    def __init__(self, store: InventoryStore, property_id: str) -> None:
+        self.store = store
+        self.property_id = property_id
+        self.reconciling = False
+        self.reconcile_started: Optional[float] = None
+        self._stats_lock = threading.Lock()
+        self._stats = {"applied": 0, "duplicates": 0, "reconciles": 0, "drift": 0}
+
+    def apply(self, reservation: dict, cancelled: bool = False) -> Optional[List[DateRange]]:
+        return self.apply_stays([stay_from(reservation, cancelled)])[0]
+
+    def apply_stays(self, stays: Sequence[Tuple[Any, Stay]]) -> List[Optional[List[DateRange]]]:
+        with self.store.write() as conn:
+            results = [self._apply(conn, str(key), stay, keep_newer=True) for key, stay in stays]
+        applied = sum(1 for changed in results if changed is not None)
+        self._count(applied=applied, duplicates=len(results) - applied)
+        return results
+
+    def reconcile(
+        self,
+        start: dt.date,
+        end: dt.date,
+        reservations: Iterable[dict],
+        covered: Tuple[dt.date, dt.date],
+        since: str,
+    ) -> List[DateRange]:
+        fetched: Dict[str, Stay] = {}
+        for reservation in reservations:
+            try:
+                key, stay = stay_from(reservation, False)
+            except LedgerEventError:
+                continue
+            fetched[str(key)] = stay
+        first, last = covered[0].toordinal(), covered[1].toordinal()
+        seeding = self._coverage(self.store.connection()) is None
+        drift: List[DateRange] = []
+        for chunk in _chunks(list(fetched.items())):
+            with self.store.write() as conn:
+                for key, stay in chunk:
+                    drift.extend(self._apply(conn, key, stay, keep_newer=True) or ())
+        rows = self.store.connection().execute(
+            "SELECT reservation_id FROM reservations"
+            " WHERE property_id = ? AND check_in BETWEEN ? AND ? AND active = 1",
+            (self.property_id, start.toordinal(), end.toordinal()),
+        )
+        missing = [key for (key,) in rows if key not in fetched]
+        for chunk in _chunks(missing):
+            with self.store.write() as conn:
+                for key in chunk:
+                    # Re-read under the write lock: an event may have landed since the scan.
+                    stay = self._stay(conn, key)
+                    if stay is None or not stay.active or pushed_since(stay, since):
+                        continue
+                    drift.extend(
+                        self._apply(conn, key, replace_active(stay, False), keep_newer=False)
+                    )
+        with self.store.write() as conn:
+            # Nights before the covered range are never read again.
+            conn.execute(
+                "DELETE FROM reservations WHERE property_id = ? AND check_out <= ?",
+                (self.property_id, first),
+            )
+            conn.execute(
+                "DELETE FROM booked WHERE property_id = ? AND night < ?", (self.property_id, first)
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO coverage VALUES (?, ?, ?, ?)",
+                (self.property_id, first, last, time.time()),
+            )
+        if seeding:
+            drift = []
+        self._count(reconciles=1, drift=len(drift))
+        return drift
+
+    def age(self) -> Optional[float]:
+        coverage = self._coverage(self.store.connection())
+        return None if coverage is None else max(time.time() - coverage[2], 0.0)
+
+    def covers(self, first_night: dt.date, check_out: dt.date, max_age: float) -> bool:
+        coverage = self._coverage(self.store.connection())
+        return (
+            coverage is not None
+            and time.time() - coverage[2] < max_age
+            and coverage[0] <= first_night.toordinal()
+            and check_out.toordinal() <= coverage[1]
+        )
+
+    def fill(self, grid: AvailabilityGrid) -> None:
+        first = grid.start.toordinal()
+        rows = self.store.connection().execute(
+            "SELECT room_type, night, count FROM booked"
+            " WHERE property_id = ? AND night >= ? AND night < ? AND count > 0",
+            (self.property_id, first, first + grid.days),
+        )
+        counts: Dict[str, List[int]] = {}
+        for room_type, night, count in rows:
+            counts.setdefault(room_type, [0] * grid.days)[night - first] = count
+        for room_type, nights in counts.items():
+            grid.add_booked(room_type, nights)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats: Dict[str, Any] = dict(self._stats)
+        conn = self.store.connection()
+        stats["reservations"] = conn.execute(
+            "SELECT COUNT(*) FROM reservations WHERE property_id = ? AND active = 1",
+            (self.property_id,),
+        ).fetchone()[0]
+        coverage = self._coverage(conn)
+        stats["age_seconds"] = (
+            None if coverage is None else round(max(time.time() - coverage[2], 0.0), 3)
+        )
+        stats["covered"] = (
+            None
+            if coverage is None
+            else [dt.date.fromordinal(value).isoformat() for value in coverage[:2]]
+        )
+        stats["sync"] = sync_report(self._sync_state(conn), time.time())
+        stats["store"] = self.store.path
+        return stats
+
+    def cursor(self) -> Optional[str]:
+        return self._sync_state(self.store.connection())["cursor"]
+
+    def record_sync(self, cursor: Optional[str], error: Optional[str] = None) -> None:
+        with self.store.write() as conn:
+            state = sync_state(self._sync_state(conn), cursor, error, time.time())
+            conn.execute(
+                "INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?, ?)",
+                (self.property_id, state["cursor"], state["synced_at"], state["error"]),
+            )
+
+    def sync_status(self) -> Dict[str, Any]:
+        return sync_report(self._sync_state(self.store.connection()), time.time())
+
+    def _sync_state(self, conn: sqlite3.Connection) -> Dict[str, Any]:
+        row = conn.execute(
+            "SELECT cursor, synced_at, error FROM sync_state WHERE property_id = ?",
+            (self.property_id,),
+        ).fetchone()
+        return dict(zip(("cursor", "synced_at", "error"), row or (None, None, None)))
+
+    def _coverage(self, conn: sqlite3.Connection) -> Optional[Tuple[int, int, float]]:
+        return conn.execute(
+            "SELECT first_night, last_night, reconciled_at FROM coverage WHERE property_id = ?",
+            (self.property_id,),
+        ).fetchone()
+
+    def _stay(self, conn: sqlite3.Connection, key: str) -> Optional[Stay]:
+        row = conn.execute(
+            "SELECT room_type, check_in, check_out, modified, active FROM reservations"
+            " WHERE property_id = ? AND reservation_id = ?",
+            (self.property_id, key),
+        ).fetchone()
+        return None if row is None else Stay(*row[:4], active=bool(row[4]))
+
+    def _apply(
+        self, conn: sqlite3.Connection, key: str, stay: Stay, keep_newer: bool
+    ) -> Optional[List[DateRange]]:
+        previous = self._stay(conn, key)
+        if keep_newer and not supersedes(stay, previous):
+            return None
+        if previous is not None and previous.active:
+            self._shift(conn, previous, -1)
+        if stay.active:
+            self._shift(conn, stay, 1)
+        conn.execute(
+            "INSERT OR REPLACE INTO reservations VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                self.property_id,
+                key,
+                stay.room_type,
+                stay.check_in,
+                stay.check_out,
+                stay.modified,
+                int(stay.active),
+            ),
+        )
+        return [item.dates() for item in (previous, stay) if item is not None and item.active]
+
+    def _shift(self, conn: sqlite3.Connection, stay: Stay, delta: int) -> None:
+        conn.executemany(
+            "INSERT INTO booked VALUES (?, ?, ?, ?) ON CONFLICT (property_id, night, room_type)"
+            " DO UPDATE SET count = count + excluded.count",
+            [
+                (self.property_id, night, stay.room_type, delta)
+                for night in range(stay.check_in, stay.check_out)
+            ],
+        )
+        if delta < 0:
+            conn.execute(
+                "DELETE FROM booked WHERE property_id = ? AND night >= ? AND night < ?"
+                " AND room_type = ? AND count = 0",
+                (self.property_id, stay.check_in, stay.check_out, stay.room_type),
+            )
+
+    def _count(self, **deltas: int) -> None:
+        with self._stats_lock:
+            for name, value in deltas.items():
+                self._stats[name] += value
+
+
+def _chunks(items: List[T]) -> Iterator[List[T]]:
+    for index in range(0, len(items), RECONCILE_CHUNK):
+        yield items[index : index + RECONCILE_CHUNK]
+
+
+_STORES: Dict[str, InventoryStore] = {}
+_STORES_LOCK = threading.Lock()
+
+
+def inventory_store(path: str) -> InventoryStore:
+    with _STORES_LOCK:
+        store = _STORES.get(path)
+        if store is None:
+            store = _STORES[path] = InventoryStore(path)
+        return store
+
+
+def reset() -> None:
+    with _STORES_LOCK:
+        stores = list(_STORES.values())
+        _STORES.clear()
+    for store in stores:
+        store.close()
@@ -0,0 +1,155 @@
+"""Background reservation sync keeping the booking ledgers current off the request path.
+
+Every ``RESERVATION_SYNC_SECONDS`` one leader runs :func:`run_once`, which
+for each property pulls the reservations modified since the ledger's
+cursor (or reconciles it when due). With ``INVENTORY_DB`` the ledgers and
+their cursors are shared, so the leader is whichever worker holds an
+``fcntl`` lock next to the database and the others only read; without it
+every worker syncs its own in-memory ledgers.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from clients.hotelrunner import tenancy
+from services.availability import ledger, service
+from settings import get_settings
+from utils import metrics
+
+try:
+    import fcntl
+except ImportError:  # POSIX only; elsewhere every process leads
+    fcntl = None  # type: ignore[assignment]
+
+LOGGER = logging.getLogger(__name__)
+
+
+def enabled() -> bool:
+    return get_settings().reservation_sync_seconds > 0
+
+
+def lock_path() -> Optional[str]:
+    """Leader lock file, shared by the workers that share ``INVENTORY_DB``."""
+    path = get_settings().inventory_db
+    return f"{path}.sync.lock" if path else None
+
+
+class Leadership:
+    """Non-blocking ``flock`` on :func:`lock_path`; held until the process exits."""
+
+    def __init__(self, path: Optional[str]) -> None:
+        self.path = path
+        self._fd: Optional[int] = None
+        self._pid: Optional[int] = None
+
+    def acquire(self) -> bool:
+        if self.path is None or fcntl is None:
+            return True
+        if self._fd is not None and self._pid == os.getpid():
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd, self._pid = fd, os.getpid()
+        return True
+
+    def release(self) -> None:
+        if self._fd is not None and self._pid == os.getpid():
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+        self._fd = self._pid = None
+
+
+_STATE_LOCK = threading.Lock()
+_STARTED_PID: Optional[int] = None
+_STATE: Dict[str, Any] = {"leader": False, "last_run": None, "last_duration_seconds": None}
+
+
+def run_once() -> Dict[str, Dict[str, Any]]:
+    """One sync pass over every registered property; failures are recorded per property."""
+    started = time.monotonic()
+    results: Dict[str, Dict[str, Any]] = {}
+    for property_id in tenancy.registry().ids():
+        with tenancy.use_property(property_id):
+            try:
+                results[property_id] = service.sync_ledger()
+                metrics.LEDGER_SYNCS.inc(property=property_id, result="ok")
+            except Exception as exc:
+                LOGGER.warning("Reservation sync of %s failed: %s", property_id, exc)
+                ledger.current_ledger().record_sync(None, error=str(exc))
+                metrics.LEDGER_SYNCS.inc(property=property_id, result="error")
+                results[property_id] = {"error": str(exc)}
+    with _STATE_LOCK:
+        _STATE["last_run"] = time.time()
+        _STATE["last_duration_seconds"] = round(time.monotonic() - started, 3)
+    return results
+
+
+def ensure_started() -> None:
+    """Start the sync loop once per process (fork-safe) when ``RESERVATION_SYNC_SECONDS`` is set."""
+    global _STARTED_PID
+
+    if _STARTED_PID == os.getpid() or not enabled():
+        return
+    with _STATE_LOCK:
+        if _STARTED_PID == os.getpid():
+            return
+        _STARTED_PID = os.getpid()
+        _STATE["leader"] = False
+    ledger.BACKGROUND_SYNC.set()
+    leadership = Leadership(lock_path())
+    interval = get_settings().reservation_sync_seconds
+
+    def run() -> None:
+        while True:
+            leading = leadership.acquire()
+            with _STATE_LOCK:
+                _STATE["leader"] = leading
+            if leading:
+                try:
+                    run_once()
+                except Exception as exc:  # e.g. an unreadable property registry; retry next time
+                    LOGGER.warning("Reservation sync pass failed: %s", exc)
+            time.sleep(interval)
+
+    threading.Thread(target=run, name="reservation-sync", daemon=True).start()
+
+
+def status() -> Dict[str, Any]:
+    """This process's view of the sync job, plus the current property's cursor and lag."""
+    with _STATE_LOCK:
+        state = dict(_STATE)
+    last_run = state.pop("last_run")
+    return {
+        "enabled": enabled(),
+        "running": _STARTED_PID == os.getpid(),
+        "interval_seconds": get_settings().reservation_sync_seconds,
+        **state,
+        "last_run_seconds_ago": None if last_run is None else round(time.time() - last_run, 3),
+        **(ledger.current_ledger().sync_status() if ledger.enabled() else {}),
+    }
+
+
+def _lag_samples():
+    for property_id, stats in ledger.ledger_stats().items():
+        lag = stats["sync"]["lag_seconds"]
+        if lag is not None:
+            yield (
+                "booking_ledger_sync_lag_seconds",
+                "gauge",
+                "Seconds since the property's booking ledger last synced with upstream.",
+                {"property": property_id},
+                lag,
+            )
+
+
+metrics.REGISTRY.register_collector(_lag_samples, merge="max")
@@ -4,7 +4,7 @@ import os
 from dataclasses import dataclass
 from decimal import Decimal
 from functools import lru_cache
-from typing import Optional
+from typing import Optional, Tuple
 
 
 @dataclass(frozen=True)
@@ -18,6 +18,37 @@ class Settings:
     property_base_currency: str
     tool_secret: Optional[str]
     log_level: str
+    http_pool_connections: int = 4
+    http_pool_maxsize: int = 16
+    http_retry_attempts: int = 3
+    http_retry_backoff: float = 0.25
+    upstream_max_workers: int = 16
+    availability_deadline_seconds: float = 25.0
+    reservation_page_concurrency: int = 4
+    reservation_max_page_size: int = 100
+    reservation_lookback_days: int = 30
+    reservation_max_lookback_days: int = 90
+    metadata_ttl_seconds: float = 900.0
+    metadata_stale_seconds: float = 21600.0
+    batch_max_items: int = 20
+    response_cache_max_entries: int = 256
+    response_cache_ttl_seconds: float = 30.0
+    metrics_dir: Optional[str] = None
+    metrics_flush_seconds: float = 5.0
+    profile_dir: Optional[str] = None
+    profile_top_n: int = 25
+    profile_keep: int = 50
+    properties_file: Optional[str] = None
+    properties_json: Optional[str] = None
+    default_property_id: Optional[str] = None
+    tenant_state_max: int = 64
+    tenant_max_inflight: int = 8
+    webhook_secret: Optional[str] = None
+    ledger_horizon_days: int = 365
+    ledger_reconcile_seconds: float = 900.0
+    inventory_db: Optional[str] = None
+    reservation_sync_seconds: float = 0.0
+    warmup_timeout_seconds: float = 20.0
 
     def require(self, name: str, value: Optional[str]) -> str:
         if not value:
@@ -25,28 +56,35 @@ class Settings:
         return value
 
     def get_fx_default(self, base_currency: str, display_currency: str) -> Decimal:
+        return self.get_fx_quote(base_currency, display_currency)[0]
+
+    def get_fx_quote(
+        self, base_currency: str, display_currency: str
+    ) -> Tuple[Decimal, Optional[str]]:
+        """Rate plus the timestamp of the rate table it came from (``None`` for defaults)."""
         base = base_currency.upper()
         target = display_currency.upper()
 
         if base == target:
-            return Decimal("1.0")
+            return Decimal("1.0"), None
 
         env_key = f"FX_DEFAULT_{base}_{target}".replace("-", "_")
         override = os.getenv(env_key)
         if override:
-            return Decimal(override)
+            return Decimal(override), None
 
         try:
-            from .fx import get_rate  # local import to avoid cycle
+            from .fx import get_quote  # local import to avoid cycle
 
-            return get_rate(base, target)
+            quote = get_quote(base, target)
+            return quote.rate, quote.timestamp
         except Exception:
             pass
 
         if base == "TRY" and target == "EUR":
-            return Decimal(os.getenv("FX_DEFAULT_TRY_EUR", "0.02857"))
+            return Decimal(os.getenv("FX_DEFAULT_TRY_EUR", "0.02857")), None
 
-        return Decimal("1.0")
+        return Decimal("1.0"), None
 
 
 @lru_cache(maxsize=1)
@@ -62,11 +100,42 @@ def get_settings() -> Settings:
         ),
         hotelrunner_token=os.getenv("HOTELRUNNER_TOKEN"),
         hotelrunner_hr_id=(
-            os.getenv("HR_ID")
-            or os.getenv("HOTELRUNNER_HR_ID")
-            or os.getenv("HOTELRUNNER_ID")
+            os.getenv("HR_ID") or os.getenv("HOTELRUNNER_HR_ID") or os.getenv("HOTELRUNNER_ID")
         ),
         property_base_currency=os.getenv("PROPERTY_BASE_CURRENCY", "TRY"),
         tool_secret=os.getenv("TOOL_SECRET"),
         log_level=os.getenv("LOG_LEVEL", "INFO"),
+        http_pool_connections=int(os.getenv("HTTP_POOL_CONNECTIONS", "4")),
+        http_pool_maxsize=int(
+            os.getenv("HTTP_POOL_MAXSIZE") or max(int(os.getenv("GUNICORN_THREADS", "8")) * 2, 10)
+        ),
+        http_retry_attempts=max(int(os.getenv("HTTP_RETRY_ATTEMPTS", "3")), 1),
+        http_retry_backoff=float(os.getenv("HTTP_RETRY_BACKOFF", "0.25")),
+        upstream_max_workers=max(int(os.getenv("UPSTREAM_MAX_WORKERS", "16")), 1),
+        availability_deadline_seconds=float(os.getenv("AVAILABILITY_DEADLINE_SECONDS", "25")),
+        reservation_page_concurrency=max(int(os.getenv("RESERVATION_PAGE_CONCURRENCY", "4")), 1),
+        reservation_max_page_size=max(int(os.getenv("RESERVATION_MAX_PAGE_SIZE", "100")), 1),
+        reservation_lookback_days=max(int(os.getenv("RESERVATION_LOOKBACK_DAYS", "30")), 0),
+        reservation_max_lookback_days=max(int(os.getenv("RESERVATION_MAX_LOOKBACK_DAYS", "90")), 0),
+        metadata_ttl_seconds=float(os.getenv("METADATA_TTL_SECONDS", "900")),
+        metadata_stale_seconds=float(os.getenv("METADATA_STALE_SECONDS", "21600")),
+        batch_max_items=max(int(os.getenv("BATCH_MAX_ITEMS", "20")), 1),
+        response_cache_max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256")),
+        response_cache_ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "30")),
+        metrics_dir=os.getenv("METRICS_DIR") or None,
+        metrics_flush_seconds=float(os.getenv("METRICS_FLUSH_SECONDS", "5")),
+        profile_dir=os.getenv("PROFILE_DIR") or None,
+        profile_top_n=max(int(os.getenv("PROFILE_TOP_N", "25")), 1),
+        profile_keep=max(int(os.getenv("PROFILE_KEEP", "50")), 1),
+        properties_file=os.getenv("PROPERTIES_FILE") or None,
+        properties_json=os.getenv("PROPERTIES_JSON") or None,
+        default_property_id=os.getenv("DEFAULT_PROPERTY_ID") or None,
+        tenant_state_max=max(int(os.getenv("TENANT_STATE_MAX", "64")), 1),
+        tenant_max_inflight=max(int(os.getenv("TENANT_MAX_INFLIGHT", "8")), 1),
+        webhook_secret=os.getenv("WEBHOOK_SECRET") or None,
+        ledger_horizon_days=max(int(os.getenv("LEDGER_HORIZON_DAYS", "365")), 1),
+        ledger_reconcile_seconds=max(float(os.getenv("LEDGER_RECONCILE_SECONDS", "900")), 1.0),
+        inventory_db=os.getenv("INVENTORY_DB") or None,
+        reservation_sync_seconds=max(float(os.getenv("RESERVATION_SYNC_SECONDS", "0")), 0.0),
+        warmup_timeout_seconds=max(float(os.getenv("WARMUP_TIMEOUT_SECONDS", "20")), 0.0),
     )
@@ -1,39 +1,239 @@
 from __future__ import annotations
 
+import logging
 import os
-from datetime import datetime, timedelta, timezone
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
 from decimal import Decimal
-from typing import Dict, Tuple
+from typing import Dict, Hashable, Optional, Set, Tuple
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-_FX_CACHE: Dict[Tuple[str, str], Tuple[datetime, Decimal]] = {}
+from utils import metrics
+
+from .core import get_settings
+
+LOGGER = logging.getLogger(__name__)
+
+RATE_QUANTUM = Decimal("1E-10")
+DEFAULT_FX_API_URL = "https://api.exchangerate.host/latest"
+
+
+@dataclass(frozen=True)
+class RateTable:
+    """All rates quoted against ``base`` from one upstream response."""
+
+    base: str
+    rates: Dict[str, Decimal]
+    timestamp: str  # ISO-8601 UTC, shared by every pair derived from this table
+    fetched_at: float  # time.monotonic()
+
+    def unit(self, currency: str) -> Optional[Decimal]:
+        """Price of one ``base`` unit in ``currency``."""
+        if currency == self.base:
+            return Decimal(1)
+        return self.rates.get(currency)
+
+
+@dataclass(frozen=True)
+class FxQuote:
+    rate: Decimal
+    timestamp: str
+    source: str  # base currency of the table the rate was derived from
+
+
+_FX_CACHE: Dict[str, RateTable] = {}
+_NEGATIVE_CACHE: Dict[str, float] = {}  # base -> monotonic time the failure expires
+_MISSING_PAIRS: Dict[Tuple[str, str], float] = {}  # (base, target) unquotable until then
+_REFRESHING: Set[str] = set()
+_BASE_LOCKS: Dict[str, threading.Lock] = {}
+_STATE_LOCK = threading.Lock()
+_SESSION: Optional[requests.Session] = None
+_SESSION_PID: Optional[int] = None
 
 
 def get_rate(base: str, target: str) -> Decimal:
+    return get_quote(base, target).rate
+
+
+def get_quote(base: str, target: str) -> FxQuote:
+    """Derive ``base``/``target`` from cached rate tables, fetching one if needed.
+
+    A pair is answered directly from the ``base`` table, as the inverse of
+    the ``target`` table, or as a cross rate through any other cached table
+    (``FX_PIVOT_CURRENCY`` first) that quotes both currencies. Tables are
+    fresh for ``FX_CACHE_MINUTES``; up to ``FX_MAX_STALE_MINUTES`` they are
+    still used while a single background refresh runs. Otherwise one caller
+    fetches the ``base`` table synchronously and concurrent callers wait for
+    it. Failed fetches, and pairs a freshly fetched table still cannot
+    quote, are remembered for ``FX_NEGATIVE_CACHE_SECONDS`` and raise
+    ``RuntimeError`` so callers can fall back to defaults.
+    """
     base = base.upper()
     target = target.upper()
+    if base == target:
+        return FxQuote(Decimal(1), _utc_now(), base)
+    ttl = int(os.getenv("FX_CACHE_MINUTES", "30")) * 60
+    max_stale = max(int(os.getenv("FX_MAX_STALE_MINUTES", "240")) * 60, ttl)
 
-    cache_minutes = int(os.getenv("FX_CACHE_MINUTES", "30"))
-    ttl = timedelta(minutes=cache_minutes)
-    key = (base, target)
-    now = datetime.now(timezone.utc)
+    with _STATE_LOCK:
+        now = time.monotonic()
+        quote = _derive(base, target, now - ttl)
+        if quote is not None:
+            return quote
+        quote = _derive(base, target, now - max_stale)
+        if quote is not None:
+            source = quote.source
+            if source not in _REFRESHING and not _negative_hit(_NEGATIVE_CACHE, source, now):
+                _REFRESHING.add(source)
+                threading.Thread(
+                    target=_refresh_in_background, args=(source,), name="fx-refresh", daemon=True
+                ).start()
+            return quote
+        if _negative_hit(_MISSING_PAIRS, (base, target), now):
+            raise RuntimeError(f"FX API response missing rate for {target}")
+        if _negative_hit(_NEGATIVE_CACHE, base, now):
+            raise RuntimeError(f"FX rates for {base} recently failed")
+        base_lock = _BASE_LOCKS.setdefault(base, threading.Lock())
 
-    cached = _FX_CACHE.get(key)
-    if cached and now < cached[0]:
-        return cached[1]
+    with base_lock:
+        with _STATE_LOCK:
+            quote = _derive(base, target, now)  # filled by the caller we waited on
+            if quote is not None:
+                return quote
+            if _negative_hit(_MISSING_PAIRS, (base, target), time.monotonic()):
+                raise RuntimeError(f"FX API response missing rate for {target}")
+            if _negative_hit(_NEGATIVE_CACHE, base, time.monotonic()):
+                raise RuntimeError(f"FX rates for {base} recently failed")
+        table = _fetch_and_store(base)
+    rate = table.unit(target)
+    if rate is None:
+        with _STATE_LOCK:
+            _MISSING_PAIRS[(base, target)] = time.monotonic() + _negative_ttl()
+        raise RuntimeError(f"FX API response missing rate for {target}")
+    return FxQuote(rate.quantize(RATE_QUANTUM), table.timestamp, base)
 
-    rate = _fetch_live_rate(base, target)
-    _FX_CACHE[key] = (now + ttl, rate)
-    return rate
 
+def reset_cache() -> None:
+    with _STATE_LOCK:
+        _FX_CACHE.clear()
+        _NEGATIVE_CACHE.clear()
+        _MISSING_PAIRS.clear()
 
-def _fetch_live_rate(base: str, target: str) -> Decimal:
-    endpoint = os.getenv("FX_API_URL", "https://api.exchangerate.host/latest")
-    response = requests.get(endpoint, params={"base": base, "symbols": target}, timeout=5)
-    response.raise_for_status()
-    data = response.json()
-    rates = data.get("rates") or {}
-    if target not in rates:
-        raise RuntimeError(f"FX API response missing rate for {target}")
-    return Decimal(str(rates[target]))
+
+def _derive(base: str, target: str, fetched_after: float) -> Optional[FxQuote]:
+    """Rate from the best cached table fetched after ``fetched_after`` (caller holds the lock)."""
+    pivot = os.getenv("FX_PIVOT_CURRENCY", "EUR").upper()
+    preferred = [base, target, pivot]
+    candidates = [_FX_CACHE[code] for code in preferred if code in _FX_CACHE]
+    candidates += [table for code, table in _FX_CACHE.items() if code not in preferred]
+    for table in candidates:
+        if table.fetched_at < fetched_after:
+            continue
+        base_unit = table.unit(base)
+        target_unit = table.unit(target)
+        if base_unit and target_unit:
+            rate = (target_unit / base_unit).quantize(RATE_QUANTUM)
+            return FxQuote(rate, table.timestamp, table.base)
+    return None
+
+
+def _negative_hit(cache: Dict, key: Hashable, now: float) -> bool:
+    expires = cache.get(key)
+    if expires is None:
+        return False
+    if now >= expires:
+        del cache[key]
+        return False
+    return True
+
+
+def _negative_ttl() -> float:
+    return float(os.getenv("FX_NEGATIVE_CACHE_SECONDS", "60"))
+
+
+def _fetch_and_store(base: str) -> RateTable:
+    try:
+        table = _fetch_rate_table(base)
+    except Exception:
+        with _STATE_LOCK:
+            _NEGATIVE_CACHE[base] = time.monotonic() + _negative_ttl()
+        raise
+    with _STATE_LOCK:
+        _FX_CACHE[base] = table
+        _NEGATIVE_CACHE.pop(base, None)
+    return table
+
+
+def _refresh_in_background(base: str) -> None:
+    try:
+        with _STATE_LOCK:
+            base_lock = _BASE_LOCKS.setdefault(base, threading.Lock())
+        with base_lock:
+            _fetch_and_store(base)
+    except Exception as exc:  # the stale table keeps being served
+        LOGGER.warning("FX refresh for %s failed: %s", base, exc)
+    finally:
+        with _STATE_LOCK:
+            _REFRESHING.discard(base)
+
+
+def get_session() -> requests.Session:
+    """Keep-alive session for the FX provider, separate from the HotelRunner pools.
+
+    Recreated after a fork. Connection errors and 429/5xx are retried
+    ``HTTP_RETRY_ATTEMPTS - 1`` times by urllib3.
+    """
+    global _SESSION, _SESSION_PID
+
+    with _STATE_LOCK:
+        if _SESSION is None or _SESSION_PID != os.getpid():
+            settings = get_settings()
+            retries = Retry(
+                total=settings.http_retry_attempts - 1,
+                backoff_factor=settings.http_retry_backoff,
+                status_forcelist=(429, 502, 503, 504),
+                allowed_methods=frozenset({"GET", "HEAD"}),
+                raise_on_status=False,
+            )
+            session = requests.Session()
+            session.mount("https://", HTTPAdapter(pool_maxsize=4, max_retries=retries))
+            session.mount("http://", HTTPAdapter(pool_maxsize=4, max_retries=retries))
+            session.headers.update({"User-Agent": "retell-booking-service/1.0"})
+            _SESSION, _SESSION_PID = session, os.getpid()
+        return _SESSION
+
+
+def http_get(url: str, params: Optional[dict] = None, timeout: float = 5) -> requests.Response:
+    response = get_session().get(url, params=params, timeout=timeout)
+    metrics.record_response(response.status_code)
+    return response
+
+
+def _fetch_rate_table(base: str) -> RateTable:
+    endpoint = os.getenv("FX_API_URL", DEFAULT_FX_API_URL)
+    with metrics.upstream_call("fx"):
+        response = http_get(endpoint, params={"base": base}, timeout=5)
+        response.raise_for_status()
+        data = response.json()
+    rates = {
+        str(code).upper(): Decimal(str(value))
+        for code, value in (data.get("rates") or {}).items()
+        if value not in (None, 0, "0")
+    }
+    if not rates:
+        raise RuntimeError(f"FX API response has no rates for {base}")
+    timestamp = data.get("timestamp")
+    if isinstance(timestamp, (int, float)):
+        iso = datetime.fromtimestamp(timestamp, timezone.utc).isoformat().replace("+00:00", "Z")
+    else:
+        iso = _utc_now()
+    return RateTable(base, rates, iso, time.monotonic())
+
+
+def _utc_now() -> str:
+    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
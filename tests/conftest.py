@@ -0,0 +1,46 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def reset_availability_cache():
+    from services.availability.service import RESPONSE_CACHE
+
+    RESPONSE_CACHE.clear()
+    yield
+    RESPONSE_CACHE.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_stay_observations(monkeypatch):
+    from clients.hotelrunner import reservations
+
+    monkeypatch.setattr(reservations, "_observed_max_stay", {})
+
+
+@pytest.fixture
+def reservation_pages(monkeypatch):
+    """Install ``fetch(start, end)`` as the reservations source of the availability service.
+
+    It is served as a single page to the streaming path and as a list to
+    the batch and flexible-search paths.
+    """
+    from clients.hotelrunner.reservations import ReservationPage
+    from services.availability import service
+
+    def stub(fetch):
+        monkeypatch.setattr(service, "fetch_reservations", fetch)
+        monkeypatch.setattr(
+            service,
+            "iter_reservation_pages",
+            lambda start, end: iter([ReservationPage(1, fetch(start, end))]),
+        )
+
+    return stub
+
+
+@pytest.fixture(autouse=True)
+def no_background_warmup(monkeypatch):
+    """Requests would otherwise start a warmup thread calling the real upstreams."""
+    import warmup
+
+    monkeypatch.setattr(warmup, "ensure_started", lambda: None)
@@ -52,3 +52,227 @@ def test_debug_env_returns_present_flags():
     data = response.get_json()
     assert data["ok"] is True
     assert "environment" in data
+
+
+def _stub_upstream(monkeypatch, reservation_pages):
+    from services.availability import service
+
+    calls = []
+    monkeypatch.setattr(service, "get_rooms", lambda: [{"name": "Standard", "total_count": 2, "price": 100}])
+    reservation_pages(lambda start, end: [])
+
+    def currencies():
+        calls.append("currencies")
+        return [{"code": "EUR"}]
+
+    monkeypatch.setattr(service, "get_currencies", currencies)
+    return calls
+
+
+AVAILABILITY_BODY = {"check_in": "2025-10-01", "check_out": "2025-10-03", "adults": 2, "children": 0}
+
+
+def test_check_availability_omits_raw_by_default(monkeypatch, reservation_pages):
+    calls = _stub_upstream(monkeypatch, reservation_pages)
+    client = app.test_client()
+
+    response = client.post("/retell/public/check_availability", json=AVAILABILITY_BODY)
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert "raw" not in data
+    assert data["availability"]["2025-10-01"] == {"Standard": 2}
+    assert calls == []
+
+
+def test_check_availability_include_and_fields_projection(monkeypatch, reservation_pages):
+    calls = _stub_upstream(monkeypatch, reservation_pages)
+    client = app.test_client()
+
+    response = client.post(
+        "/retell/public/check_availability?include=raw.rooms&fields=nights,prices",
+        json=AVAILABILITY_BODY,
+    )
+
+    assert response.status_code == 200
+    assert response.get_json() == {
+        "nights": 2,
+        "prices": {"2025-10-01": {"Standard": 100.0}, "2025-10-02": {"Standard": 100.0}},
+        "raw": {"rooms": [{"name": "Standard", "total_count": 2, "price": 100}]},
+    }
+    assert calls == []
+
+
+def test_check_availability_rejects_unknown_include():
+    client = app.test_client()
+
+    response = client.post(
+        "/retell/public/check_availability",
+        json={**AVAILABILITY_BODY, "include": ["raw.everything"]},
+    )
+
+    assert response.status_code == 400
+
+
+def test_check_availability_batch_fetches_once_for_union_window(monkeypatch, reservation_pages):
+    from services.availability import service
+
+    windows = []
+    monkeypatch.setattr(service, "get_rooms", lambda: [{"name": "Standard", "total_count": 2}])
+
+    def reservations(start, end):
+        windows.append((start.isoformat(), end.isoformat()))
+        return [{"room_type": "Standard", "check_in": "2025-10-20", "check_out": "2025-10-22"}]
+
+    reservation_pages(reservations)
+    client = app.test_client()
+
+    response = client.post(
+        "/retell/public/check_availability_batch",
+        json={
+            "requests": [
+                AVAILABILITY_BODY,
+                {
+                    "check_in": "2025-10-20",
+                    "check_out": "2025-10-21",
+                    "adults": 1,
+                    "children": 0,
+                    "include": "raw.reservations",
+                    "fields": "availability",
+                },
+                {"check_in": "bad", "check_out": "2025-10-21", "adults": 1, "children": 0},
+            ]
+        },
+    )
+
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+    assert windows == [("2025-09-01", "2025-10-21")]
+    assert results[0]["availability"]["2025-10-01"] == {"Standard": 2}
+    assert results[1] == {
+        "availability": {"2025-10-20": {"Standard": 1}},
+        "raw": {
+            "reservations": [
+                {"room_type": "Standard", "check_in": "2025-10-20", "check_out": "2025-10-22"}
+            ]
+        },
+    }
+    assert results[2]["error"] == "validation_error"
+
+
+def test_check_availability_batch_rejects_oversized_batch():
+    client = app.test_client()
+
+    response = client.post(
+        "/retell/public/check_availability_batch",
+        json={"requests": [AVAILABILITY_BODY] * 50},
+    )
+
+    assert response.status_code == 400
+
+
+def test_check_availability_etag_and_response_cache(monkeypatch, reservation_pages):
+    _stub_upstream(monkeypatch, reservation_pages)
+    fetches = []
+    from services.availability import service
+
+    def reservations(start, end):
+        fetches.append(start)
+        return []
+
+    reservation_pages(reservations)
+    client = app.test_client()
+
+    first = client.post("/retell/public/check_availability", json=AVAILABILITY_BODY)
+    etag = first.headers["ETag"]
+    second = client.post(
+        "/retell/public/check_availability",
+        json=AVAILABILITY_BODY,
+        headers={"If-None-Match": etag},
+    )
+
+    assert first.status_code == 200
+    assert second.status_code == 304
+    assert second.headers["ETag"] == etag
+    assert second.get_data() == b""
+    assert len(fetches) == 1
+
+
+def test_check_availability_rejects_malformed_json():
+    client = app.test_client()
+
+    response = client.post(
+        "/retell/public/check_availability",
+        data=b'{"check_in": "2025-10-01",',
+        headers={"Content-Type": "application/json"},
+    )
+
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "bad_request"
+
+
+def test_check_availability_serializes_model_directly(monkeypatch, reservation_pages):
+    _stub_upstream(monkeypatch, reservation_pages)
+    client = app.test_client()
+
+    response = client.post(
+        "/retell/public/check_availability?fields=nights,currency", json=AVAILABILITY_BODY
+    )
+
+    assert response.status_code == 200
+    assert response.mimetype == "application/json"
+    assert response.get_data() == b'{"currency":"TRY","nights":2}'
+
+
+def test_check_availability_negotiates_columnar_format(monkeypatch, reservation_pages):
+    _stub_upstream(monkeypatch, reservation_pages)
+    client = app.test_client()
+
+    response = client.post(
+        "/retell/public/check_availability",
+        json=AVAILABILITY_BODY,
+        headers={"Accept": "application/vnd.hotelrunner.availability.columnar+json"},
+    )
+
+    assert response.status_code == 200
+    assert "Accept" in response.headers["Vary"]
+    data = response.get_json()
+    assert data["format"] == "columnar"
+    assert data["dates"] == ["2025-10-01", "2025-10-02"]
+    assert data["room_types"] == ["Standard"]
+    assert data["availability"] == [[2, 2]]
+    assert data["prices"] == [[100.0, 100.0]]
+
+
+def test_check_availability_rle_format_from_body(monkeypatch, reservation_pages):
+    _stub_upstream(monkeypatch, reservation_pages)
+    client = app.test_client()
+
+    response = client.post(
+        "/retell/public/check_availability", json={**AVAILABILITY_BODY, "format": "rle"}
+    )
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["availability"] == [[[0, 2, 2]]]
+    assert data["prices"] == [[[0, 2, 100.0]]]
+
+
+def test_check_availability_converts_prices_to_display_currency(monkeypatch, reservation_pages):
+    _stub_upstream(monkeypatch, reservation_pages)
+    monkeypatch.setenv("FX_DEFAULT_TRY_EUR", "0.02857")
+    client = app.test_client()
+
+    response = client.post(
+        "/retell/public/check_availability", json={**AVAILABILITY_BODY, "phone_country": "de"}
+    )
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["price_currency"] == "EUR"
+    assert data["prices"]["2025-10-01"] == {"Standard": 2.86}
+    assert data["fx"] == {"base_currency": "TRY", "rate": 0.02857, "timestamp": None}
+
+    unconverted = client.post("/retell/public/check_availability", json=AVAILABILITY_BODY)
+    assert unconverted.get_json()["prices"]["2025-10-01"] == {"Standard": 100.0}
+    assert "fx" not in unconverted.get_json()
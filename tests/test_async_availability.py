@@ -0,0 +1,224 @@
+import asyncio
+import json
+import os
+
+os.environ.setdefault("HOTELRUNNER_TOKEN", "dummy-token")
+os.environ.setdefault("HR_ID", "dummy-hr")
+
+import pytest  # noqa: E402
+
+from clients.hotelrunner import aio, metadata  # noqa: E402
+from clients.hotelrunner.aio import TransportResponse  # noqa: E402
+from services.availability.aio import get_availability_async  # noqa: E402
+from services.availability.models import AvailabilityRequest  # noqa: E402
+
+
+class FakeTransport:
+    def __init__(self, reservations_total=3, per_page=2, fail=None):
+        self.calls = []
+        self.reservations_total = reservations_total
+        self.fail = fail
+
+    async def get(self, url, params=None, headers=None, timeout=15):
+        self.calls.append(url.rsplit("/", 1)[-1])
+        await asyncio.sleep(0)
+        if self.fail and url.endswith(self.fail):
+            return TransportResponse(500, "boom")
+        if url.endswith("/rooms"):
+            body = {"rooms": [{"name": "Standard", "total_count": 3, "price": 90}]}
+        elif url.endswith("/reservations"):
+            page, per_page = params["page"], params["per_page"]
+            ids = range((page - 1) * per_page, min(page * per_page, self.reservations_total))
+            body = {
+                "pages": -(-self.reservations_total // per_page),
+                "reservations": [
+                    {
+                        "room_type": "Standard",
+                        "check_in": "2025-10-01",
+                        "check_out": "2025-10-02",
+                        "id": i,
+                    }
+                    for i in ids
+                ],
+            }
+        else:
+            body = {"currencies": [{"code": "EUR"}]}
+        return TransportResponse(200, json.dumps(body))
+
+
+@pytest.fixture(autouse=True)
+def fresh_caches():
+    metadata.invalidate()
+    yield
+    metadata.invalidate()
+    aio.set_transport(None)
+
+
+def _payload(**extra):
+    return AvailabilityRequest(
+        check_in="2025-10-01", check_out="2025-10-03", adults=2, children=0, **extra
+    )
+
+
+def test_async_reservations_fetch_all_pages_in_order():
+    transport = FakeTransport(reservations_total=5)
+
+    import datetime as dt
+
+    result = asyncio.run(
+        aio.fetch_reservations(
+            dt.date(2025, 10, 1), dt.date(2025, 10, 3), per_page=2, transport=transport
+        )
+    )
+
+    assert [item["id"] for item in result] == [0, 1, 2, 3, 4]
+    assert transport.calls.count("reservations") == 3
+
+
+def test_get_availability_async_uses_injected_transport_and_caches_rooms():
+    transport = FakeTransport()
+
+    first = asyncio.run(
+        get_availability_async(_payload(include="raw.currencies"), transport=transport)
+    )
+    second = asyncio.run(get_availability_async(_payload(), transport=transport))
+
+    assert first.availability["2025-10-01"] == {"Standard": 0}
+    assert first.availability["2025-10-02"] == {"Standard": 3}
+    assert first.raw == {"currencies": [{"code": "EUR"}]}
+    assert second.raw is None
+    assert transport.calls.count("rooms") == 1
+    assert transport.calls.count("currencies.json") == 1
+
+
+def test_get_availability_async_resolves_fx_quote_off_the_event_loop(monkeypatch):
+    import threading
+    from decimal import Decimal
+
+    from settings.core import Settings
+
+    quoted_on = []
+
+    def quote(self, base, target):
+        quoted_on.append(threading.current_thread())
+        return Decimal("2"), "2025-09-30T12:00:00Z"
+
+    monkeypatch.setattr(Settings, "get_fx_quote", quote)
+
+    result = asyncio.run(
+        get_availability_async(_payload(display_currency="CHF"), transport=FakeTransport())
+    )
+
+    assert quoted_on and quoted_on[0] is not threading.main_thread()
+    assert result.price_currency == "CHF"
+    assert result.prices["2025-10-02"] == {"Standard": 180.0}
+
+
+def test_get_availability_async_maps_errors():
+    with pytest.raises(RuntimeError, match="rooms unavailable"):
+        asyncio.run(get_availability_async(_payload(), transport=FakeTransport(fail="/rooms")))
+
+
+def test_get_availability_async_raises_the_earliest_failure():
+    class FailingTransport(FakeTransport):
+        async def get(self, url, params=None, headers=None, timeout=15):
+            if url.endswith("/rooms"):
+                await asyncio.sleep(0.1)
+            return TransportResponse(500, "boom")
+
+    with pytest.raises(RuntimeError, match="reservations unavailable"):
+        asyncio.run(get_availability_async(_payload(), transport=FailingTransport()))
+
+
+def test_get_availability_async_answers_repeats_from_the_response_cache():
+    transport = FakeTransport()
+
+    first = asyncio.run(get_availability_async(_payload(), transport=transport))
+    calls = len(transport.calls)
+    second = asyncio.run(get_availability_async(_payload(), transport=transport))
+
+    assert second == first
+    assert len(transport.calls) == calls
+
+
+class SlowTransport(FakeTransport):
+    async def get(self, url, params=None, headers=None, timeout=15):
+        if url.endswith("/reservations"):
+            await asyncio.sleep(5)
+        return await super().get(url, params=params, headers=headers, timeout=timeout)
+
+
+def test_get_availability_async_names_what_missed_the_deadline():
+    with pytest.raises(RuntimeError, match="timed out: reservations$"):
+        asyncio.run(get_availability_async(_payload(), transport=SlowTransport(), deadline=0.2))
+
+
+def test_asgi_check_availability_endpoint():
+    from asgi import app
+
+    aio.set_transport(FakeTransport())
+    sent = []
+    body = json.dumps(
+        {"check_in": "2025-10-01", "check_out": "2025-10-02", "adults": 1, "children": 0}
+    )
+
+    async def receive():
+        return {"type": "http.request", "body": body.encode(), "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/retell/public/check_availability",
+        "query_string": b"fields=nights,availability",
+        "headers": [(b"x-request-id", b"abc")],
+    }
+    asyncio.run(app(scope, receive, send))
+
+    assert sent[0]["status"] == 200
+    assert (b"x-request-id", b"abc") in sent[0]["headers"]
+    assert json.loads(sent[1]["body"]) == {
+        "nights": 1,
+        "availability": {"2025-10-01": {"Standard": 0}},
+    }
+
+
+def _asgi_request(headers=(), query=b""):
+    from asgi import app
+
+    sent = []
+    body = json.dumps(
+        {"check_in": "2025-10-01", "check_out": "2025-10-02", "adults": 1, "children": 0}
+    )
+
+    async def receive():
+        return {"type": "http.request", "body": body.encode(), "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/retell/public/check_availability",
+        "query_string": query,
+        "headers": list(headers),
+    }
+    asyncio.run(app(scope, receive, send))
+    return sent[0]["status"], dict(sent[0]["headers"]), sent[1]["body"]
+
+
+def test_asgi_negotiates_format_and_answers_304_for_a_matching_etag():
+    aio.set_transport(FakeTransport())
+    accept = (b"accept", b"application/vnd.hotelrunner.availability.columnar+json")
+
+    status, headers, body = _asgi_request([accept])
+    assert status == 200
+    assert json.loads(body)["room_types"] == ["Standard"]
+    assert headers[b"vary"] == b"Accept"
+
+    status, _, body = _asgi_request([accept, (b"if-none-match", headers[b"etag"])])
+    assert status == 304
+    assert body == b""
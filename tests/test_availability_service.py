@@ -1,10 +1,11 @@
 import datetime as dt
+import time
 from decimal import Decimal
 
 import pytest
 
 from services.availability.models import AvailabilityRequest
-from services.availability.service import _build_availability_matrix, _parse_room_metadata
+from services.availability.service import _build_availability_matrix, parse_room_metadata
 
 
 def test_parse_room_metadata_extracts_totals_prices_and_currency():
@@ -13,7 +14,7 @@ def test_parse_room_metadata_extracts_totals_prices_and_currency():
         {"room_type_name": "Deluxe", "total": 5, "default_price": 220},
     ]
 
-    totals, price_map, currency = _parse_room_metadata(rooms)
+    totals, price_map, currency = parse_room_metadata(rooms)
 
     assert totals == {"Standard": 10, "Deluxe": 5}
     assert price_map == {"Standard": 150.0, "Deluxe": 220.0}
@@ -47,3 +48,242 @@ def test_build_availability_matrix_counts_bookings():
         "2025-10-03": {"Standard": 1, "Deluxe": 1},
     }
     assert matrix["prices"]["2025-10-01"]["Standard"] == 150.0
+
+
+def _availability_payload(**extra):
+    return AvailabilityRequest(
+        check_in="2025-10-01", check_out="2025-10-03", adults=2, children=0, **extra
+    )
+
+
+def test_get_availability_fetches_upstream_concurrently(monkeypatch, reservation_pages):
+    import threading
+    import time
+
+    from services.availability import service
+
+    barrier = threading.Barrier(3, timeout=2)
+
+    def slow(value):
+        def fetch(*_args):
+            barrier.wait()  # only passes if all three fetches are in flight together
+            time.sleep(0.05)
+            return value
+
+        return fetch
+
+    monkeypatch.setattr(service, "get_rooms", slow([{"name": "Standard", "total_count": 1}]))
+    reservation_pages(slow([]))
+    monkeypatch.setattr(service, "get_currencies", slow([{"code": "EUR"}]))
+
+    result = service.get_availability(_availability_payload(include="raw"))
+
+    assert result.availability["2025-10-01"] == {"Standard": 1}
+    assert result.raw["currencies"] == [{"code": "EUR"}]
+
+
+def test_get_availability_maps_upstream_errors(monkeypatch, reservation_pages):
+    from services.availability import service
+
+    def boom(*_args):
+        raise ValueError("connection reset")
+
+    monkeypatch.setattr(service, "get_rooms", lambda: [])
+    reservation_pages(boom)
+    monkeypatch.setattr(service, "get_currencies", lambda: [])
+
+    with pytest.raises(RuntimeError, match="reservations unavailable"):
+        service.get_availability(_availability_payload())
+
+
+def test_long_stay_before_the_window_counts_after_short_stays_were_seen(
+    monkeypatch, reservation_pages
+):
+    from services.availability import service
+
+    bookings = [
+        {"room_type": "Standard", "check_in": "2025-10-19", "check_out": "2025-10-21"},
+        {"room_type": "Standard", "check_in": "2025-09-15", "check_out": "2025-09-25"},
+    ]
+
+    def fetch(start, end):
+        return [
+            item for item in bookings if start.isoformat() <= item["check_in"] < end.isoformat()
+        ]
+
+    monkeypatch.setattr(service, "get_rooms", lambda: [{"name": "Standard", "total_count": 2}])
+    reservation_pages(fetch)
+
+    def request(check_in, check_out):
+        return AvailabilityRequest(check_in=check_in, check_out=check_out, adults=2, children=0)
+
+    service.get_availability(request("2025-10-20", "2025-10-21"))  # sees a 2-night stay only
+    result = service.get_availability(request("2025-09-23", "2025-09-24"))
+
+    assert result.availability["2025-09-23"] == {"Standard": 1}
+
+
+def test_fetch_concurrently_enforces_deadline():
+    import threading
+
+    from services.availability import service
+
+    release = threading.Event()
+    try:
+        with pytest.raises(RuntimeError, match="timed out: slow"):
+            service.fetch_concurrently(
+                {"fast": lambda: 1, "slow": lambda: release.wait(5)},
+                deadline=0.05,
+            )
+    finally:
+        release.set()
+
+
+def test_fetch_concurrently_raises_the_earliest_failure():
+    import time
+
+    from services.availability import service
+
+    def late():
+        time.sleep(0.1)
+        raise RuntimeError("late failure")
+
+    def early():
+        raise RuntimeError("early failure")
+
+    with pytest.raises(RuntimeError, match="early failure"):
+        service.fetch_concurrently({"late": late, "early": early}, deadline=1)
+
+
+def test_fetch_concurrently_hanging_upstream_releases_its_executor_slot(monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+
+    import requests
+
+    from clients.hotelrunner import common
+    from services.availability import service
+
+    class HangingSession:
+        def get(self, url, params=None, timeout=None, headers=None):
+            time.sleep(timeout + 0.05)
+            raise requests.Timeout("read timed out")
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(service, "_UPSTREAM_EXECUTOR", executor)
+    monkeypatch.setattr(common, "get_session", lambda: HangingSession())
+
+    with pytest.raises(RuntimeError, match="timed out: rooms"):
+        service.fetch_concurrently(
+            {"rooms": lambda: common.http_get("https://upstream.test", timeout=30)},
+            deadline=0.1,
+        )
+
+    assert service.fetch_concurrently({"next": lambda: "ok"}, deadline=1) == {"next": "ok"}
+    executor.shutdown(wait=False)
+
+
+def _reference_booked(start, end, reservations):
+    booked = {}
+    for reservation in reservations:
+        res_start = dt.date.fromisoformat(reservation["check_in"])
+        res_end = dt.date.fromisoformat(reservation["check_out"])
+        current = max(res_start, start)
+        while current < min(res_end, end):
+            key = current.isoformat()
+            booked.setdefault(key, {}).setdefault(reservation["room_type"], 0)
+            booked[key][reservation["room_type"]] += 1
+            current += dt.timedelta(days=1)
+    return booked
+
+
+def test_build_availability_matrix_matches_day_by_day_counting():
+    import random
+
+    rng = random.Random(7)
+    start = dt.date(2025, 1, 1)
+    room_types = [f"Type {i}" for i in range(6)]
+    rooms = [
+        {"name": name, "total_count": 40, "price": 100 + i} for i, name in enumerate(room_types)
+    ]
+    reservations = []
+    for _ in range(2000):
+        check_in = start + dt.timedelta(days=rng.randint(-40, 400))
+        check_out = check_in + dt.timedelta(days=rng.randint(1, 30))
+        reservations.append(
+            {
+                "room_type": rng.choice(room_types + ["Unknown"]),
+                "check_in": check_in.isoformat(),
+                "check_out": check_out.isoformat(),
+            }
+        )
+    reservations.append(
+        {"room_type": "Type 0", "check_in": "not-a-date", "check_out": "2025-01-05"}
+    )
+    payload = AvailabilityRequest(
+        check_in="2025-01-01", check_out="2026-01-01", adults=1, children=0
+    )
+
+    matrix = _build_availability_matrix(payload, rooms, reservations)
+
+    booked = _reference_booked(start, dt.date(2026, 1, 1), reservations[:-1])
+    assert len(matrix["availability"]) == 365
+    for day, row in matrix["availability"].items():
+        for room_type in room_types:
+            assert row[room_type] == max(40 - booked.get(day, {}).get(room_type, 0), 0)
+
+
+def test_compact_formats_carry_the_same_matrix():
+    from services.availability.matrix import run_lengths
+    from services.availability.service import build_response
+
+    rooms = [
+        {"name": "Standard", "total_count": 2, "price": 150},
+        {"name": "Deluxe", "total_count": 1, "price": 220},
+    ]
+    reservations = [
+        {"room_type": "Standard", "check_in": "2025-10-01", "check_out": "2025-10-03"},
+        {"room_type": "Deluxe", "check_in": "2025-10-03", "check_out": "2025-10-05"},
+    ]
+    upstream = {"rooms": rooms, "reservations": reservations}
+    base = {"check_in": "2025-10-01", "check_out": "2025-10-05", "adults": 2, "children": 0}
+
+    nested = build_response(AvailabilityRequest(**base), upstream)
+    columnar = build_response(AvailabilityRequest(**base, format="columnar"), upstream)
+    rle = build_response(AvailabilityRequest(**base, format="rle"), upstream)
+
+    assert columnar.dates == list(nested.availability)
+    assert columnar.room_types == ["Standard", "Deluxe"]
+    for r, room_type in enumerate(columnar.room_types):
+        for d, date in enumerate(columnar.dates):
+            assert columnar.availability[r][d] == nested.availability[date][room_type]
+            assert columnar.prices[r][d] == nested.prices[date][room_type]
+    assert rle.availability == [[(0, 2, 1), (2, 2, 2)], [(0, 2, 1), (2, 2, 0)]]
+    assert rle.prices == [[(0, 4, 150.0)], [(0, 4, 220.0)]]
+    assert run_lengths([]) == []
+
+
+def test_get_availability_streams_pages_into_the_grid(monkeypatch):
+    from clients.hotelrunner import reservations as client
+    from clients.hotelrunner.reservations import ReservationPage
+    from services.availability import service
+
+    windows = []
+    bookings = [
+        {"id": 1, "room_type": "Standard", "check_in": "2025-09-28", "check_out": "2025-10-02"},
+        {"id": 2, "room_type": "Standard", "check_in": "2025-10-02", "check_out": "2025-10-03"},
+    ]
+
+    def pages(start, end):
+        windows.append((start, end))
+        return iter([ReservationPage(1, bookings[:1]), ReservationPage(2, bookings[1:])])
+
+    monkeypatch.setattr(service, "get_rooms", lambda: [{"name": "Standard", "total_count": 2}])
+    monkeypatch.setattr(service, "iter_reservation_pages", pages)
+
+    result = service.get_availability(_availability_payload())
+
+    assert windows == [(dt.date(2025, 9, 1), dt.date(2025, 10, 3))]
+    assert result.availability == {"2025-10-01": {"Standard": 1}, "2025-10-02": {"Standard": 1}}
+    assert result.raw is None
+    assert client._observed_max_stay == {"default": 4}
+    assert client.stay_lookback_days() == 30
@@ -0,0 +1,47 @@
+from benchmarks.datasets import DatasetSpec, generate
+from benchmarks.run import Result, compare
+
+
+def test_generator_is_deterministic():
+    spec = DatasetSpec(room_types=7, reservations=200, nights=5)
+    first, second = generate(spec), generate(spec)
+    assert first.rooms == second.rooms
+    assert first.reservations == second.reservations
+    assert len(first.rooms) == 7
+    assert len(first.reservations) == 200
+    assert {r["room_type"] for r in first.reservations} <= {room["name"] for room in first.rooms}
+
+
+def test_generator_seed_changes_data():
+    base = generate(DatasetSpec(room_types=3, reservations=50, nights=2))
+    other = generate(DatasetSpec(room_types=3, reservations=50, nights=2, seed=7))
+    assert base.reservations != other.reservations
+
+
+def test_compare_flags_only_regressions_beyond_threshold():
+    baseline = {"fast": {"median": 0.010}, "slow": {"median": 0.010}, "tiny": {"median": 1e-6}}
+    results = [
+        Result("fast", 0.012, 0.011, 10),
+        Result("slow", 0.020, 0.019, 10),
+        Result("tiny", 3e-6, 2e-6, 10),
+        Result("new", 1.0, 1.0, 1),
+    ]
+    regressions = compare(results, baseline, threshold=0.25)
+    assert len(regressions) == 1
+    assert regressions[0].startswith("slow:")
+
+
+def test_endpoint_cases_do_not_start_background_threads(monkeypatch):
+    import warmup
+    from benchmarks import run as bench
+    from services.availability import sync
+
+    started = []
+    monkeypatch.setattr(warmup, "ensure_started", lambda: started.append("warmup"))
+    monkeypatch.setattr(sync, "ensure_started", lambda: started.append("sync"))
+    monkeypatch.setitem(bench.PRESETS, "none", [])
+
+    results = bench.run("none", pattern="endpoint.compose_offer")
+
+    assert [result.name for result in results] == ["endpoint.compose_offer"]
+    assert started == []
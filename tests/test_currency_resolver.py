@@ -0,0 +1,26 @@
+import random
+from decimal import Decimal
+
+from currency_resolver import apply_fx, convert_minor_batch, from_minor, to_minor
+
+
+def test_convert_minor_batch_matches_apply_fx():
+    rng = random.Random(3)
+    pairs = [("TRY", "EUR"), ("EUR", "JPY"), ("JPY", "USD")]
+    for _ in range(2000):
+        base, display = rng.choice(pairs)
+        rate = Decimal(rng.randint(1, 10**7)) / Decimal(10 ** rng.randint(1, 7))
+        amounts = [rng.randint(-(10**9), 10**9) for _ in range(5)]
+        expected = [apply_fx(amount, base, display, rate)[0] for amount in amounts]
+        assert convert_minor_batch(amounts, base, display, rate) == expected
+
+
+def test_convert_minor_batch_rounds_half_up_away_from_zero():
+    assert convert_minor_batch([5, -5, 4], "EUR", "EUR", Decimal("0.1")) == [1, -1, 0]
+    assert convert_minor_batch([150], "EUR", "JPY", Decimal("1")) == [2]
+
+
+def test_minor_unit_helpers():
+    assert to_minor(2.675, "EUR") == 268
+    assert to_minor(1234.5, "JPY") == 1235
+    assert from_minor(268, "EUR") == 2.68
@@ -0,0 +1,71 @@
+import datetime as dt
+import random
+
+import pytest
+from pydantic import ValidationError
+
+from services.availability.flexible import _window_minimums, rank_stays
+from services.availability.models import FlexibleSearchRequest
+
+
+def _request(**overrides):
+    values = {
+        "window_start": "2025-10-01",
+        "window_end": "2025-10-08",
+        "nights": 3,
+        "adults": 2,
+        "children": 0,
+        "top_k": 3,
+    }
+    values.update(overrides)
+    return FlexibleSearchRequest(**values)
+
+
+def test_window_minimums_matches_naive_minimum():
+    rng = random.Random(3)
+    values = [rng.randint(0, 9) for _ in range(60)]
+
+    for width in (1, 3, 7):
+        expected = [(i, min(values[i : i + width])) for i in range(len(values) - width + 1)]
+        assert list(_window_minimums(values, width)) == expected
+
+
+def test_rank_stays_orders_by_price_and_skips_sold_out_nights():
+    rooms = [
+        {"name": "Standard", "total_count": 1, "price": 100, "sales_currency": "EUR"},
+        {"name": "Suite", "total_count": 1, "price": 300, "max_occupancy": 4},
+        {"name": "Single", "total_count": 5, "price": 50, "max_occupancy": 1},
+    ]
+    reservations = [{"room_type": "Standard", "check_in": "2025-10-03", "check_out": "2025-10-04"}]
+
+    result = rank_stays(_request(), rooms, reservations)
+
+    assert result.price_currency == "EUR"
+    assert [(o.check_in, o.room_type, o.total_price) for o in result.options] == [
+        ("2025-10-04", "Standard", 300.0),
+        ("2025-10-05", "Standard", 300.0),
+        ("2025-10-01", "Suite", 900.0),
+    ]
+
+
+def test_rank_stays_requires_enough_rooms_for_every_night():
+    rooms = [{"name": "Standard", "total_count": 2, "price": 100}]
+    start = dt.date(2025, 10, 1)
+    reservations = [
+        {
+            "room_type": "Standard",
+            "check_in": (start + dt.timedelta(days=day)).isoformat(),
+            "check_out": (start + dt.timedelta(days=day + 1)).isoformat(),
+        }
+        for day in (1, 4)
+    ]
+
+    result = rank_stays(_request(nights=2, rooms=2, top_k=10), rooms, reservations)
+
+    assert [o.check_in for o in result.options] == ["2025-10-03", "2025-10-06"]
+    assert all(o.min_available == 2 for o in result.options)
+
+
+def test_flexible_request_rejects_window_shorter_than_stay():
+    with pytest.raises(ValidationError):
+        _request(window_end="2025-10-02")
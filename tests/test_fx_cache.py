@@ -3,14 +3,15 @@ from decimal import Decimal
 
 import pytest
 
-from settings.fx import _FX_CACHE, get_rate
+from settings.fx import get_rate, reset_cache
 
 
 @pytest.fixture(autouse=True)
 def clear_cache(monkeypatch):
-    _FX_CACHE.clear()
+    reset_cache()
     monkeypatch.setenv("FX_API_URL", "https://api.exchangerate.host/latest")
     monkeypatch.setenv("FX_CACHE_MINUTES", "0")  # immediate refresh for tests
+    monkeypatch.setenv("FX_MAX_STALE_MINUTES", "0")
 
 
 def test_get_rate_caches_after_first_call(monkeypatch):
@@ -26,7 +27,7 @@ def test_get_rate_caches_after_first_call(monkeypatch):
                 return {"rates": {"EUR": 0.02857}}
         return FakeResp()
 
-    monkeypatch.setattr("settings.fx.requests.get", fake_fetch)
+    monkeypatch.setattr("settings.fx.http_get", fake_fetch)
 
     first = get_rate("TRY", "EUR")
     second = get_rate("TRY", "EUR")
@@ -50,7 +51,7 @@ def test_get_rate_reuses_cache(monkeypatch):
                 return {"rates": {"EUR": 0.03}}
         return FakeResp()
 
-    monkeypatch.setattr("settings.fx.requests.get", fake_fetch)
+    monkeypatch.setattr("settings.fx.http_get", fake_fetch)
 
     first = get_rate("TRY", "EUR")
     second = get_rate("TRY", "EUR")
@@ -58,3 +59,143 @@ def test_get_rate_reuses_cache(monkeypatch):
     assert first == Decimal("0.03")
     assert second == Decimal("0.03")
     assert len(responses) == 1
+
+
+class _FakeResp:
+    def __init__(self, rate):
+        self.rate = rate
+
+    def raise_for_status(self):
+        return None
+
+    def json(self):
+        return {"rates": {"EUR": self.rate}}
+
+
+def test_get_rate_single_fetch_for_concurrent_callers(monkeypatch):
+    import threading
+    import time
+
+    monkeypatch.setenv("FX_CACHE_MINUTES", "60")
+    calls = []
+
+    def slow_fetch(url, params, timeout):
+        calls.append(params)
+        time.sleep(0.05)
+        return _FakeResp(0.03)
+
+    monkeypatch.setattr("settings.fx.http_get", slow_fetch)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(get_rate("TRY", "EUR"))) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [Decimal("0.03")] * 10
+    assert len(calls) == 1
+
+
+def test_get_rate_serves_stale_during_single_background_refresh(monkeypatch):
+    import threading
+    import time
+
+    monkeypatch.setenv("FX_MAX_STALE_MINUTES", "60")
+    release = threading.Event()
+    calls = []
+
+    def fetch(url, params, timeout):
+        calls.append(params)
+        if len(calls) > 1:
+            release.wait(2)
+            return _FakeResp(0.04)
+        return _FakeResp(0.03)
+
+    monkeypatch.setattr("settings.fx.http_get", fetch)
+
+    assert get_rate("TRY", "EUR") == Decimal("0.03")
+    stale = [get_rate("TRY", "EUR") for _ in range(5)]
+    release.set()
+
+    assert stale == [Decimal("0.03")] * 5
+    for _ in range(200):
+        if get_rate("TRY", "EUR") == Decimal("0.04"):
+            break
+        time.sleep(0.01)
+    assert len(calls) >= 2
+    assert get_rate("TRY", "EUR") == Decimal("0.04")
+
+
+def test_get_rate_negative_caches_failures(monkeypatch):
+    calls = []
+
+    def failing(url, params, timeout):
+        calls.append(params)
+        raise ConnectionError("fx down")
+
+    monkeypatch.setattr("settings.fx.http_get", failing)
+
+    with pytest.raises(ConnectionError):
+        get_rate("TRY", "EUR")
+    with pytest.raises(RuntimeError, match="recently failed"):
+        get_rate("TRY", "EUR")
+    assert len(calls) == 1
+
+
+def test_get_rate_negative_caches_missing_target(monkeypatch):
+    calls = []
+
+    def eur_only(url, params, timeout):
+        calls.append(params)
+        return _FakeResp(0.03)
+
+    monkeypatch.setattr("settings.fx.http_get", eur_only)
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError, match="missing rate for USD"):
+            get_rate("TRY", "USD")
+    assert len(calls) == 1
+
+
+def test_fx_default_falls_back_after_max_staleness(monkeypatch):
+    from settings import get_settings
+
+    monkeypatch.delenv("FX_DEFAULT_TRY_EUR", raising=False)
+    monkeypatch.setattr("settings.fx.http_get", lambda url, params, timeout: _FakeResp(0.05))
+    assert get_rate("TRY", "EUR") == Decimal("0.05")
+
+    def failing(url, params, timeout):
+        raise ConnectionError("fx down")
+
+    monkeypatch.setattr("settings.fx.http_get", failing)
+
+    assert get_settings().get_fx_default("TRY", "EUR") == Decimal("0.02857")
+
+
+def test_rate_table_answers_direct_inverse_and_cross_pairs_from_one_fetch(monkeypatch):
+    monkeypatch.setenv("FX_CACHE_MINUTES", "60")
+    calls = []
+
+    class TableResp:
+        def raise_for_status(self):
+            return None
+
+        def json(self):
+            return {"timestamp": 1760000000, "rates": {"EUR": 0.025, "USD": 0.03, "GBP": 0.02}}
+
+    def fetch(url, params, timeout):
+        calls.append(params)
+        return TableResp()
+
+    monkeypatch.setattr("settings.fx.http_get", fetch)
+
+    from settings.fx import get_quote
+
+    direct = get_quote("TRY", "EUR")
+    assert direct.rate == Decimal("0.025")
+    assert get_rate("TRY", "USD") == Decimal("0.03")
+    assert get_rate("EUR", "TRY") == Decimal("40")
+    assert get_rate("EUR", "USD") == Decimal("1.2")
+    assert get_quote("GBP", "USD").timestamp == direct.timestamp == "2025-10-09T08:53:20Z"
+    assert calls == [{"base": "TRY"}]
@@ -0,0 +1,132 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+os.environ.setdefault("HOTELRUNNER_TOKEN", "dummy-token")
+os.environ.setdefault("HR_ID", "dummy-hr")
+
+from clients.hotelrunner import common  # noqa: E402
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    statuses: list[int] = []
+
+    def do_GET(self):  # noqa: N802
+        status = self.statuses.pop(0) if self.statuses else 200
+        body = b'{"rooms": []}'
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        return None
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    common.reset_session()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+    common.reset_session()
+
+
+def test_http_get_reuses_pooled_connection(server):
+    for _ in range(3):
+        assert common.http_get(f"{server}/rooms", timeout=5).status_code == 200
+
+    stats = common.pool_stats()
+    assert stats["requests"] == 3
+    assert stats["connections"] == 1
+    assert stats["reused"] == 2
+
+
+def test_http_get_retries_transient_status(server, monkeypatch):
+    monkeypatch.setattr(_Handler, "statuses", [503, 200])
+    monkeypatch.setattr(common.http_get.retry, "sleep", lambda _: None)
+
+    response = common.http_get(f"{server}/rooms", timeout=5)
+
+    assert response.status_code == 200
+    assert common.pool_stats()["requests"] == 2
+
+
+def test_http_get_returns_last_response_when_retries_exhausted(server, monkeypatch):
+    monkeypatch.setattr(_Handler, "statuses", [503, 503, 503])
+    monkeypatch.setattr(common.http_get.retry, "sleep", lambda _: None)
+
+    response = common.http_get(f"{server}/rooms", timeout=5)
+
+    assert response.status_code == 503
+
+
+def test_evicted_session_stays_usable_by_requests_holding_it(server, monkeypatch):
+    from dataclasses import replace
+
+    from clients.hotelrunner import tenancy
+    from settings import get_settings
+
+    monkeypatch.setattr(
+        tenancy, "get_settings", lambda: replace(get_settings(), tenant_state_max=1)
+    )
+    tenancy.set_registry(
+        tenancy.PropertyRegistry(
+            [
+                tenancy.Property("seaside", "hr-1", "token-1"),
+                tenancy.Property("alpine", "hr-2", "token-2"),
+            ]
+        )
+    )
+    try:
+        with tenancy.use_property("seaside"):
+            held = common.get_session()
+            assert held.get(f"{server}/rooms", timeout=5).status_code == 200
+        pools = held.get_adapter(server).poolmanager.pools
+        (key,) = pools.keys()
+        pool = pools[key]
+        with tenancy.use_property("alpine"):
+            assert common.get_session() is not held  # evicts seaside's session
+
+        assert held.get(f"{server}/rooms", timeout=5).status_code == 200
+        assert pools[key] is pool  # closing the session would have discarded its pools
+        assert pool.num_connections == 1
+    finally:
+        tenancy.set_registry(None)
+
+
+def test_async_httpx_transport_retries_like_http_get(server, monkeypatch):
+    import asyncio
+
+    from tenacity import wait_none
+
+    from clients.hotelrunner import aio
+
+    monkeypatch.setattr(_Handler, "statuses", [503, 200])
+    monkeypatch.setitem(common.RETRY_POLICY, "wait", wait_none())
+
+    response = asyncio.run(aio.HttpxTransport().get(f"{server}/rooms", timeout=5))
+
+    assert response.status_code == 200
+    assert response.json() == {"rooms": []}
+
+
+def test_async_httpx_transport_raises_requests_errors(monkeypatch):
+    import asyncio
+
+    import requests
+    from tenacity import wait_none
+
+    from clients.hotelrunner import aio
+
+    monkeypatch.setitem(common.RETRY_POLICY, "wait", wait_none())
+
+    with pytest.raises(requests.ConnectionError):
+        asyncio.run(aio.HttpxTransport().get("http://127.0.0.1:9/rooms", timeout=1))
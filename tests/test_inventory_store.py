@@ -0,0 +1,132 @@
+import datetime as dt
+import os
+from dataclasses import replace
+
+import pytest
+
+os.environ.setdefault("HOTELRUNNER_TOKEN", "dummy-token")
+os.environ.setdefault("HR_ID", "dummy-hr")
+os.environ.setdefault("TOOL_SECRET", "CHANGE_ME")
+
+from services.availability import ledger, store  # noqa: E402
+from services.availability.matrix import AvailabilityGrid  # noqa: E402
+from settings import get_settings  # noqa: E402
+
+START, END = dt.date(2025, 10, 1), dt.date(2025, 10, 31)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    yield str(tmp_path / "inventory.sqlite3")
+    store.reset()
+
+
+def _reservation(key, check_in, check_out, updated_at, room_type="Standard"):
+    return {
+        "id": key,
+        "room_type": room_type,
+        "check_in": check_in,
+        "check_out": check_out,
+        "updated_at": updated_at,
+    }
+
+
+def _booked(book, room_type="Standard"):
+    grid = AvailabilityGrid(dt.date(2025, 10, 1), dt.date(2025, 10, 5))
+    book.fill(grid)
+    return grid.booked(room_type)
+
+
+def test_stored_ledger_matches_the_in_memory_ledger(db_path, monkeypatch):
+    monkeypatch.setattr(store, "RECONCILE_CHUNK", 2)
+    memory = ledger.BookingLedger()
+    stored = store.inventory_store(db_path).ledger("default")
+    seed = [
+        _reservation(1, "2025-10-01", "2025-10-03", "2025-09-01"),
+        _reservation(2, "2025-10-02", "2025-10-04", "2025-09-01", room_type="Deluxe"),
+        _reservation(3, "2025-10-03", "2025-10-05", "2025-09-01"),
+    ]
+    events = [
+        (_reservation(1, "2025-10-02", "2025-10-04", "2025-09-02"), False),
+        (_reservation(1, "2025-10-01", "2025-10-03", "2025-09-01"), False),  # older
+        (_reservation(2, "2025-10-02", "2025-10-04", "2025-09-03", room_type="Deluxe"), True),
+        (_reservation(4, "2025-10-04", "2025-10-05", "2025-09-02"), False),
+    ]
+
+    for book in (memory, stored):
+        assert book.reconcile(START, END, seed, (START, END), "2025-09-02") == []
+        changed = book.apply_stays([ledger.stay_from(*event) for event in events])
+        assert changed[1] is None
+        drift = book.reconcile(START, END, seed[:2], (START, END), "2025-09-02")
+        assert sorted(drift) == [("2025-10-03", "2025-10-05")]
+
+    assert _booked(stored) == _booked(memory) == [0, 1, 1, 1]
+    assert _booked(stored, "Deluxe") == _booked(memory, "Deluxe") == [0, 0, 0, 0]
+    assert stored.covers(START, END, max_age=60)
+    assert stored.stats()["reservations"] == memory.stats()["reservations"] == 2
+
+
+def test_workers_share_the_store_and_survive_restarts(db_path):
+    first = store.InventoryStore(db_path).ledger("default")
+    first.reconcile(
+        START,
+        END,
+        [_reservation(1, "2025-10-01", "2025-10-02", "2025-09-01")],
+        (START, END),
+        "2025-09-02",
+    )
+    other_worker = store.InventoryStore(db_path).ledger("default")
+    other_worker.apply(_reservation(2, "2025-10-01", "2025-10-03", "2025-09-05"))
+
+    restarted = store.InventoryStore(db_path)
+    assert restarted.connection().execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert _booked(restarted.ledger("default")) == [2, 1, 0, 0]
+    assert restarted.ledger("default").age() < 60
+    assert restarted.ledger("alpine").age() is None
+
+
+def test_current_ledger_uses_the_store_when_configured(db_path, monkeypatch):
+    configured = replace(get_settings(), webhook_secret="secret", inventory_db=db_path)
+    monkeypatch.setattr(ledger, "get_settings", lambda: configured)
+    ledger.reset()
+    try:
+        book = ledger.current_ledger()
+        assert isinstance(book, store.StoredLedger)
+        assert book.stats()["store"] == db_path
+    finally:
+        ledger.reset()
+
+
+def test_busy_store_raises_a_retryable_error(db_path):
+    book = store.InventoryStore(db_path, timeout=0.05).ledger("default")
+    holder = store.InventoryStore(db_path)
+    with holder.write():
+        with pytest.raises(ledger.LedgerBusyError):
+            book.apply(_reservation(1, "2025-10-01", "2025-10-02", "2025-09-01"))
+    book.apply(_reservation(1, "2025-10-01", "2025-10-02", "2025-09-01"))
+    assert _booked(book) == [1, 0, 0, 0]
+
+
+def test_webhook_answers_503_while_the_store_is_busy(monkeypatch):
+    import hashlib
+    import hmac
+    import json
+
+    import app as app_module
+
+    def busy(*_args):
+        raise ledger.LedgerBusyError("inventory store is busy")
+
+    monkeypatch.setattr(app_module, "settings", replace(get_settings(), webhook_secret="secret"))
+    monkeypatch.setattr(app_module, "apply_reservation_events", busy)
+    body = json.dumps({"events": []}).encode()
+    signature = hmac.new(b"secret", body, hashlib.sha256).hexdigest()
+
+    response = app_module.app.test_client().post(
+        "/retell/webhooks/hotelrunner/reservations",
+        data=body,
+        headers={"X-HotelRunner-Signature": signature},
+    )
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
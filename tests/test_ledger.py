@@ -0,0 +1,249 @@
+import datetime as dt
+import hashlib
+import hmac
+import json
+import os
+import time
+from dataclasses import replace
+
+import pytest
+
+os.environ.setdefault("HOTELRUNNER_TOKEN", "dummy-token")
+os.environ.setdefault("HR_ID", "dummy-hr")
+os.environ.setdefault("TOOL_SECRET", "CHANGE_ME")
+
+from services.availability import ledger  # noqa: E402
+from services.availability.matrix import AvailabilityGrid  # noqa: E402
+from settings import get_settings  # noqa: E402
+
+SECRET = "hook-secret"
+
+
+@pytest.fixture
+def webhooks(monkeypatch):
+    enabled = replace(get_settings(), webhook_secret=SECRET)
+    monkeypatch.setattr(ledger, "get_settings", lambda: enabled)
+    ledger.reset()
+    yield enabled
+    ledger.reset()
+
+
+def _reservation(key, check_in, check_out, updated_at, room_type="Standard", **extra):
+    return {
+        "id": key,
+        "room_type": room_type,
+        "check_in": check_in,
+        "check_out": check_out,
+        "updated_at": updated_at,
+        **extra,
+    }
+
+
+def _booked(book, start="2025-10-01", end="2025-10-05"):
+    grid = AvailabilityGrid(dt.date.fromisoformat(start), dt.date.fromisoformat(end))
+    book.fill(grid)
+    return dict(zip(grid.dates(), grid.booked("Standard")))
+
+
+def test_ledger_ignores_replayed_and_older_events():
+    book = ledger.BookingLedger()
+    created = _reservation(1, "2025-10-01", "2025-10-03", "2025-09-01T10:00:00Z")
+    moved = _reservation(1, "2025-10-02", "2025-10-04", "2025-09-01T12:00:00+01:00")
+
+    assert book.apply(created) == [("2025-10-01", "2025-10-03")]
+    assert book.apply(created) is None
+    assert book.apply(moved) == [("2025-10-01", "2025-10-03"), ("2025-10-02", "2025-10-04")]
+    assert book.apply(created) is None  # older than the version already applied
+    assert book.apply({**moved, "room_type": "Deluxe"}) is None  # same modification time
+    assert _booked(book)["2025-10-01"] == 0
+    assert _booked(book)["2025-10-03"] == 1
+
+    cancel = ledger.parse_event(
+        {"event": "reservation.cancelled", "reservation": {**moved, "updated_at": "2025-09-02"}}
+    )
+    assert book.apply(*cancel) == [("2025-10-02", "2025-10-04")]
+    assert _booked(book)["2025-10-03"] == 0
+    assert book.stats()["reservations"] == 0
+
+    with pytest.raises(ledger.LedgerEventError):
+        ledger.parse_event({"event": "reservation.archived", "reservation": created})
+
+
+def test_reconcile_corrects_drift_but_keeps_newer_events():
+    book = ledger.BookingLedger()
+    start, end = dt.date(2025, 10, 1), dt.date(2025, 10, 31)
+    kept = _reservation(1, "2025-10-01", "2025-10-02", "2025-09-01T00:00:00Z")
+    missed_cancel = _reservation(2, "2025-10-02", "2025-10-03", "2025-09-01T00:00:00Z")
+
+    assert book.reconcile(start, end, [kept, missed_cancel], (start, end), "2025-09-02") == []
+    assert book.covers(start, dt.date(2025, 10, 5), max_age=60)
+    assert not book.covers(start, dt.date(2025, 11, 2), max_age=60)
+
+    during_fetch = _reservation(3, "2025-10-03", "2025-10-04", "2025-09-03T00:00:00+00:00")
+    book.apply(during_fetch)
+    missed_create = _reservation(4, "2025-10-04", "2025-10-05", "2025-09-02T00:00:00Z")
+
+    drift = book.reconcile(
+        start, end, [kept, missed_create], (start, end), "2025-09-03T00:00:00+00:00"
+    )
+
+    assert sorted(drift) == [("2025-10-02", "2025-10-03"), ("2025-10-04", "2025-10-05")]
+    assert _booked(book) == {
+        "2025-10-01": 1,
+        "2025-10-02": 0,
+        "2025-10-03": 1,
+        "2025-10-04": 1,
+    }
+
+
+def test_webhook_checks_the_signature_and_invalidates_cached_dates(webhooks, monkeypatch):
+    import app as app_module
+    from services.availability.service import RESPONSE_CACHE
+
+    monkeypatch.setattr(app_module, "settings", webhooks)
+    client = app_module.app.test_client()
+    body = json.dumps(
+        {
+            "events": [
+                {
+                    "event": "reservation.created",
+                    "reservation": _reservation(7, "2025-10-01", "2025-10-03", "2025-09-01"),
+                },
+                {"event": "reservation.created", "reservation": {"id": 8}},
+            ]
+        }
+    ).encode()
+    signature = hmac.new(SECRET.encode(), body, hashlib.sha256).hexdigest()
+    invalidated = []
+    monkeypatch.setattr(
+        RESPONSE_CACHE, "invalidate_dates", lambda *args: invalidated.append(args) or 0
+    )
+    path = "/retell/webhooks/hotelrunner/reservations"
+
+    forged = client.post(path, data=body, headers={"X-HotelRunner-Signature": "sha256=00"})
+    accepted = client.post(
+        path, data=body, headers={"X-HotelRunner-Signature": f"sha256={signature}"}
+    )
+    replayed = client.post(path, data=body, headers={"X-HotelRunner-Signature": signature})
+
+    assert forged.status_code == 401
+    assert accepted.get_json()["applied"] == 1
+    assert accepted.get_json()["invalid"] == 1
+    assert replayed.get_json()["duplicates"] == 1
+    assert invalidated == [("2025-10-01", "2025-10-03", "default")]
+    assert ledger.current_ledger().stats()["reservations"] == 1
+
+
+def test_get_availability_answers_covered_dates_from_the_ledger(
+    webhooks, monkeypatch, reservation_pages
+):
+    from services.availability import service
+    from services.availability.models import AvailabilityRequest
+
+    monkeypatch.setattr(service, "get_rooms", lambda: [{"name": "Standard", "total_count": 3}])
+    reservation_pages(
+        lambda start, end: [_reservation(1, "2025-10-01", "2025-10-03", "2025-09-01")]
+    )
+    service.reconcile_ledger(today=dt.date(2025, 10, 1))
+    service.apply_reservation_events(
+        [
+            {
+                "event": "reservation.created",
+                "reservation": _reservation(2, "2025-10-02", "2025-10-03", "2025-09-02"),
+            }
+        ]
+    )
+
+    def no_fetch(*_args):
+        raise AssertionError("covered dates must not fetch reservations")
+
+    reservation_pages(no_fetch)
+    result = service.get_availability(
+        AvailabilityRequest(check_in="2025-10-01", check_out="2025-10-04", adults=2, children=0)
+    )
+
+    assert result.availability == {
+        "2025-10-01": {"Standard": 2},
+        "2025-10-02": {"Standard": 1},
+        "2025-10-03": {"Standard": 3},
+    }
+
+
+def test_webhook_events_are_routed_by_hr_id(webhooks, monkeypatch):
+    import app as app_module
+    from clients.hotelrunner import tenancy
+
+    monkeypatch.setattr(app_module, "settings", webhooks)
+    tenancy.set_registry(
+        tenancy.PropertyRegistry(
+            [
+                tenancy.Property("seaside", "hr-1", "token-1"),
+                tenancy.Property("alpine", "hr-2", "token-2"),
+            ]
+        )
+    )
+    client = app_module.app.test_client()
+    path = "/retell/webhooks/hotelrunner/reservations"
+
+    def post(events, **headers):
+        body = json.dumps({"events": events}).encode()
+        signature = hmac.new(SECRET.encode(), body, hashlib.sha256).hexdigest()
+        return client.post(
+            path, data=body, headers={"X-HotelRunner-Signature": signature, **headers}
+        )
+
+    stay = _reservation(1, "2025-10-01", "2025-10-03", "2025-09-01")
+    try:
+        routed = post(
+            [
+                {"event": "reservation.created", "hr_id": "hr-2", "reservation": stay},
+                {"event": "reservation.created", "reservation": {**stay, "hr_id": "hr-9"}},
+            ]
+        )
+        unrouted = post([{"event": "reservation.created", "reservation": {**stay, "id": 2}}])
+        selected = post(
+            [{"event": "reservation.created", "reservation": {**stay, "id": 3}}],
+            **{"X-Property-Id": "seaside"},
+        )
+
+        assert routed.get_json()["applied"] == 1
+        assert routed.get_json()["invalid"] == 1  # unknown hr_id
+        assert unrouted.status_code == 400
+        assert selected.get_json()["applied"] == 1
+        with tenancy.use_property("alpine"):
+            assert ledger.current_ledger().stats()["reservations"] == 1
+        with tenancy.use_property("seaside"):
+            assert _booked(ledger.current_ledger())["2025-10-01"] == 1
+    finally:
+        tenancy.set_registry(None)
+
+
+def test_failed_reconciliation_is_not_retried_on_every_request(webhooks, monkeypatch):
+    from services.availability import service
+    from services.availability.models import AvailabilityRequest
+
+    attempts = []
+
+    def failing_reconcile():
+        attempts.append(1)
+        ledger.current_ledger().reconciling = False  # as after an upstream error
+
+    monkeypatch.setattr(service, "_reconcile_in_background", failing_reconcile)
+    payload = AvailabilityRequest(
+        check_in="2025-10-01", check_out="2025-10-02", adults=2, children=0
+    )
+
+    assert service.ledger_grid(payload) is None
+    deadline = time.monotonic() + 2
+    while not attempts and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert service.ledger_grid(payload) is None
+    time.sleep(0.05)
+    assert attempts == [1]
+
+    ledger.current_ledger().reconcile_started -= service._settings.ledger_reconcile_seconds
+    service.ledger_grid(payload)
+    deadline = time.monotonic() + 2
+    while len(attempts) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert attempts == [1, 1]
@@ -0,0 +1,53 @@
+import datetime as dt
+import os
+
+os.environ.setdefault("HOTELRUNNER_TOKEN", "test-token")
+os.environ.setdefault("HR_ID", "test-hr")
+
+import pytest  # noqa: E402
+import requests  # noqa: E402
+
+from clients.hotelrunner import reservations  # noqa: E402
+from loadtest.driver import percentile  # noqa: E402
+from loadtest.fake_hotelrunner import APPS_PREFIX, FakeConfig, FakeHotelRunner  # noqa: E402
+
+
+@pytest.fixture
+def fake():
+    config = FakeConfig(room_types=4, reservations=500, nights=30, start=dt.date(2025, 10, 1))
+    with FakeHotelRunner(config) as server:
+        yield server
+
+
+def test_fake_paginates_like_hotelrunner(fake, monkeypatch):
+    monkeypatch.setattr(reservations, "APPS_BASE_URL", f"{fake.base_url}{APPS_PREFIX}")
+    start, end = dt.date(2025, 10, 5), dt.date(2025, 10, 20)
+    fetched = reservations.fetch_reservations(start, end, per_page=20)
+
+    expected = [
+        r for r in fake.dataset.reservations if start.isoformat() <= r["check_in"] <= end.isoformat()
+    ]
+    assert sorted(r["id"] for r in fetched) == sorted(r["id"] for r in expected)
+    assert fake.requests[f"{APPS_PREFIX}/reservations"] == -(-len(expected) // 20)
+
+
+def test_fake_answers_conditional_requests(fake):
+    url = f"{fake.base_url}{APPS_PREFIX}/rooms"
+    first = requests.get(url, timeout=5)
+    assert first.status_code == 200
+    assert len(first.json()["rooms"]) == 4
+    second = requests.get(url, headers={"If-None-Match": first.headers["ETag"]}, timeout=5)
+    assert second.status_code == 304
+
+
+def test_fake_injects_errors(fake):
+    fake.config.error_rate = 1.0
+    response = requests.get(f"{fake.base_url}{APPS_PREFIX}/rooms", timeout=5)
+    assert response.status_code == 503
+
+
+def test_percentile_nearest_rank():
+    samples = list(range(1, 101))
+    assert percentile(samples, 50) == 50
+    assert percentile(samples, 99) == 99
+    assert percentile([], 95) == 0.0
@@ -0,0 +1,79 @@
+import os
+import threading
+import time
+
+os.environ.setdefault("HOTELRUNNER_TOKEN", "dummy-token")
+os.environ.setdefault("HR_ID", "dummy-hr")
+
+from clients.hotelrunner.common import ConditionalResult  # noqa: E402
+from clients.hotelrunner.metadata import MetadataCache  # noqa: E402
+
+
+class FakeLoader:
+    def __init__(self, not_modified=False, delay=0.0):
+        self.calls = []
+        self.not_modified = not_modified
+        self.delay = delay
+        self.done = threading.Event()
+
+    def __call__(self, validators):
+        self.calls.append(validators)
+        time.sleep(self.delay)
+        self.done.set()
+        if validators and self.not_modified:
+            return ConditionalResult(None, validators, True)
+        return ConditionalResult([{"version": len(self.calls)}], {"etag": '"v1"'}, False)
+
+
+def test_metadata_cache_serves_fresh_value_without_reloading():
+    loader = FakeLoader()
+    cache = MetadataCache("rooms", loader, ttl=60, stale_ttl=60)
+
+    assert cache.get() == [{"version": 1}]
+    assert cache.get() == [{"version": 1}]
+
+    assert len(loader.calls) == 1
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_metadata_cache_serves_stale_while_revalidating_with_etag():
+    loader = FakeLoader(not_modified=True)
+    cache = MetadataCache("rooms", loader, ttl=0, stale_ttl=60)
+    first = cache.get()
+    loader.done.clear()
+
+    assert cache.get() is first  # stale value returned immediately
+    assert loader.done.wait(2)
+    for _ in range(100):
+        if not cache.stats()["refreshing"]:
+            break
+        time.sleep(0.01)
+
+    assert loader.calls == [None, {"etag": '"v1"'}]
+    assert cache.stats()["not_modified"] == 1
+    assert cache.stats()["stale_hits"] == 1
+
+
+def test_metadata_cache_single_load_for_concurrent_misses():
+    loader = FakeLoader(delay=0.05)
+    cache = MetadataCache("rooms", loader, ttl=60, stale_ttl=0)
+
+    threads = [threading.Thread(target=cache.get) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(loader.calls) == 1
+
+
+def test_metadata_cache_invalidate_forces_unconditional_reload():
+    loader = FakeLoader(not_modified=True)
+    cache = MetadataCache("rooms", loader, ttl=60, stale_ttl=60)
+    cache.get()
+
+    cache.invalidate()
+
+    assert cache.get() == [{"version": 2}]
+    assert loader.calls == [None, None]
@@ -0,0 +1,194 @@
+import json
+import os
+
+os.environ.setdefault("HOTELRUNNER_TOKEN", "dummy-token")
+os.environ.setdefault("HR_ID", "dummy-hr")
+os.environ.setdefault("TOOL_SECRET", "CHANGE_ME")
+
+import time  # noqa: E402
+
+import pytest  # noqa: E402
+
+from app import app  # noqa: E402
+from utils import metrics  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def fresh_registry(monkeypatch):
+    monkeypatch.setattr(metrics, "metrics_dir", lambda: None)
+    metrics.REGISTRY.clear()
+    yield
+    metrics.REGISTRY.clear()
+
+
+def test_metrics_merge_across_worker_snapshots(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "metrics_dir", lambda: tmp_path)
+    metrics.UPSTREAM_SECONDS.observe(0.02, upstream="rooms", outcome="ok")
+    metrics.UPSTREAM_ERRORS.inc(upstream="rooms", error="RuntimeError")
+
+    other_worker = metrics.REGISTRY.snapshot()
+    other_pid = os.getppid()  # any live process
+    (tmp_path / f"metrics-{other_pid}-other.json").write_text(
+        json.dumps({"pid": other_pid, "metrics": other_worker})
+    )
+
+    text = metrics.exposition()
+
+    assert 'upstream_errors_total{upstream="rooms",error="RuntimeError"} 2' in text
+    assert 'upstream_request_duration_seconds_count{upstream="rooms",outcome="ok"} 2' in text
+    assert (
+        'upstream_request_duration_seconds_bucket{upstream="rooms",outcome="ok",le="0.025"} 2'
+        in text
+    )
+
+
+def test_metrics_keep_exited_workers_counters_but_not_their_gauges(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "metrics_dir", lambda: tmp_path)
+
+    def snapshot(lag, errors):
+        return {
+            "booking_ledger_sync_lag_seconds": {
+                "kind": "gauge",
+                "help": "Sync lag.",
+                "labels": ["property"],
+                "merge": "max",
+                "samples": [[["default"], lag]],
+            },
+            "upstream_errors_total": {
+                "kind": "counter",
+                "help": "Upstream errors.",
+                "labels": ["upstream", "error"],
+                "samples": [[["rooms", "Timeout"], errors]],
+            },
+        }
+
+    live, dead = os.getppid(), 2**22 + 1  # above the default pid_max
+    (tmp_path / f"metrics-{live}-a.json").write_text(
+        json.dumps({"pid": live, "metrics": snapshot(4, 1)})
+    )
+    (tmp_path / f"metrics-{live}-b.json").write_text(
+        json.dumps({"pid": live, "metrics": snapshot(3, 2)})
+    )
+    stale = tmp_path / f"metrics-{dead}-c.json"
+    stale.write_text(json.dumps({"pid": dead, "metrics": snapshot(900, 5)}))
+
+    for _ in range(2):  # the second scrape reads the dead worker from the retired file
+        text = metrics.exposition()
+
+        assert 'booking_ledger_sync_lag_seconds{property="default"} 4' in text
+        assert 'upstream_errors_total{upstream="rooms",error="Timeout"} 8' in text
+        assert not stale.exists()
+
+
+def test_gauges_merge_as_their_collector_declares():
+    def worker(inflight, lag):
+        return {
+            "property_inflight_requests": {
+                "kind": "gauge",
+                "help": "In flight.",
+                "labels": ["property"],
+                "merge": "sum",
+                "samples": [[["default"], inflight]],
+            },
+            "booking_ledger_sync_lag_seconds": {
+                "kind": "gauge",
+                "help": "Sync lag.",
+                "labels": ["property"],
+                "merge": "max",
+                "samples": [[["default"], lag]],
+            },
+        }
+
+    merged = metrics.merge([worker(2, 4), worker(3, 9)])
+
+    assert merged["property_inflight_requests"]["values"] == {("default",): 5}
+    assert merged["booking_ledger_sync_lag_seconds"]["values"] == {("default",): 9}
+
+
+def test_registry_records_the_collector_merge_mode():
+    registry = metrics.Registry()
+    registry.register_collector(lambda: [("queue_depth", "gauge", "Depth.", {}, 1)], merge="sum")
+
+    assert registry.snapshot()["queue_depth"]["merge"] == "sum"
+    with pytest.raises(ValueError):
+        registry.register_collector(lambda: [], merge="avg")
+
+
+def test_label_values_are_escaped():
+    assert metrics._labels({"error": 'bad "x"\nline\\'}) == '{error="bad \\"x\\"\\nline\\\\"}'
+
+
+def test_upstream_call_counts_errors_and_attempts():
+    with pytest.raises(RuntimeError):
+        with metrics.upstream_call("reservations"):
+            metrics.record_response(503)
+            metrics.record_response(503)
+            raise RuntimeError("HotelRunner reservations error 503")
+
+    text = metrics.exposition()
+    assert 'upstream_http_responses_total{upstream="reservations",status="503"} 2' in text
+    assert 'upstream_errors_total{upstream="reservations",error="RuntimeError"} 1' in text
+
+
+def test_server_timing_splits_upstream_and_compute(monkeypatch, reservation_pages):
+    from services.availability import service
+
+    def slow_rooms():
+        time.sleep(0.02)
+        return [{"name": "Standard", "total_count": 2, "price": 100}]
+
+    monkeypatch.setattr(service, "get_rooms", slow_rooms)
+    reservation_pages(lambda start, end: [])
+    client = app.test_client()
+
+    response = client.post(
+        "/retell/public/check_availability",
+        json={"check_in": "2025-10-01", "check_out": "2025-10-03", "adults": 2, "children": 0},
+    )
+
+    assert response.status_code == 200
+    phases = dict(
+        part.strip().split(";dur=") for part in response.headers["Server-Timing"].split(",")
+    )
+    assert set(phases) == {"upstream", "compute", "total"}
+    assert float(phases["upstream"]) >= 20
+    assert float(phases["total"]) >= float(phases["upstream"])
+
+
+def test_metrics_endpoint_reports_requests_and_cache_ratio():
+    client = app.test_client()
+    client.get("/healthz")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    body = response.get_data(as_text=True)
+    assert (
+        'http_request_duration_seconds_count{endpoint="/healthz",method="GET",status="200"} 1'
+        in body
+    )
+    assert 'cache_lookups_total{cache="rooms",result="hit"}' in body
+    assert "# TYPE cache_lookups_total counter" in body
+
+
+def test_cache_hit_ratio_is_derived_from_summed_lookups():
+    def worker(hits, stale, misses):
+        samples = [
+            [["rooms", "hit"], hits],
+            [["rooms", "stale_hit"], stale],
+            [["rooms", "miss"], misses],
+        ]
+        return {
+            "cache_lookups_total": {
+                "kind": "counter",
+                "help": "Cache lookups by cache and result.",
+                "labels": ["cache", "result"],
+                "samples": samples,
+            }
+        }
+
+    merged = metrics.merge([worker(6, 1, 1), worker(1, 0, 1)])
+
+    assert merged["cache_hit_ratio"]["values"] == {("rooms",): 0.8}
+    assert 'cache_hit_ratio{cache="rooms"} 0.8' in metrics.render(merged)
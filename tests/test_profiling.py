@@ -0,0 +1,73 @@
+import os
+
+os.environ.setdefault("HOTELRUNNER_TOKEN", "dummy-token")
+os.environ.setdefault("HR_ID", "dummy-hr")
+os.environ.setdefault("TOOL_SECRET", "CHANGE_ME")
+
+import tracemalloc  # noqa: E402
+
+import pytest  # noqa: E402
+
+from app import app  # noqa: E402
+from utils import profiling  # noqa: E402
+
+SECRET = {"X-Tool-Secret": "CHANGE_ME"}
+BODY = {"check_in": "2025-10-01", "check_out": "2025-10-03", "adults": 2, "children": 0}
+
+
+@pytest.fixture(autouse=True)
+def profile_dir(tmp_path, monkeypatch, reservation_pages):
+    monkeypatch.setattr(profiling, "profile_dir", lambda: tmp_path)
+    from services.availability import service
+
+    monkeypatch.setattr(
+        service, "get_rooms", lambda: [{"name": "Standard", "total_count": 2, "price": 100}]
+    )
+    reservation_pages(lambda start, end: [])
+    return tmp_path
+
+
+def test_profiling_is_off_without_flag():
+    client = app.test_client()
+    response = client.post("/retell/public/check_availability", json=BODY, headers=SECRET)
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response.headers
+    assert not tracemalloc.is_tracing()
+
+
+def test_profiling_requires_tool_secret():
+    client = app.test_client()
+    response = client.post("/retell/public/check_availability?profile=1", json=BODY)
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response.headers
+
+
+def test_profiled_request_stores_report(profile_dir):
+    client = app.test_client()
+    response = client.post(
+        "/retell/public/check_availability",
+        json=BODY,
+        headers={**SECRET, "X-Profile": "1"},
+    )
+
+    assert response.status_code == 200
+    profile_id = response.headers["X-Profile-Id"]
+    assert not tracemalloc.is_tracing()
+    assert (profile_dir / f"{profile_id}.prof").exists()
+
+    report = client.get(response.headers["X-Profile-Url"], headers=SECRET).get_json()
+    assert report["path"] == "/retell/public/check_availability"
+    assert report["status"] == 200
+    assert report["cpu"] and "cumtime_ms" in report["cpu"][0]
+    assert any("get_availability" in row["function"] for row in report["cpu"])
+    assert isinstance(report["allocations"], list)
+
+    listing = client.get("/retell/tool/profiles", headers=SECRET).get_json()
+    assert [item["id"] for item in listing["profiles"]] == [profile_id]
+    assert "cpu" not in listing["profiles"][0]
+
+
+def test_profile_lookup_rejects_bad_ids():
+    client = app.test_client()
+    assert client.get("/retell/tool/profiles/..%2Fsecrets", headers=SECRET).status_code == 404
+    assert client.get("/retell/tool/profiles/" + "0" * 32).status_code == 401
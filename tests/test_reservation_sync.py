@@ -0,0 +1,115 @@
+import datetime as dt
+import os
+from dataclasses import replace
+
+import pytest
+
+os.environ.setdefault("HOTELRUNNER_TOKEN", "dummy-token")
+os.environ.setdefault("HR_ID", "dummy-hr")
+os.environ.setdefault("TOOL_SECRET", "CHANGE_ME")
+
+from services.availability import ledger, service, store, sync  # noqa: E402
+from settings import get_settings  # noqa: E402
+
+TODAY = dt.date(2025, 10, 1)
+
+
+@pytest.fixture
+def syncing(monkeypatch, tmp_path):
+    configured = replace(
+        get_settings(),
+        reservation_sync_seconds=30.0,
+        inventory_db=str(tmp_path / "inventory.sqlite3"),
+    )
+    for module in (ledger, sync):
+        monkeypatch.setattr(module, "get_settings", lambda: configured)
+    ledger.reset()
+    yield configured
+    ledger.reset()
+    store.reset()
+
+
+def _reservation(key, check_in, check_out, updated_at, **extra):
+    return {
+        "id": key,
+        "room_type": "Standard",
+        "check_in": check_in,
+        "check_out": check_out,
+        "updated_at": updated_at,
+        **extra,
+    }
+
+
+def test_sync_reconciles_first_then_pulls_changes_since_the_cursor(syncing, monkeypatch):
+    full = [_reservation(1, "2025-10-01", "2025-10-03", "2025-09-01T00:00:00Z")]
+    monkeypatch.setattr(service, "fetch_reservations", lambda start, end: full)
+    monkeypatch.setattr(ledger, "utc_now", lambda: "2025-09-10T12:00:00+00:00")
+    pulls = []
+
+    def fetch_modified(start, end, since):
+        pulls.append((start, end, since))
+        return [
+            _reservation(1, "2025-10-01", "2025-10-03", "2025-09-10T12:30:00Z", state="cancelled"),
+            _reservation(2, "2025-10-02", "2025-10-04", "2025-09-10T12:20:00Z"),
+        ]
+
+    monkeypatch.setattr(service, "fetch_modified_reservations", fetch_modified)
+
+    assert service.sync_ledger(TODAY) == {"drift": 0}
+    assert ledger.current_ledger().cursor() == "2025-09-10T12:00:00+00:00"
+    assert service.sync_ledger(TODAY) == {"applied": 2, "duplicates": 0}
+    assert service.sync_ledger(TODAY) == {"applied": 0, "duplicates": 2}
+
+    start = TODAY - dt.timedelta(days=syncing.reservation_max_lookback_days)
+    end = TODAY + dt.timedelta(days=syncing.ledger_horizon_days)
+    assert pulls == [
+        (start, end, "2025-09-10T11:55:00+00:00"),
+        (start, end, "2025-09-10T12:25:00+00:00"),
+    ]
+    status = ledger.current_ledger().sync_status()
+    assert status["cursor"] == "2025-09-10T12:30:00+00:00"
+    assert status["lag_seconds"] < 60
+    assert ledger.current_ledger().stats()["reservations"] == 1
+
+
+def test_failed_sync_is_recorded_and_keeps_the_cursor(syncing, monkeypatch):
+    def unavailable(start, end):
+        raise RuntimeError("upstream down")
+
+    monkeypatch.setattr(service, "fetch_reservations", unavailable)
+
+    results = sync.run_once()
+
+    assert "unavailable" in results["default"]["error"]
+    status = ledger.current_ledger().sync_status()
+    assert status["cursor"] is None
+    assert "unavailable" in status["last_error"]
+
+
+def test_only_one_worker_leads(syncing):
+    first = sync.Leadership(sync.lock_path())
+    second = sync.Leadership(sync.lock_path())
+    try:
+        assert first.acquire()
+        assert first.acquire()
+        assert not second.acquire()
+        first.release()
+        assert second.acquire()
+    finally:
+        first.release()
+        second.release()
+
+
+def test_whoami_reports_sync_status(syncing, monkeypatch):
+    import app as app_module
+
+    monkeypatch.setattr(sync, "ensure_started", lambda: None)  # no real sync thread
+    ledger.current_ledger().record_sync("2025-09-10T12:00:00+00:00")
+
+    body = app_module.app.test_client().get("/retell/tool/whoami").get_json()
+
+    assert body["reservation_sync"]["enabled"] is True
+    assert body["reservation_sync"]["cursor"] == "2025-09-10T12:00:00+00:00"
+    assert body["reservation_sync"]["lag_seconds"] < 60
+    assert body["booking_ledger"]["sync"]["last_error"] is None
+    assert not ledger.BACKGROUND_SYNC.is_set()
@@ -0,0 +1,161 @@
+import datetime as dt
+import os
+import threading
+import time
+
+import pytest
+
+os.environ.setdefault("HOTELRUNNER_TOKEN", "dummy-token")
+os.environ.setdefault("HR_ID", "dummy-hr")
+
+from clients.hotelrunner import reservations  # noqa: E402
+
+START = dt.date(2025, 10, 1)
+END = dt.date(2025, 11, 10)
+
+
+class FakeResponse:
+    status_code = 200
+    text = ""
+
+    def __init__(self, payload):
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+
+def _fake_upstream(total, include_page_count=True):
+    calls = []
+    lock = threading.Lock()
+
+    def fake_get(url, params, timeout):
+        with lock:
+            calls.append(params["page"])
+        page, per_page = params["page"], params["per_page"]
+        ids = range((page - 1) * per_page, min(page * per_page, total))
+        payload = {"reservations": [{"id": i} for i in ids]}
+        if include_page_count:
+            payload["pages"] = max(-(-total // per_page), 1)
+        return FakeResponse(payload)
+
+    return fake_get, calls
+
+
+@pytest.fixture(autouse=True)
+def reset_density(monkeypatch):
+    monkeypatch.setattr(reservations, "_observed_density", {})
+
+
+def test_fetch_reservations_reads_page_count_and_keeps_order(monkeypatch):
+    fake_get, calls = _fake_upstream(total=250)
+    monkeypatch.setattr(reservations, "http_get", fake_get)
+
+    result = reservations.fetch_reservations(START, END, per_page=100)
+
+    assert [item["id"] for item in result] == list(range(250))
+    assert sorted(calls) == [1, 2, 3]
+
+
+def test_iter_reservation_pages_fetches_remaining_pages_in_parallel(monkeypatch):
+    fake_get, _ = _fake_upstream(total=400)
+    barrier = threading.Barrier(3, timeout=2)
+
+    def gated_get(url, params, timeout):
+        if params["page"] > 1:
+            barrier.wait()  # pages 2-4 must be in flight at the same time
+        return fake_get(url, params, timeout)
+
+    monkeypatch.setattr(reservations, "http_get", gated_get)
+
+    pages = list(reservations.iter_reservation_pages(START, END, per_page=100, concurrency=3))
+
+    assert pages[0].number == 1
+    assert sorted(page.number for page in pages) == [1, 2, 3, 4]
+
+
+def test_busy_property_does_not_hold_other_properties_pages(monkeypatch):
+    from clients.hotelrunner import tenancy
+
+    tenancy.set_registry(
+        tenancy.PropertyRegistry(
+            [
+                tenancy.Property("seaside", "hr-1", "token-1"),
+                tenancy.Property("alpine", "hr-2", "token-2"),
+            ]
+        )
+    )
+    fake_get, _ = _fake_upstream(total=500)
+    release = threading.Event()
+
+    def gated_get(url, params, timeout):
+        if tenancy.current_property().id == "seaside" and params["page"] > 1:
+            release.wait(5)
+        return fake_get(url, params, timeout)
+
+    monkeypatch.setattr(reservations, "http_get", gated_get)
+    try:
+        with tenancy.use_property("seaside"):
+            busy = reservations.iter_reservation_pages(START, END, per_page=100)
+            assert next(busy).number == 1  # pages 2-5 now occupy seaside's pool
+        started = time.monotonic()
+        with tenancy.use_property("alpine"):
+            assert len(reservations.fetch_reservations(START, END, per_page=100)) == 500
+        assert time.monotonic() - started < 2
+    finally:
+        release.set()
+        busy.close()
+        tenancy.set_registry(None)
+
+
+def test_fetch_reservations_falls_back_to_serial_without_page_count(monkeypatch):
+    fake_get, calls = _fake_upstream(total=150, include_page_count=False)
+    monkeypatch.setattr(reservations, "http_get", fake_get)
+
+    result = reservations.fetch_reservations(START, END, per_page=100)
+
+    assert len(result) == 150
+    assert calls == [1, 2]
+
+
+def test_choose_page_size_adapts_to_observed_density(monkeypatch):
+    assert reservations.choose_page_size(START, END) == 100
+
+    monkeypatch.setattr(reservations, "_observed_density", {"default": 0.5})
+    assert reservations.choose_page_size(START, START + dt.timedelta(days=40)) == 25
+    assert (
+        reservations.choose_page_size(START, START + dt.timedelta(days=2))
+        == reservations.MIN_PAGE_SIZE
+    )
+
+
+def test_overlap_window_follows_longest_observed_stay(monkeypatch):
+    assert reservations.overlap_window(START, END) == (START - dt.timedelta(days=30), END)
+
+    reservations.record_max_stay(5)
+    reservations.record_max_stay(3)
+    assert reservations.overlap_window(START, END) == (START - dt.timedelta(days=30), END)
+
+    reservations.record_max_stay(46)
+    assert reservations.stay_lookback_days() == 45
+
+    reservations.record_max_stay(400)
+    assert reservations.stay_lookback_days() == 90
+
+
+def test_fetch_modified_reservations_sends_the_cursor_and_skips_density(monkeypatch):
+    seen = []
+
+    def fake_get(url, params, timeout):
+        seen.append(params)
+        return FakeResponse({"reservations": [{"id": 1}], "pages": 1})
+
+    monkeypatch.setattr(reservations, "http_get", fake_get)
+
+    result = reservations.fetch_modified_reservations(START, END, "2025-09-01T10:00:00+00:00")
+
+    assert result == [{"id": 1}]
+    assert seen[0]["modified"] == "true"
+    assert seen[0]["undelivered"] == "false"
+    assert seen[0][reservations.MODIFIED_SINCE_PARAM] == "2025-09-01T10:00:00+00:00"
+    assert reservations._observed_density == {}
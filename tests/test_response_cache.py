@@ -0,0 +1,118 @@
+import datetime as dt
+import time
+
+from services.availability.cache import ResponseCache, cache_key
+from services.availability.models import AvailabilityRequest, AvailabilityResponse
+
+
+def _payload(check_in="2025-10-01", check_out="2025-10-03", **extra):
+    return AvailabilityRequest(
+        check_in=check_in, check_out=check_out, adults=2, children=0, **extra
+    )
+
+
+def _response():
+    return AvailabilityResponse(
+        total=None,
+        currency="TRY",
+        nights=2,
+        price_currency="TRY",
+        availability={},
+        prices={},
+        summary_unavailable=True,
+    )
+
+
+def _store(cache, payload):
+    key = cache_key(payload, "TRY")
+    cache.put(key, payload, _response())
+    return key
+
+
+def test_cache_key_normalises_currency_and_ignores_projection():
+    assert cache_key(_payload(currency="try"), "TRY") == cache_key(_payload(fields="nights"), "TRY")
+    assert cache_key(_payload(include="raw"), "TRY") != cache_key(_payload(), "TRY")
+
+
+def test_response_cache_lru_and_ttl():
+    cache = ResponseCache(max_entries=2, ttl=0.05)
+    first = _store(cache, _payload())
+    _store(cache, _payload(check_out="2025-10-04"))
+    assert cache.get(first) is not None
+    _store(cache, _payload(check_out="2025-10-05"))
+
+    assert cache.get(cache_key(_payload(check_out="2025-10-04"), "TRY")) is None  # evicted LRU
+    assert cache.get(first) is not None
+    time.sleep(0.06)
+    assert cache.get(first) is None
+
+
+def test_observe_reservations_evicts_only_overlapping_changes():
+    cache = ResponseCache(max_entries=10, ttl=60)
+    booking = {
+        "id": 1,
+        "room_type": "Standard",
+        "check_in": "2025-10-02",
+        "check_out": "2025-10-03",
+    }
+    window = (dt.date(2025, 9, 1), dt.date(2025, 11, 1))
+    cache.observe_reservations(*window, [booking])
+    early = _store(cache, _payload())
+    late = _store(cache, _payload("2025-10-20", "2025-10-22"))
+
+    assert cache.observe_reservations(*window, [booking]) == 0  # unchanged data
+    assert cache.observe_reservations(*window, [{**booking, "state": "canceled"}]) == 1
+    assert cache.get(early) is None
+    assert cache.get(late) is not None
+
+    early = _store(cache, _payload())
+    assert cache.observe_reservations(*window, []) == 1  # booking disappeared
+    assert cache.get(early) is None
+
+
+def test_reservation_tracker_matches_observe_across_pages():
+    cache = ResponseCache(max_entries=10, ttl=60)
+    window = (dt.date(2025, 9, 1), dt.date(2025, 11, 1))
+    first = {"id": 1, "room_type": "Standard", "check_in": "2025-10-02", "check_out": "2025-10-03"}
+    second = {**first, "id": 2, "check_in": "2025-10-20", "check_out": "2025-10-22"}
+    cache.observe_reservations(*window, [first, second])
+    early = _store(cache, _payload())
+    late = _store(cache, _payload("2025-10-20", "2025-10-22"))
+
+    tracker = cache.track_reservations(*window)
+    tracker.add([first])
+    tracker.add([])
+    assert tracker.finish() == 1  # second never arrived on any page
+    assert cache.get(early) is not None
+    assert cache.get(late) is None
+
+
+def test_put_skips_responses_fetched_before_an_invalidation():
+    cache = ResponseCache(max_entries=10, ttl=60)
+    payload = _payload()
+    key = cache_key(payload, "TRY")
+
+    generation = cache.generation(key[0])
+    cache.invalidate_dates("2025-10-02", "2025-10-03", key[0])  # lands during the fetch
+    cache.put(key, payload, _response(), generation)
+    assert cache.get(key) is None
+    assert cache.stats()["stale_puts"] == 1
+
+    cache.put(key, payload, _response(), cache.generation(key[0]))
+    assert cache.get(key) is not None
+
+
+def test_own_reservation_changes_do_not_block_the_put():
+    cache = ResponseCache(max_entries=10, ttl=60)
+    payload = _payload()
+    key = cache_key(payload, "TRY")
+
+    generation = cache.generation(key[0])
+    tracker = cache.track_reservations(dt.date(2025, 9, 20), dt.date(2025, 10, 3))
+    tracker.add(
+        [{"id": 1, "room_type": "Std", "check_in": "2025-10-01", "check_out": "2025-10-02"}]
+    )
+    tracker.finish()
+    cache.put(key, payload, _response(), generation + tracker.invalidations)
+
+    assert cache.get(key) is not None
@@ -0,0 +1,149 @@
+import json
+import os
+import time
+from dataclasses import replace
+
+import pytest
+
+os.environ.setdefault("HOTELRUNNER_TOKEN", "dummy-token")
+os.environ.setdefault("HR_ID", "dummy-hr")
+os.environ.setdefault("TOOL_SECRET", "CHANGE_ME")
+
+from clients.hotelrunner import tenancy  # noqa: E402
+from settings import get_settings  # noqa: E402
+from utils import metrics  # noqa: E402
+
+
+class FakeResponse:
+    status_code = 200
+    text = ""
+    headers = {}
+
+    def __init__(self, payload):
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+
+@pytest.fixture
+def two_hotels():
+    tenancy.set_registry(
+        tenancy.PropertyRegistry(
+            [
+                tenancy.Property("seaside", "hr-1", "token-1", "TRY"),
+                tenancy.Property("alpine", "hr-2", "token-2", "EUR"),
+            ]
+        )
+    )
+    yield
+    tenancy.set_registry(None)
+
+
+def test_registry_loads_json_with_token_env(monkeypatch):
+    monkeypatch.setenv("ALPINE_TOKEN", "secret")
+    document = {
+        "default": "alpine",
+        "properties": [
+            {"id": "seaside", "hr_id": "1", "token": "t1"},
+            {"id": "alpine", "hr_id": "2", "token_env": "ALPINE_TOKEN", "base_currency": "eur"},
+        ],
+    }
+    settings = replace(get_settings(), properties_json=json.dumps(document))
+
+    registry = tenancy.PropertyRegistry.from_settings(settings)
+
+    assert registry.ids() == ["seaside", "alpine"]
+    assert registry.default == tenancy.Property("alpine", "2", "secret", "EUR")
+    with pytest.raises(tenancy.UnknownPropertyError):
+        registry.get("missing")
+
+
+def test_registry_falls_back_to_single_env_property():
+    registry = tenancy.PropertyRegistry.from_settings(get_settings())
+
+    assert registry.ids() == [tenancy.DEFAULT_PROPERTY_ID]
+    assert registry.default.hr_id == get_settings().hotelrunner_hr_id
+
+
+def test_tenant_map_evicts_least_recently_used_property(two_hotels):
+    evicted = []
+    values = tenancy.TenantMap(lambda prop: {"id": prop.id}, max_size=1, on_evict=evicted.append)
+
+    with tenancy.use_property("seaside"):
+        first = values.get()
+        assert values.get() is first
+    with tenancy.use_property("alpine"):
+        values.get()
+
+    assert evicted == [{"id": "seaside"}]
+    assert [property_id for property_id, _ in values.items()] == ["alpine"]
+
+
+def test_acquire_slot_rejects_beyond_the_property_limit(two_hotels, monkeypatch):
+    monkeypatch.setitem(tenancy._ADMISSIONS, "seaside", tenancy._Admission(1))
+    prop = tenancy.registry().get("seaside")
+
+    release = tenancy.acquire_slot(prop, timeout=0)
+    with pytest.raises(tenancy.PropertyBusyError):
+        tenancy.acquire_slot(prop, timeout=0)
+    with tenancy.admit(tenancy.registry().get("alpine"), timeout=0):
+        pass  # another property is unaffected
+    release()
+    tenancy.acquire_slot(prop, timeout=0)()
+
+    samples = metrics.REGISTRY.snapshot()["property_rejected_requests_total"]["samples"]
+    assert dict((tuple(labels), value) for labels, value in samples)[("seaside",)] >= 1
+
+
+def test_check_availability_serves_each_property_with_its_own_credentials(
+    two_hotels, monkeypatch, reservation_pages
+):
+    from app import app
+    from clients.hotelrunner import rooms
+
+    seen = []
+
+    def fake_get(url, params=None, timeout=None, headers=None):
+        seen.append((params["hr_id"], params["token"]))
+        count = 3 if params["hr_id"] == "hr-1" else 5
+        return FakeResponse({"rooms": [{"name": "Standard", "total_count": count, "price": 100}]})
+
+    monkeypatch.setattr(rooms, "http_get", fake_get)
+    reservation_pages(lambda start, end: [])
+    client = app.test_client()
+    body = {"check_in": "2025-10-01", "check_out": "2025-10-02", "adults": 2, "children": 0}
+
+    seaside = client.post(
+        "/retell/public/check_availability", json=body, headers={"X-Property-Id": "seaside"}
+    )
+    alpine = client.post("/retell/public/check_availability?property=alpine", json=body)
+    unknown = client.post(
+        "/retell/public/check_availability", json=body, headers={"X-Property-Id": "nope"}
+    )
+
+    assert seaside.get_json()["availability"] == {"2025-10-01": {"Standard": 3}}
+    assert alpine.get_json()["availability"] == {"2025-10-01": {"Standard": 5}}
+    assert alpine.get_json()["currency"] == "EUR"
+    assert seen == [("hr-1", "token-1"), ("hr-2", "token-2")]
+    assert unknown.status_code == 404
+    assert unknown.get_json()["error"] == "unknown_property"
+
+
+def test_busy_property_gets_429(two_hotels, monkeypatch):
+    from app import app
+
+    admission = tenancy._Admission(1)
+    monkeypatch.setitem(tenancy._ADMISSIONS, "seaside", admission)
+    admission.semaphore.acquire()
+    started = time.monotonic()
+    try:
+        response = app.test_client().post(
+            "/retell/public/check_availability", json={}, headers={"X-Property-Id": "seaside"}
+        )
+    finally:
+        admission.semaphore.release()
+
+    assert response.status_code == 429
+    assert time.monotonic() - started < 0.5  # turned away without waiting for a slot
+    assert response.headers["Retry-After"] == "1"
@@ -0,0 +1,115 @@
+import os
+import threading
+import time
+from dataclasses import replace
+
+import pytest
+import requests
+
+os.environ.setdefault("HOTELRUNNER_TOKEN", "dummy-token")
+os.environ.setdefault("HR_ID", "dummy-hr")
+os.environ.setdefault("TOOL_SECRET", "CHANGE_ME")
+
+import warmup  # noqa: E402
+from clients.hotelrunner import metadata  # noqa: E402
+from settings import Settings, get_settings  # noqa: E402
+
+start_in_background = warmup.ensure_started  # conftest disables it for other tests
+
+
+@pytest.fixture(autouse=True)
+def fresh_warmup():
+    warmup.reset()
+    yield
+    warmup.reset()
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    calls = []
+    monkeypatch.setattr(requests.Session, "head", lambda self, url, timeout: calls.append(url))
+    monkeypatch.setattr(metadata, "get_rooms", lambda: calls.append("rooms"))
+    monkeypatch.setattr(metadata, "get_currencies", lambda: calls.append("currencies"))
+    monkeypatch.setattr(
+        Settings, "get_fx_quote", lambda self, base, target: calls.append(("fx", base, target))
+    )
+    return calls
+
+
+def test_readyz_starts_the_warmup_outside_gunicorn_and_reports_progress(upstream, monkeypatch):
+    from app import app
+
+    rooms_fetched = threading.Event()
+    monkeypatch.setattr(metadata, "get_rooms", lambda: rooms_fetched.wait(5))
+    monkeypatch.setattr(warmup, "ensure_started", start_in_background)
+    client = app.test_client()
+    before = client.get("/readyz")
+    rooms_fetched.set()
+    deadline = time.monotonic() + 5
+    after = client.get("/readyz")
+    while after.status_code != 200 and time.monotonic() < deadline:
+        time.sleep(0.01)
+        after = client.get("/readyz")
+
+    assert before.status_code == 503
+    assert before.get_json()["started"] is True
+    assert "fx" in before.get_json()["pending"]
+    assert after.status_code == 200
+    assert after.get_json()["pending"] == [] and after.get_json()["running"] is None
+    phases = after.get_json()["phases"]
+    assert [phase["name"] for phase in phases] == list(warmup.PHASES)
+    assert all(phase["ok"] and phase["in"] == "worker" for phase in phases)
+    assert "currencies" in upstream
+    assert ("fx", get_settings().property_base_currency, "EUR") in upstream
+    assert any(str(call).startswith("https://") for call in upstream)
+
+
+def test_upstream_calls_get_the_remaining_budget_and_no_retries(monkeypatch):
+    attempts = []
+
+    def unreachable(self, url, params=None, timeout=None, headers=None):
+        attempts.append(timeout)
+        raise requests.ConnectionError("connection refused")
+
+    monkeypatch.setattr(requests.Session, "get", unreachable)
+    budget = replace(get_settings(), warmup_timeout_seconds=3)
+    monkeypatch.setattr(warmup, "get_settings", lambda: budget)
+    metadata.invalidate()
+    try:
+        report = warmup.run(["rooms"])
+    finally:
+        metadata.invalidate()
+
+    assert report["phases"][0]["ok"] is False
+    assert len(attempts) == 1
+    assert 0 < attempts[0] <= 3
+
+
+def test_failed_phase_is_reported_without_blocking_readiness(upstream, monkeypatch):
+    def down():
+        raise RuntimeError("HotelRunner rooms unavailable")
+
+    monkeypatch.setattr(metadata, "get_rooms", down)
+
+    report = warmup.run()
+
+    rooms = next(phase for phase in report["phases"] if phase["name"] == "rooms")
+    assert report["ready"] is True
+    assert rooms == {**rooms, "ok": False, "error": "RuntimeError"}
+
+
+def test_workers_reuse_preloaded_phases_and_respect_the_budget(upstream, monkeypatch):
+    warmup.run(warmup.MASTER_PHASES)
+    assert not warmup.ready()
+    for result in warmup._RESULTS.values():
+        result["pid"] = os.getpid() + 1  # as if run by the preloading master
+    no_budget = replace(get_settings(), warmup_timeout_seconds=0)
+    monkeypatch.setattr(warmup, "get_settings", lambda: no_budget)
+
+    report = warmup.run()
+
+    phases = {phase["name"]: phase for phase in report["phases"]}
+    assert phases["imports"]["in"] == phases["settings"]["in"] == "preload"
+    assert phases["rooms"]["error"] == "WarmupBudgetExceeded"
+    assert upstream == []
+    assert report["ready"] is True
@@ -16,7 +16,9 @@ DEFAULT_KEYS = [
     "HOTELRUNNER_CURRENCY_URL",
     "PROPERTY_BASE_CURRENCY",
     "TOOL_SECRET",
+    "WEBHOOK_SECRET",
     "FX_CACHE_MINUTES",
+    "FX_MAX_STALE_MINUTES",
     "FX_API_URL",
     "FX_DEFAULT_TRY_EUR",
 ]
@@ -43,6 +45,7 @@ def inspect_settings() -> Dict[str, object]:
         "hotelrunner_apps_base_url": settings.hotelrunner_apps_base_url,
         "property_base_currency": settings.property_base_currency,
         "tool_secret_loaded": bool(settings.tool_secret),
+        "webhook_secret_loaded": bool(settings.webhook_secret),
         "token_loaded": bool(settings.hotelrunner_token),
         "hr_id_loaded": bool(settings.hotelrunner_hr_id),
     }
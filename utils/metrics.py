@@ -0,0 +1,591 @@
+"""In-process counters/histograms, multi-worker aggregation and ``Server-Timing``.
+
+Every process keeps its own samples and periodically writes them to
+``<METRICS_DIR>/metrics-<pid>-<token>.json``; ``/metrics`` merges the
+snapshot files of the live processes in that directory, so any gunicorn
+worker can answer a scrape for the whole server. Counters and histograms
+of exited processes are folded into ``retired-metrics.json`` so totals
+never go backwards. Without a directory (single process, tests) only the
+local samples are rendered.
+"""
+from __future__ import annotations
+
+import contextvars
+import fcntl
+import json
+import logging
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from settings import get_settings
+
+LOGGER = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PAGE_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+RETIRED_FILE = "retired-metrics.json"  # counters and histograms of exited processes
+
+Sample = Tuple[str, str, str, Dict[str, str], float]  # name, kind, help, labels, value
+LabelKey = Tuple[str, ...]
+GAUGE_MERGES = ("sum", "max")
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[LabelKey, Any] = {}
+        REGISTRY.register(self)
+
+    def _key(self, labels: Dict[str, Any]) -> LabelKey:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            samples = [[list(key), value] for key, value in self._values.items()]
+        return {
+            "kind": self.kind,
+            "help": self.help,
+            "labels": list(self.labelnames),
+            "samples": samples,
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames)
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        data = super().snapshot()
+        data["buckets"] = list(self.buckets)
+        return data
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Tuple[Callable[[], Iterable[Sample]], str]] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> None:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"metric {metric.name} already registered")
+            self._metrics[metric.name] = metric
+
+    def register_collector(
+        self, collector: Callable[[], Iterable[Sample]], merge: str = "max"
+    ) -> None:
+        """Add a callable producing point-in-time samples (e.g. cache stats) per snapshot.
+
+        ``merge`` says how the gauges it yields combine across workers:
+        ``"sum"`` for per-worker shares of a total, ``"max"`` for state the
+        workers share or duplicate.
+        """
+        if merge not in GAUGE_MERGES:
+            raise ValueError(f"unknown gauge merge {merge!r}")
+        with self._lock:
+            self._collectors.append((collector, merge))
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        data = {metric.name: metric.snapshot() for metric in metrics}
+        for collector, merge in collectors:
+            try:
+                samples = list(collector())
+            except Exception as exc:  # a broken collector must not break scrapes
+                LOGGER.warning("Metrics collector %r failed: %s", collector, exc)
+                continue
+            for name, kind, help, labels, value in samples:
+                entry = data.get(name)
+                if entry is None:
+                    entry = data[name] = {
+                        "kind": kind,
+                        "help": help,
+                        "labels": sorted(labels),
+                        "samples": [],
+                    }
+                    if kind == "gauge":
+                        entry["merge"] = merge
+                entry["samples"].append([[str(labels[k]) for k in entry["labels"]], value])
+        return data
+
+    def clear(self) -> None:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.clear()
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Flask request latency by route and status.",
+    ("endpoint", "method", "status"),
+)
+UPSTREAM_SECONDS = Histogram(
+    "upstream_request_duration_seconds",
+    "Latency of HotelRunner and FX client calls, retries included.",
+    ("upstream", "outcome"),
+)
+UPSTREAM_RESPONSES = Counter(
+    "upstream_http_responses_total",
+    "HTTP responses per attempt by upstream call and status code.",
+    ("upstream", "status"),
+)
+UPSTREAM_ERRORS = Counter(
+    "upstream_errors_total",
+    "Failed upstream client calls by upstream and error type.",
+    ("upstream", "error"),
+)
+RESERVATION_PAGES = Histogram(
+    "hotelrunner_reservation_pages",
+    "Reservation pages fetched per fetch_reservations call.",
+    (),
+    buckets=PAGE_BUCKETS,
+)
+
+PROPERTY_REQUEST_SECONDS = Histogram(
+    "property_request_duration_seconds",
+    "Request latency per HotelRunner property and status.",
+    ("property", "status"),
+)
+PROPERTY_UPSTREAM_SECONDS = Histogram(
+    "property_upstream_duration_seconds",
+    "Latency of HotelRunner client calls per property and upstream.",
+    ("property", "upstream"),
+)
+PROPERTY_REJECTIONS = Counter(
+    "property_rejected_requests_total",
+    "Requests turned away because their property was at its concurrency limit.",
+    ("property",),
+)
+
+LEDGER_LOOKUPS = Counter(
+    "booking_ledger_lookups_total",
+    "Availability lookups answered from the webhook-fed booking ledger (hit) or upstream (miss).",
+    ("result",),
+)
+LEDGER_EVENTS = Counter(
+    "booking_ledger_events_total",
+    "Reservation versions by source (webhook, sync) and outcome (applied, duplicate, invalid).",
+    ("source", "result"),
+)
+LEDGER_SYNCS = Counter(
+    "booking_ledger_syncs_total",
+    "Background reservation sync passes per property by result (ok, error).",
+    ("property", "result"),
+)
+LEDGER_DRIFT = Counter(
+    "booking_ledger_drift_total",
+    "Reservations corrected by reconciling the booking ledger against a full fetch.",
+)
+
+_UPSTREAM: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "metrics_upstream", default=None
+)
+_PROPERTY: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "metrics_property", default=None
+)
+
+
+def bind_property(property_id: str) -> contextvars.Token:
+    """Label per-property metrics recorded in this context with ``property_id``."""
+    return _PROPERTY.set(property_id)
+
+
+def unbind_property(token: contextvars.Token) -> None:
+    _PROPERTY.reset(token)
+
+
+def current_property() -> Optional[str]:
+    return _PROPERTY.get()
+
+
+@contextmanager
+def upstream_call(name: str) -> Iterator[None]:
+    """Time one client call and label the HTTP attempts made inside it."""
+    token = _UPSTREAM.set(name)
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except Exception as exc:
+        outcome = "error"
+        UPSTREAM_ERRORS.inc(upstream=name, error=type(exc).__name__)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        _UPSTREAM.reset(token)
+        UPSTREAM_SECONDS.observe(elapsed, upstream=name, outcome=outcome)
+        property_id = _PROPERTY.get()
+        if property_id is not None:
+            PROPERTY_UPSTREAM_SECONDS.observe(elapsed, property=property_id, upstream=name)
+        if not _IN_UPSTREAM_SPAN.get():
+            add_timing("upstream", elapsed)
+
+
+def record_response(status: int) -> None:
+    """Count one HTTP attempt against the enclosing :func:`upstream_call`."""
+    UPSTREAM_RESPONSES.inc(upstream=_UPSTREAM.get() or "other", status=status)
+
+
+# -- Server-Timing -----------------------------------------------------------------
+
+
+class RequestTimings:
+    """Per-request phase durations, shared with worker threads via ``copy_context``."""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self.phases: Dict[str, float] = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def header(self) -> str:
+        total = time.perf_counter() - self.started
+        with self._lock:
+            phases = dict(self.phases)
+        compute = max(total - sum(phases.values()), 0.0)
+        parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in sorted(phases.items())]
+        parts.append(f"compute;dur={compute * 1000:.1f}")
+        parts.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(parts)
+
+
+_TIMINGS: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar(
+    "metrics_timings", default=None
+)
+_IN_UPSTREAM_SPAN: contextvars.ContextVar[bool] = contextvars.ContextVar(
+    "metrics_in_upstream_span", default=False
+)
+
+
+def start_request() -> RequestTimings:
+    timings = RequestTimings()
+    _TIMINGS.set(timings)
+    return timings
+
+
+def current_timings() -> Optional[RequestTimings]:
+    return _TIMINGS.get()
+
+
+def add_timing(name: str, seconds: float) -> None:
+    timings = _TIMINGS.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+
+@contextmanager
+def upstream_span() -> Iterator[None]:
+    """Attribute the wall time of a (possibly parallel) upstream phase to ``upstream``.
+
+    Client calls made inside the span do not add their own durations, so
+    concurrent fetches are not double counted.
+    """
+    token = _IN_UPSTREAM_SPAN.set(True)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _IN_UPSTREAM_SPAN.reset(token)
+        add_timing("upstream", time.perf_counter() - started)
+
+
+# -- snapshots and exposition ------------------------------------------------------
+
+_PROCESS_TOKEN = uuid.uuid4().hex[:8]
+_PROCESS_PID = os.getpid()
+_FLUSHER_PID: Optional[int] = None
+_FLUSHER_LOCK = threading.Lock()
+
+
+def metrics_dir() -> Optional[Path]:
+    """Shared snapshot directory: ``METRICS_DIR``, or a per-master temp dir under gunicorn."""
+    configured = get_settings().metrics_dir
+    if configured:
+        return Path(configured)
+    if "gunicorn.arbiter" in sys.modules:
+        return Path(tempfile.gettempdir()) / f"hotelrunner-metrics-{os.getppid()}"
+    return None
+
+
+def _snapshot_path(directory: Path) -> Path:
+    global _PROCESS_TOKEN, _PROCESS_PID
+
+    if _PROCESS_PID != os.getpid():  # forked: never overwrite the parent's file
+        _PROCESS_TOKEN, _PROCESS_PID = uuid.uuid4().hex[:8], os.getpid()
+    return directory / f"metrics-{_PROCESS_PID}-{_PROCESS_TOKEN}.json"
+
+
+def flush(directory: Optional[Path] = None) -> Optional[Path]:
+    """Write this process's snapshot atomically; returns the file written."""
+    directory = directory or metrics_dir()
+    if directory is None:
+        return None
+    directory.mkdir(parents=True, exist_ok=True)
+    path = _snapshot_path(directory)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps({"pid": os.getpid(), "metrics": REGISTRY.snapshot()}))
+    os.replace(tmp, path)
+    return path
+
+
+def ensure_flusher() -> None:
+    """Start the background snapshot writer once per process (fork-safe)."""
+    global _FLUSHER_PID
+
+    if _FLUSHER_PID == os.getpid() or metrics_dir() is None:
+        return
+    with _FLUSHER_LOCK:
+        if _FLUSHER_PID == os.getpid():
+            return
+        _FLUSHER_PID = os.getpid()
+        interval = max(get_settings().metrics_flush_seconds, 0.5)
+
+        def run() -> None:
+            while True:
+                time.sleep(interval)
+                try:
+                    flush()
+                except OSError as exc:
+                    LOGGER.warning("Metrics flush failed: %s", exc)
+
+        threading.Thread(target=run, name="metrics-flush", daemon=True).start()
+
+
+def collect() -> List[Dict[str, Any]]:
+    """Snapshots of every live process: this one live, the others from their files.
+
+    Files left behind by processes that have exited are folded into the
+    retired snapshot (counters and histograms only; their gauges described
+    state that no longer exists) and removed. The directory is read under a
+    lock so no scrape counts a retiring file twice.
+    """
+    directory = metrics_dir()
+    own = REGISTRY.snapshot()
+    if directory is None:
+        return [own]
+    flush(directory)
+    snapshots = []
+    with _directory_lock(directory):
+        retired_path = directory / RETIRED_FILE
+        retired = _read_snapshot(retired_path) or {}
+        exited = []
+        for path in sorted(directory.glob("metrics-*.json")):
+            try:
+                data = json.loads(path.read_text())
+                pid, snapshot = data["pid"], data["metrics"]
+            except (OSError, ValueError, KeyError):
+                continue  # a worker is mid-write or the file was removed
+            if _alive(pid):
+                snapshots.append(snapshot)
+            else:
+                exited.append(path)
+                retired = _as_snapshot(_merge([retired, _cumulative(snapshot)]))
+        if exited:
+            tmp = retired_path.with_suffix(".tmp")
+            tmp.write_text(json.dumps({"metrics": retired}))
+            os.replace(tmp, retired_path)
+            for path in exited:
+                path.unlink(missing_ok=True)
+    return (snapshots or [own]) + ([retired] if retired else [])
+
+
+@contextmanager
+def _directory_lock(directory: Path) -> Iterator[None]:
+    with open(directory / ".lock", "a") as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def _read_snapshot(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads(path.read_text())["metrics"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _cumulative(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    return {name: data for name, data in snapshot.items() if data["kind"] != "gauge"}
+
+
+def _as_snapshot(merged: Dict[str, Any]) -> Dict[str, Any]:
+    snapshot = {}
+    for name, data in merged.items():
+        entry = {key: value for key, value in data.items() if key != "values"}
+        entry["samples"] = [[list(key), value] for key, value in data["values"].items()]
+        snapshot[name] = entry
+    return snapshot
+
+
+def _alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # exists, owned by someone else
+        return True
+    return True
+
+
+def merge(snapshots: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Sum counters and histograms with equal labels across processes.
+
+    Gauges are summed or maximised as their collector declared (see
+    :meth:`Registry.register_collector`); ``max`` when unspecified.
+    """
+    merged = _merge(snapshots)
+    _derive_hit_ratios(merged)
+    return merged
+
+
+def _merge(snapshots: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    merged: Dict[str, Any] = {}
+    for snapshot in snapshots:
+        for name, data in snapshot.items():
+            target = merged.setdefault(
+                name, {key: value for key, value in data.items() if key != "samples"}
+            )
+            values = target.setdefault("values", {})
+            for labels, value in data["samples"]:
+                key = tuple(labels)
+                current = values.get(key)
+                if current is None:
+                    values[key] = value
+                elif isinstance(value, list):
+                    values[key] = [a + b for a, b in zip(current, value)]
+                elif data["kind"] == "gauge" and data.get("merge", "max") == "max":
+                    values[key] = max(current, value)
+                else:
+                    values[key] = current + value
+    return merged
+
+
+def _derive_hit_ratios(merged: Dict[str, Any]) -> None:
+    lookups = merged.get("cache_lookups_total")
+    if not lookups:
+        return
+    labelnames = lookups["labels"]
+    cache_index, result_index = labelnames.index("cache"), labelnames.index("result")
+    totals: Dict[str, List[float]] = {}
+    for key, value in lookups["values"].items():
+        hits_total = totals.setdefault(key[cache_index], [0.0, 0.0])
+        hits_total[1] += value
+        if key[result_index] in ("hit", "stale_hit"):
+            hits_total[0] += value
+    merged["cache_hit_ratio"] = {
+        "kind": "gauge",
+        "help": "Cache hits (fresh or stale) over lookups, summed across workers.",
+        "labels": ["cache"],
+        "values": {(cache,): hits / total for cache, (hits, total) in totals.items() if total},
+    }
+
+
+def render(merged: Dict[str, Any]) -> str:
+    """Prometheus text exposition format (0.0.4)."""
+    lines: List[str] = []
+    for name in sorted(merged):
+        data = merged[name]
+        lines.append(f"# HELP {name} {data['help']}")
+        lines.append(f"# TYPE {name} {data['kind']}")
+        for key in sorted(data.get("values", {})):
+            value = data["values"][key]
+            labels = dict(zip(data["labels"], key))
+            if data["kind"] == "histogram":
+                for bound, count in zip(data["buckets"], value):
+                    lines.append(f"{name}_bucket{_labels(labels, le=_number(bound))} {count}")
+                lines.append(f"{name}_bucket{_labels(labels, le='+Inf')} {value[-1]}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(value[-2])}")
+                lines.append(f"{name}_count{_labels(labels)} {value[-1]}")
+            else:
+                lines.append(f"{name}{_labels(labels)} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def _labels(labels: Dict[str, str], **extra: str) -> str:
+    items = {**labels, **extra}
+    if not items:
+        return ""
+    body = ",".join(f'{key}="{_escape(value)}"' for key, value in items.items())
+    return "{" + body + "}"
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    if isinstance(value, float) and math.isinf(value):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def exposition() -> str:
+    return render(merge(collect()))
@@ -0,0 +1,206 @@
+"""On-demand profiling of a single request (cProfile + tracemalloc).
+
+Nothing here runs unless a request opts in, so unprofiled requests only pay
+for the flag check in ``app.py``. Reports are written as JSON (plus the raw
+``.prof`` pstats dump) to ``PROFILE_DIR`` so any worker can serve them.
+"""
+from __future__ import annotations
+
+import cProfile
+import datetime as dt
+import json
+import os
+import pstats
+import re
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from settings import get_settings
+
+PROFILE_ID = re.compile(r"^[0-9a-f]{32}$")
+_IGNORED_ALLOCATION_FILES = (tracemalloc.__file__, "<frozen importlib._bootstrap>")
+_ACTIVE = threading.Lock()  # tracemalloc is process-wide: one profiled request at a time
+
+
+class RequestProfiler:
+    """CPU profile of the calling thread plus allocations made while it runs.
+
+    cProfile only observes the thread that started it; time spent in the
+    upstream executor shows up as waiting in ``fetch_concurrently``.
+    """
+
+    def __init__(self, top_n: Optional[int] = None) -> None:
+        self.id = uuid.uuid4().hex
+        self.top_n = top_n or get_settings().profile_top_n
+        self._profile = cProfile.Profile()
+        self._started = 0.0
+        self._owns_tracemalloc = False
+        self._running = False
+
+    @classmethod
+    def try_start(cls, top_n: Optional[int] = None) -> Optional["RequestProfiler"]:
+        """Start profiling, or return ``None`` while another request is being profiled."""
+        if not _ACTIVE.acquire(blocking=False):
+            return None
+        profiler = cls(top_n)
+        try:
+            profiler._start()
+        except Exception:
+            _ACTIVE.release()
+            raise
+        return profiler
+
+    def _start(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(1)
+            self._owns_tracemalloc = True
+        tracemalloc.reset_peak()
+        self._started = time.perf_counter()
+        self._running = True
+        self._profile.enable()
+
+    def stop(self, **context: Any) -> Dict[str, Any]:
+        """Stop both profilers and build the report (``context`` is stored alongside)."""
+        self._profile.disable()
+        duration = time.perf_counter() - self._started
+        try:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            self._release()
+        return {
+            "id": self.id,
+            "created_at": dt.datetime.now(dt.timezone.utc).isoformat().replace("+00:00", "Z"),
+            "duration_ms": round(duration * 1000, 3),
+            **context,
+            "cpu": self._cpu_report(),
+            "allocations": self._allocation_report(snapshot),
+            "allocated_peak_kib": round(peak / 1024, 1),
+        }
+
+    def abort(self) -> None:
+        """Stop without a report (request failed before ``after_request``)."""
+        if self._running:
+            self._profile.disable()
+            self._release()
+
+    def dump_stats(self, path: Path) -> None:
+        self._profile.dump_stats(str(path))
+
+    def _release(self) -> None:
+        if not self._running:
+            return
+        self._running = False
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+        _ACTIVE.release()
+
+    def _cpu_report(self) -> List[Dict[str, Any]]:
+        stats = pstats.Stats(self._profile)
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)
+        report = []
+        for (filename, line, name), (primitive, calls, tottime, cumtime, _) in rows[: self.top_n]:
+            report.append(
+                {
+                    "function": f"{_short_path(filename)}:{line}({name})",
+                    "ncalls": calls if calls == primitive else f"{calls}/{primitive}",
+                    "tottime_ms": round(tottime * 1000, 3),
+                    "cumtime_ms": round(cumtime * 1000, 3),
+                }
+            )
+        return report
+
+    def _allocation_report(self, snapshot: tracemalloc.Snapshot) -> List[Dict[str, Any]]:
+        snapshot = snapshot.filter_traces(
+            [tracemalloc.Filter(False, pattern) for pattern in _IGNORED_ALLOCATION_FILES]
+        )
+        report = []
+        for stat in snapshot.statistics("lineno")[: self.top_n]:
+            frame = stat.traceback[0]
+            report.append(
+                {
+                    "site": f"{_short_path(frame.filename)}:{frame.lineno}",
+                    "size_kib": round(stat.size / 1024, 1),
+                    "count": stat.count,
+                }
+            )
+        return report
+
+
+def profile_dir() -> Path:
+    configured = get_settings().profile_dir
+    return Path(configured) if configured else Path(tempfile.gettempdir()) / "hotelrunner-profiles"
+
+
+def save_report(report: Dict[str, Any], profiler: Optional[RequestProfiler] = None) -> Path:
+    """Persist ``report`` (and the pstats dump) and prune the oldest beyond the limit."""
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{report['id']}.json"
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(report, indent=2))
+    os.replace(tmp, path)
+    if profiler is not None:
+        profiler.dump_stats(path.with_suffix(".prof"))
+    _prune(directory, get_settings().profile_keep)
+    return path
+
+
+def load_report(profile_id: str) -> Optional[Dict[str, Any]]:
+    if not PROFILE_ID.match(profile_id):
+        return None
+    path = profile_dir() / f"{profile_id}.json"
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def stats_path(profile_id: str) -> Optional[Path]:
+    if not PROFILE_ID.match(profile_id):
+        return None
+    path = profile_dir() / f"{profile_id}.prof"
+    return path if path.exists() else None
+
+
+def list_reports(limit: int = 50) -> List[Dict[str, Any]]:
+    """Newest first, without the cpu/allocation tables."""
+    directory = profile_dir()
+    if not directory.exists():
+        return []
+    paths = sorted(directory.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
+    summaries = []
+    for path in paths[:limit]:
+        try:
+            report = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        summaries.append(
+            {key: value for key, value in report.items() if key not in ("cpu", "allocations")}
+        )
+    return summaries
+
+
+def _prune(directory: Path, keep: int) -> None:
+    paths = sorted(directory.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for path in paths[keep:]:
+        for stale in (path, path.with_suffix(".prof")):
+            try:
+                stale.unlink()
+            except OSError:
+                pass
+
+
+def _short_path(filename: str) -> str:
+    cwd = os.getcwd() + os.sep
+    if filename.startswith(cwd):
+        return filename[len(cwd) :]
+    marker = f"{os.sep}site-packages{os.sep}"
+    if marker in filename:
+        return filename.split(marker, 1)[1]
+    return filename
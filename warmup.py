@@ -0,0 +1,263 @@
+"""Warm a process up before it takes traffic and record how long each phase took.
+
+Phases run in order: ``imports`` (heavy modules), ``settings`` (settings
+and the property registry), ``connections`` (TCP/TLS to HotelRunner and
+the FX API), then ``rooms``, ``currencies`` and ``fx`` to prime those
+caches for every property. :func:`run` skips phases this process already
+has, including ``MASTER_PHASES`` inherited from a gunicorn master started
+with ``--preload`` (see ``gunicorn.conf.py``). Upstream calls made by a
+phase get the time left in ``WARMUP_TIMEOUT_SECONDS`` as their timeout and
+are not retried. A failed phase is recorded and does not stop the others.
+
+:func:`ensure_started` runs the warmup in a background thread: gunicorn
+workers start it right after the fork, other servers on their first
+request. ``/readyz`` reports the progress and turns ready once all phases
+went through in this process.
+"""
+from __future__ import annotations
+
+import importlib
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from settings import get_settings
+from utils import metrics
+
+LOGGER = logging.getLogger(__name__)
+
+PRELOAD_MODULES = (
+    "flask",
+    "pydantic",
+    "requests",
+    "tenacity",
+    "clients.hotelrunner.metadata",
+    "clients.hotelrunner.reservations",
+    "services.availability.service",
+    "services.availability.flexible",
+    "compose_offer",
+    "currency_resolver",
+    "settings.fx",
+)
+# Phases whose effect survives a fork, so a preloading master can run them once.
+MASTER_PHASES = ("imports", "settings")
+
+
+class WarmupBudgetExceeded(RuntimeError):
+    pass
+
+
+def _imports(_deadline: float) -> None:
+    for name in PRELOAD_MODULES:
+        importlib.import_module(name)
+
+
+def _settings(_deadline: float) -> None:
+    from clients.hotelrunner import tenancy
+
+    get_settings()
+    tenancy.registry()
+
+
+def _connections(deadline: float) -> None:
+    from clients.hotelrunner.common import APPS_BASE_URL, get_session
+    from settings import fx
+
+    def timeout() -> float:
+        return max(min(deadline - time.monotonic(), 5.0), 0.1)
+
+    # Any answer will do; the point is the pooled, already negotiated connection.
+    fx_origin = _origin(os.getenv("FX_API_URL", fx.DEFAULT_FX_API_URL))
+    if fx_origin:
+        fx.get_session().head(fx_origin, timeout=timeout())
+    origin = _origin(APPS_BASE_URL)
+    for _prop in _each_property(deadline):
+        if origin:
+            get_session().head(origin, timeout=timeout())
+
+
+def _rooms(deadline: float) -> None:
+    from clients.hotelrunner.metadata import get_rooms
+
+    for _prop in _each_property(deadline):
+        get_rooms()
+
+
+def _currencies(deadline: float) -> None:
+    from clients.hotelrunner.metadata import get_currencies
+
+    for _prop in _each_property(deadline):
+        get_currencies()
+
+
+def _fx(deadline: float) -> None:
+    # One quote per base currency fetches that base's whole rate table.
+    bases = {prop.base_currency for prop in _each_property(deadline)}
+    for base in sorted(bases):
+        get_settings().get_fx_quote(base, "EUR" if base != "EUR" else "USD")
+
+
+PHASES: Dict[str, Callable[[float], None]] = {
+    "imports": _imports,
+    "settings": _settings,
+    "connections": _connections,
+    "rooms": _rooms,
+    "currencies": _currencies,
+    "fx": _fx,
+}
+
+_LOCK = threading.Lock()
+_RESULTS: Dict[str, Dict[str, Any]] = {}
+_READY_PID: Optional[int] = None
+_STARTED_PID: Optional[int] = None
+_RUNNING: Optional[Tuple[int, str]] = None  # (pid, phase) of the phase in progress
+
+
+def run(phases: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """Run ``phases`` (default: all) within ``WARMUP_TIMEOUT_SECONDS``; returns :func:`report`.
+
+    Completing the full set marks this process ready.
+    """
+    global _READY_PID, _RUNNING
+
+    from clients.hotelrunner.common import call_deadline
+
+    names = list(phases or PHASES)
+    deadline = time.monotonic() + get_settings().warmup_timeout_seconds
+    for name in names:
+        if _done(name):
+            continue
+        started = time.monotonic()
+        error = None
+        with _LOCK:
+            _RUNNING = (os.getpid(), name)
+        try:
+            if time.monotonic() >= deadline:
+                raise WarmupBudgetExceeded("warmup budget exhausted")
+            with call_deadline(deadline):
+                PHASES[name](deadline)
+        except Exception as exc:  # serve cold rather than not at all
+            LOGGER.warning("Warmup phase %s failed: %s", name, exc)
+            error = type(exc).__name__
+        with _LOCK:
+            _RESULTS[name] = {
+                "seconds": round(time.monotonic() - started, 4),
+                "ok": error is None,
+                "error": error,
+                "pid": os.getpid(),
+            }
+            _RUNNING = None
+    if set(names) >= set(PHASES):
+        with _LOCK:
+            _READY_PID = os.getpid()
+        summary = report()
+        LOGGER.info(
+            "Warmup finished in %.3f s: %s",
+            summary["total_seconds"],
+            ", ".join(f"{phase['name']}={phase['seconds']:.3f}s" for phase in summary["phases"]),
+        )
+    return report()
+
+
+def ensure_started() -> None:
+    """Start :func:`run` in a background thread once per process (fork-safe)."""
+    global _STARTED_PID
+
+    if _STARTED_PID == os.getpid():
+        return
+    with _LOCK:
+        if _STARTED_PID == os.getpid():
+            return
+        _STARTED_PID = os.getpid()
+    threading.Thread(target=run, name="warmup", daemon=True).start()
+
+
+def ready() -> bool:
+    return _READY_PID == os.getpid()
+
+
+def report() -> Dict[str, Any]:
+    with _LOCK:
+        results = dict(_RESULTS)
+    phases: List[Dict[str, Any]] = []
+    for name in PHASES:
+        result = results.get(name)
+        if result is None:
+            continue
+        phases.append(
+            {
+                "name": name,
+                "seconds": result["seconds"],
+                "ok": result["ok"],
+                "error": result["error"],
+                "in": "worker" if result["pid"] == os.getpid() else "preload",
+            }
+        )
+    with _LOCK:
+        running = _RUNNING[1] if _RUNNING and _RUNNING[0] == os.getpid() else None
+    return {
+        "ready": ready(),
+        "started": _STARTED_PID == os.getpid() or running is not None,
+        "running": running,
+        "pending": [
+            name
+            for name in PHASES
+            if name != running
+            and not _done(name)
+            and results.get(name, {}).get("pid") != os.getpid()
+        ],
+        "total_seconds": round(sum(phase["seconds"] for phase in phases), 4),
+        "phases": phases,
+    }
+
+
+def reset() -> None:
+    global _READY_PID, _STARTED_PID, _RUNNING
+
+    with _LOCK:
+        _RESULTS.clear()
+        _READY_PID = _STARTED_PID = _RUNNING = None
+
+
+def _done(name: str) -> bool:
+    with _LOCK:
+        result = _RESULTS.get(name)
+    if result is None or not result["ok"]:
+        return False
+    return result["pid"] == os.getpid() or name in MASTER_PHASES
+
+
+def _each_property(deadline: float) -> Iterator[Any]:
+    """Every registered property, selected in turn, until the warmup budget runs out."""
+    from clients.hotelrunner import tenancy
+
+    for property_id in tenancy.registry().ids():
+        if time.monotonic() >= deadline:
+            raise WarmupBudgetExceeded("warmup budget exhausted")
+        with tenancy.use_property(property_id) as prop:
+            yield prop
+
+
+def _origin(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}/" if parts.scheme and parts.netloc else ""
+
+
+def _phase_samples():
+    # Preloaded phases ran in the master; report what the workers themselves spent.
+    for phase in report()["phases"]:
+        if phase["in"] != "worker":
+            continue
+        yield (
+            "startup_phase_seconds",
+            "gauge",
+            "Seconds spent in each warmup phase by the slowest worker.",
+            {"phase": phase["name"]},
+            phase["seconds"],
+        )
+
+
+metrics.REGISTRY.register_collector(_phase_samples, merge="max")